@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+#
+# Compact the HAR files of existing runs in place: Rewrite them as compact JSON, compressed,
+# and optionally without response bodies. computetimings.py reads the compacted files transparently.
+#
+# Usage:
+#           ./compact_hars.py RUNFILTER COMPRESSION STRIP_CONTENT
+#                   RUNFILTER:      every run which contains this string will be compacted (default: all runs)
+#                   COMPRESSION:    zstd, gzip, or none (default: zstd if the zstandard module is installed, gzip otherwise)
+#                   STRIP_CONTENT:  set to "strip" to remove response bodies (response.content.text)
+
+import os
+import sys
+import glob
+import json
+import hartimings
+
+RUNDIR = "../testdata/"
+
+EXTENSIONS = { "zstd": ".har.zst", "gzip": ".har.gz", "none": ".har" }
+
+# Rewrite one HAR file, return its new name, or None if it could not be compacted
+def compact_harfile(harfilename, compression, strip_content=False):
+	harpath = harfilename[:-len(".har")]
+	newharfilename = harpath + EXTENSIONS[compression]
+	tmpharfilename = newharfilename + ".tmp" + EXTENSIONS[compression]
+
+	try:
+		with open(harfilename, 'r') as harfile:
+			parsedhar = json.load(harfile)
+		hartimings.write_harfile(tmpharfilename, parsedhar, strip_content=strip_content)
+
+		# Make sure we can read it back before replacing the original
+		with hartimings.open_harfile(tmpharfilename) as harfile:
+			json.load(harfile)
+	except Exception as err:
+		print("Could not compact " + harfilename + ": " + str(err))
+		if os.path.exists(tmpharfilename):
+			os.remove(tmpharfilename)
+		return None
+
+	os.rename(tmpharfilename, newharfilename)
+	if newharfilename != harfilename:
+		os.remove(harfilename)
+	return newharfilename
+
+def compact_run(run, compression, strip_content=False):
+	oldsize = 0
+	newsize = 0
+	harfilenames = sorted(glob.glob(run + "har/*.har"))
+	for harfilename in harfilenames:
+		size = os.path.getsize(harfilename)
+		newharfilename = compact_harfile(harfilename, compression, strip_content)
+		if newharfilename is not None:
+			oldsize += size
+			newsize += os.path.getsize(newharfilename)
+	print("Compacted " + str(len(harfilenames)) + " HAR files in " + run + " from " + str(oldsize) + " to " + str(newsize) + " bytes")
+
+def main(argv=[]):
+	runfilter = None
+	if len(argv) > 1 and argv[1] != "all":
+		runfilter = argv[1]
+
+	if len(argv) > 2:
+		compression = argv[2]
+	else:
+		compression = "zstd" if hartimings.zstandard is not None else "gzip"
+	if compression not in EXTENSIONS:
+		print("Unknown compression " + compression + ", use one of " + ", ".join(EXTENSIONS.keys()))
+		return
+	if compression == "zstd" and hartimings.zstandard is None:
+		print("Need the zstandard module for zstd compression")
+		return
+
+	strip_content = (len(argv) > 3 and argv[3] == "strip")
+
+	runs = glob.glob(RUNDIR + "run-*")
+	if runfilter is not None:
+		runs = [ r for r in runs if runfilter in r ]
+	for run in runs:
+		if run[-1] != "/":
+			run = run + "/"
+		compact_run(run, compression, strip_content)
+
+if __name__ == "__main__":
+	main(sys.argv)
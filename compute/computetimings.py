@@ -6,15 +6,17 @@
 # Tools to compute and plot page load timings from Navigation Timings, Resource Timings, and HAR files as exported by webtimings.py
 #
 # Usage:
-#           ./computetimings.py RUNFILTER WORKLOAD POLICY LOG_LEVEL
+#           ./computetimings.py [--jobs N] RUNFILTER WORKLOAD POLICY LOG_LEVEL
+#                   --jobs N:   process N runs at the same time, each in its own process (default: 1),
+#                               or, if there is only one run, N of its page loads at the same time
 #                   RUNFILTER:  every run which contains this string will be considered (default: consider all runs)
 #                   WORKLOAD:   supply multiple separated by comma, every page which contains one of these strings will be consider (default: "all")
 #                   POLICY:     supply multiple separated by comma (default: "all")
 #                   LOG_LEVEL:  set to "debug" or "info" to get more debug output
 
 import os
+import io
 import errno
-import datetime
 import time
 import sys
 import glob
@@ -22,12 +24,14 @@ import csv
 import re
 import logging
 import json
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.backends.backend_pdf import PdfPages
 import hartimings
+import timestamps
 import subprocess
 import copy
+import contextlib
+import itertools
+import traceback
+import concurrent.futures
 import validate_object_size
 
 
@@ -35,14 +39,32 @@ RUNDIR = "../testdata/"
 
 NAVTIMINGS_FILENAME = "navtimings.log"
 RESTIMINGS_FILENAME = ".res.log"
+# Per-object log of page loads without HAR file (NO_HAR=1, see load/collect_timings.py), in res/
+OBJTIMINGS_FILENAME = ".obj.log"
 LOGFILENAME = "final_timings.log"
 
+# Per-page results computed while the loader was still running (see postprocess.py),
+# in a subdirectory and named so that they are never mistaken for final_timings.log
+PAGE_RESULTS_DIR = "pages/"
+PAGE_ROW_SUFFIX = ".row.csv"
+PAGE_COMPARE_SUFFIX = ".compare.csv"
+
+# Packet capture of one page load, if the capture was segmented (see load/segment_capture.py)
+CAPTURE_SEGMENT_DIR = "pcap/"
+CAPTURE_SEGMENT_SUFFIX = ".pcap"
+
+# Node of every page load of a run merged from the runs of several hosts (see merge_runs.py)
+MERGED_PAGES_FILENAME = "merged_pages.log"
+merged_pages_fields = [ "pagelabel", "node", "nodepagelabel", "alignedstarttime" ]
+
 # Fields of the CSV files
 navtiming_fields = [ "page", "scenario", "starttime", "startunixtimestamp", "navigationStart", "redirectStart", "redirectEnd", "fetchStart", "domainLookupStart", "domainLookupEnd", "connectStart", "secureConnectionStart", "connectEnd", "requestStart", "responseStart", "responseEnd", "domLoading", "domInteractive", "domContentLoadedEventStart", "domContentLoadedEventEnd", "domComplete", "loadEventStart", "loadEventEnd", "firstPaint" ]
 
 restiming_fields = [ 'name', "scenario", "initiatorType", "nextHopProtocol", "encodedBodySize", "decodedBodySize", "starttime", "redirectStart", "redirectEnd", "fetchStart", "domainLookupStart", "domainLookupEnd", "connectStart", "secureConnectionStart", "connectEnd", "requestStart", "responseStart", "responseEnd", "duration" ]
 
-hartiming_fields = [ "name", "method", "httpVersion", "status", "mimeType", "scenario", "mahttpp_ip1", "mahttpp_port1", "mahttpp_ip2", "mahttpp_port2", "resptransfersize", "respheadersize", "respbodysize", "contentlengthheader", "contentsize", "startedDateTime", "start_delta", "blockedTime", "dnsTime", "connectTime", "sslTime", "sendTime", "waitTime", "receiveTime" ]
+objtiming_fields = [ "name", "scenario", "initiatorType", "responseStatus", "nextHopProtocol", "transferSize", "encodedBodySize", "decodedBodySize", "startTime", "domainLookupStart", "domainLookupEnd", "connectStart", "secureConnectionStart", "connectEnd", "requestStart", "responseStart", "responseEnd" ]
+
+hartiming_fields = hartimings.HARTIMING_FIELDS
 
 
 def createDirectory(path):
@@ -109,20 +131,103 @@ def read_csvfile(csvfilename, fields):
 
 
 # Read logfile of HAR timings, create it first if it does not exist yet
+# If the page was loaded without HAR file, get the same timings from its .obj.log instead
+# Returns a list of entry records (see hartimings.get_entry_timings)
 def get_hartimings(run, pagelabel, navt):
-	harfile = run + "har/" + pagelabel + ".har"
+	return get_har_record(run, pagelabel, navt, page=False)["entries"]
+
+# Everything we use of the HAR file of a page load (see hartimings.read_har_record), reading it only once:
+# if there is no logfile of HAR timings yet, read the whole HAR file and create the logfile,
+# otherwise read the entries from the logfile and only the first page from the HAR file (if page is set)
+def get_har_record(run, pagelabel, navt, page=True):
+	harfile = hartimings.find_harfile(run + "har/" + pagelabel)
 	hartimingslogfile = run + "har/" + pagelabel + ".har.log"
+	if not os.path.exists(hartimingslogfile) and not os.path.exists(harfile) and has_objtimings(run, pagelabel):
+		return { "page": None, "entries": get_hartimings_from_objtimings(run, pagelabel) }
 	har_timings = read_csvfile(hartimingslogfile, hartiming_fields)
-	if har_timings is None and navt is not None:
-		print("Trying to read " + harfile + " to create " + str(hartimingslogfile))
-		try:
-			hartimings.parsehartimings(harfile, hartimingslogfile, scenario = navt["scenario"])
-			har_timings = read_csvfile(hartimingslogfile, hartiming_fields)
-			if har_timings is None:
-				har_timings=[]
-		except Exception as err:
-			print("Error getting HAR timings: " + str(err))
-			return []
+	if har_timings is not None:
+		return { "page": hartimings.load_harpage(harfile) if page else None, "entries": hartimings.typed_hartimings(har_timings) }
+	if navt is None:
+		return { "page": None, "entries": [] }
+
+	print("Trying to read " + harfile + " to create " + str(hartimingslogfile))
+	try:
+		record = hartimings.read_har_record(harfile, scenario = navt["scenario"])
+	except Exception as err:
+		print("Error getting HAR timings: " + str(err))
+		# The entries are broken, maybe the page is fine
+		return { "page": hartimings.load_harpage(harfile) if page else None, "entries": [] }
+	try:
+		hartimings.write_hartimings(hartimingslogfile, record["entries"])
+		print("Logged to " + hartimingslogfile)
+	except IOError as err:
+		print("Could not write " + hartimingslogfile + ": " + str(err))
+	return record
+
+def has_objtimings(run, pagelabel):
+	return os.path.exists(run + "res/" + pagelabel + OBJTIMINGS_FILENAME)
+
+# Protocol as logged in HAR files, from nextHopProtocol of Resource Timing
+def get_httpversion(nexthopprotocol):
+	if nexthopprotocol == "h2":
+		return "HTTP/2.0"
+	elif nexthopprotocol == "h3":
+		return "HTTP/3"
+	elif nexthopprotocol.startswith("http/"):
+		return nexthopprotocol.upper()
+	return "NA"
+
+# Value of a timing or size, 0 if there is none ("NA" or "None")
+def get_objtiming_value(objt, field):
+	try:
+		return float(objt[field])
+	except (ValueError, TypeError):
+		return 0
+
+# Read the .obj.log of a page load and turn every object into an entry record (see hartimings.get_entry_timings),
+# with its times and sizes from Resource Timing:
+# start_delta is startTime (relative to navigationStart, like the first object of a HAR file),
+# the timings add up to responseEnd (or are all in receiveTime, if the server did not allow detailed timings),
+# sizes that are 0 (e.g., cross-origin without Timing-Allow-Origin) are invalid (-1) as in HAR files.
+# Status is responseStatus if the browser logged it, otherwise 200 for every object that got a response,
+# as the browser only creates Resource Timing entries for completed fetches
+def get_hartimings_from_objtimings(run, pagelabel):
+	objtimings = read_csvfile(run + "res/" + pagelabel + OBJTIMINGS_FILENAME, objtiming_fields)
+	if objtimings is None:
+		return []
+	page_startedDateTime = timestamps.parse_time(pagelabel.split("+", 1)[1], timestamps.LABEL_FORMAT)
+
+	har_timings = []
+	for objt in objtimings:
+		starttime = get_objtiming_value(objt, "startTime")
+		responseEnd = get_objtiming_value(objt, "responseEnd")
+		requestStart = get_objtiming_value(objt, "requestStart")
+		transfersize = int(get_objtiming_value(objt, "transferSize"))
+		bodysize = int(get_objtiming_value(objt, "encodedBodySize"))
+		contentsize = int(get_objtiming_value(objt, "decodedBodySize"))
+
+		status = int(get_objtiming_value(objt, "responseStatus"))
+		if status <= 0:
+			status = 200 if responseEnd > 0 else 0
+
+		if requestStart > 0:
+			dnsTime = get_objtiming_value(objt, "domainLookupEnd") - get_objtiming_value(objt, "domainLookupStart")
+			connectTime = get_objtiming_value(objt, "connectEnd") - get_objtiming_value(objt, "connectStart")
+			secureConnectionStart = get_objtiming_value(objt, "secureConnectionStart")
+			sslTime = get_objtiming_value(objt, "connectEnd") - secureConnectionStart if secureConnectionStart > 0 else -1
+			blockedTime = requestStart - starttime - dnsTime - connectTime
+			waitTime = get_objtiming_value(objt, "responseStart") - requestStart
+			receiveTime = responseEnd - get_objtiming_value(objt, "responseStart")
+		else:
+			(blockedTime, dnsTime, connectTime, sslTime, waitTime) = (0, 0, 0, -1, 0)
+			receiveTime = responseEnd - starttime if responseEnd > 0 else 0
+
+		har_timings.append({ "name": objt["name"], "method": "NA", "httpVersion": get_httpversion(objt["nextHopProtocol"]), "status": status, "mimeType": "NA", "scenario": objt["scenario"],
+			"mahttpp_ip1": "None", "mahttpp_port1": "None", "mahttpp_ip2": "None", "mahttpp_port2": "None",
+			"resptransfersize": transfersize, "respheadersize": transfersize - bodysize if transfersize > 0 and bodysize > 0 else -1, "respbodysize": bodysize if bodysize > 0 else -1,
+			"contentlengthheader": "NA", "contentsize": contentsize if contentsize > 0 else -1,
+			"startedDateTime": page_startedDateTime + timestamps.ms_to_us(starttime), "start_delta": starttime,
+			"blockedTime": blockedTime, "dnsTime": dnsTime, "connectTime": connectTime, "sslTime": sslTime, "sendTime": 0, "waitTime": waitTime, "receiveTime": receiveTime })
 	return har_timings
 
 def get_restimings(run, pagelabel):
@@ -162,6 +267,10 @@ def find_duplicates(orig_list):
 			dups.append(item)
 	return dups
 
+# Status 3xx -- as it was logged, so a status that is no number (e.g., "NA") is no redirect
+def is_redirect(status):
+	return str(status)[0] == "3"
+
 def compare_har_to_resource(har_timings, res_timings, run, pagelabel, logfile=None):
 	if logfile:
 		csvwriter = csv.writer(logfile, delimiter=",")
@@ -169,7 +278,7 @@ def compare_har_to_resource(har_timings, res_timings, run, pagelabel, logfile=No
 	url = "http://" + pagelabel.split("+", 1)[0]
 	starttime = pagelabel.split("+", 1)[1]
 
-	page_startedDateTime = datetime.datetime.strptime(har_timings[0]["startedDateTime"], "%Y-%m-%d+%H-%M-%S.%f")
+	page_startedDateTime = har_timings[0]["startedDateTime"]
 	restimings_lookup_list = copy.deepcopy(res_timings)
 	hartimings_lookup_list = copy.deepcopy(har_timings)
 
@@ -178,7 +287,7 @@ def compare_har_to_resource(har_timings, res_timings, run, pagelabel, logfile=No
 	# Go through HAR timings, find matching Resource Timing for each
 	for hart in har_timings:
 		har_url = hart["name"]
-		har_timestamp = datetime.datetime.strptime(hart["startedDateTime"], "%Y-%m-%d+%H-%M-%S.%f")
+		har_timestamp = hart["startedDateTime"]
 		logging.debug("Looking up Resource timing for " + har_url + ", " + str(har_timestamp))
 
 		rest = validate_object_size.get_matching_restiming(restimings_lookup_list, har_url, har_timestamp, page_startedDateTime, match_closest=True)
@@ -191,10 +300,10 @@ def compare_har_to_resource(har_timings, res_timings, run, pagelabel, logfile=No
 				contentlength_from_header = int(hart["contentlengthheader"])
 			except ValueError:
 				contentlength_from_header = 0
-			respbodysize = int(hart["respbodysize"])
+			respbodysize = hart["respbodysize"]
 			if contentlength_from_header > 0:
 				smart_total_page_size += contentlength_from_header
-			elif respbodysize > 0 and hart["status"][0] != "3":
+			elif respbodysize > 0 and not is_redirect(hart["status"]):
 				# Only count logged response body size if this is not a redirect (status 3xx)
 				# because the logged response body size is often broken for redirects
 				smart_total_page_size += respbodysize
@@ -202,7 +311,7 @@ def compare_har_to_resource(har_timings, res_timings, run, pagelabel, logfile=No
 			if logfile:
 				csvwriter.writerow([url, starttime, hart["status"], hart["httpVersion"], "in_har_not_in_res", hart["resptransfersize"], hart["respbodysize"], hart["respheadersize"], hart["contentlengthheader"], hart["contentsize"], "NA", "NA", har_url.replace(",", "")])
 		else:
-			logging.debug("In both -- har sizes: " + str(hart["respbodysize"]) + " (" + str(int(hart["respbodysize"]) - int(hart["respheadersize"])) + " without header), " + str(hart["contentsize"]) + " -- resource sizes: " + str(rest["encodedBodySize"]) + ", " + str(rest["decodedBodySize"]) + " " + har_url)
+			logging.debug("In both -- har sizes: " + str(hart["respbodysize"]) + " (" + str(hart["respbodysize"] - hart["respheadersize"]) + " without header), " + str(hart["contentsize"]) + " -- resource sizes: " + str(rest["encodedBodySize"]) + ", " + str(rest["decodedBodySize"]) + " " + har_url)
 			restimings_lookup_list.remove(rest)
 
 			# Add this object to total page size, using the "more accurate" metrics if they exist
@@ -210,13 +319,13 @@ def compare_har_to_resource(har_timings, res_timings, run, pagelabel, logfile=No
 				contentlength_from_header = int(hart["contentlengthheader"])
 			except ValueError:
 				contentlength_from_header = 0
-			respbodysize = int(hart["respbodysize"])
+			respbodysize = hart["respbodysize"]
 			resource_bodysize = int(rest["encodedBodySize"])
 			if contentlength_from_header > 0:
 				smart_total_page_size += contentlength_from_header
-			elif resource_bodysize > 0 and hart["status"][0] != "3":
+			elif resource_bodysize > 0 and not is_redirect(hart["status"]):
 				smart_total_page_size += resource_bodysize
-			elif respbodysize > 0 and hart["status"][0] != "3":
+			elif respbodysize > 0 and not is_redirect(hart["status"]):
 				smart_total_page_size += respbodysize
 
 			if logfile:
@@ -224,7 +333,7 @@ def compare_har_to_resource(har_timings, res_timings, run, pagelabel, logfile=No
 
 	for rest in res_timings:
 		res_url = rest["name"]
-		res_timestamp = page_startedDateTime + datetime.timedelta(milliseconds = float(rest["starttime"]))
+		res_timestamp = page_startedDateTime + timestamps.ms_to_us(float(rest["starttime"]))
 		logging.debug("Looking up HAR timing for " + res_url + ", " + str(res_timestamp))
 		hart = validate_object_size.get_matching_hartiming(hartimings_lookup_list, res_url, res_timestamp, statuscode_to_look_for="", use_starttime=True, match_closest=True)
 		if not hart:
@@ -274,366 +383,474 @@ def compute_byte_index(object_end_times, object_sizes, starttime):
 
 
 
-def compute_timings(navtimings, run, log=False):
-
-	compare_logfile = None
-
-	if log:
-		# Logfile for timings and per-page statistics
-		try:
-			if os.path.exists(run + LOGFILENAME):
-				os.remove(run + LOGFILENAME)
-				print("Deleted old " + run + LOGFILENAME)
-		except Exception as err:
-			print("Could not delete " + run + LOGFILENAME + ": " + str(err))
-		try:
-			csvfile = open(run + LOGFILENAME, "w", newline='')
-		except TypeError as e:
-			print("Error opening " + run + LOGFILENAME + ": " + str(e))
-			csvfile = open(run + LOGFILENAME, 'wb')
-		csvwriter = csv.writer(csvfile, delimiter=",")
-
-		# Logfile for comparing HAR objects to Resource Timing objects
-		logfilename = run + "compare_har_res.log"
-		try:
-			if os.path.exists(logfilename):
-				os.remove(logfilename)
-				print("Deleted old " + logfilename)
-		except Exception as err:
-			print("Could not delete " + logfilename + ": " + str(err))
-		try:
-			compare_logfile = open(logfilename, "w", newline='')
-		except TypeError as e:
-			print("Error opening " + logfilename + ": " + str(e))
-			compare_logfile = open(logfilename, 'wb')
-
+# Compute timings and statistics of one page load from its Navigation Timings, HAR file, and Resource Timings
+# Returns its row of final_timings.log and its rows of compare_har_res.log, as CSV text
+def compute_page_timings(navt, run):
+	compare_logfile = io.StringIO()
 
-	# For each Navigation Timing, also get HAR file content and resource timings
-	for navt in navtimings:
-		pagelabel = str(navt["page"].split('/')[2] + "+" + navt["starttime"])
-		print("\nLogging Timings for " + run + pagelabel + "...")
+	pagelabel = get_pagelabel(navt)
+	print("\nLogging Timings for " + run + pagelabel + "...")
 
-		# Open HAR file to read ContentLoadTime and OnLoadTime logged there
+	# Open HAR file to read ContentLoadTime and OnLoadTime logged there, and its entries
 
-		harfilename = run + "har/" + pagelabel + ".har"
+	harfilename = hartimings.find_harfile(run + "har/" + pagelabel)
+	if not os.path.exists(harfilename) and has_objtimings(run, pagelabel):
+		# Loaded without HAR file -- use the same events from the Navigation Timings
+		print("No HAR file, using " + run + "res/" + pagelabel + OBJTIMINGS_FILENAME)
+		harrecord = { "entries": get_hartimings(run, pagelabel, navt) }
+		harStartTime = "NA"
+		harContentLoadTime = get_objtiming_value(navt, "domContentLoadedEventStart")
+		if harContentLoadTime <= 0:
+			harContentLoadTime = "NA"
+		harOnLoadTime = get_objtiming_value(navt, "loadEventStart")
+		if harOnLoadTime <= 0:
+			harOnLoadTime = "NA"
+	else:
 		try:
-			harfile = open(harfilename, 'r')
-			harfilecontents = json.loads(harfile.read())
+			harrecord = get_har_record(run, pagelabel, navt)
+			harpage = harrecord["page"]
 		except Exception as err:
 			print("Could not read " + harfilename + ":" + str(err))
-			harfilecontents = None
+			harrecord = { "entries": [] }
+			harpage = None
 
 		try:
-			harStartTime = harfilecontents["log"]["pages"][0]["startedDateTime"]
+			harStartTime = harpage["startedDateTime"]
 		except ValueError as err:
 			print("Could not get start time from " + harfilename + ": " + str(err))
 			harStartTime = "NA"
 		try:
-			harContentLoadTime = float(harfilecontents["log"]["pages"][0]["pageTimings"]["onContentLoad"])
+			harContentLoadTime = float(harpage["pageTimings"]["onContentLoad"])
 		except ValueError as err:
 			print("Could not get onContentLoad time from " + harfilename + ": " + str(err))
 			harContentLoadTime = "NA"
 		try:
-			harOnLoadTime = float(harfilecontents["log"]["pages"][0]["pageTimings"]["onLoad"])
+			harOnLoadTime = float(harpage["pageTimings"]["onLoad"])
 		except ValueError as err:
 			print("Could not get onLoad time from " + harfilename + ": " + str(err))
 			harOnLoadTime = "NA"
-		harfile.close()
 
 
-		try:
-			har_timings = get_hartimings(run, pagelabel, navt)
-		except Exception as err:
-			print("Could not get HAR timings: " + str(err))
-			har_timings = []
-			max_hartimings = "NA"
-
-		# Process HAR timings
-		if har_timings:
-
-			harNumberOfRequests = len(har_timings)
-			harFinishedAfterOnLoad = 0
-
-			harNoReply = 0
-			harStatus1xx = 0
-			harStatus200 = 0
-			harStatusOther2xx = 0
-			harStatus3xx = 0
-			harStatus4xx = 0
-			harStatus5xx = 0
-			harUnknownStatus = 0
-			harNonFailedRequests = 0 	# between 100 and 399
-
-			sum_of_respbodysize = 0
-			sum_of_contentlength = 0
-			sum_of_contentsize = 0
-			sum_of_bodyorcontent = 0
-			sum_of_transfersize = 0
-			respbodysizes_counted = 0
-			contentsizes_counted = 0
-
-			harFirst200Starttime = -1
-			harRedirectsBeforeFirst200 = 0
-			harLastRequestStartBeforeOnLoad = 0
-			harLastResourceEndBeforeOnLoad = 0
-
-			object_finish_times = []
-			object_finish_times_bodysize = []
-			object_finish_times_bodyorcontent = []
-			object_finish_times_transfersize = []
-			object_sizes_har_bodysize = []
-			object_sizes_bodyorcontent = []
-			object_sizes_transfersize = []
-
-			har_timings_before_onload = []
-			for hart in har_timings:
-
-				harStatus = int(hart["status"])
-
-				# Compute finish time of this resource/object
-				try:
-					starttime = float(hart["start_delta"])
-					endtime = sum_timings([starttime, hart["blockedTime"], hart["dnsTime"], hart["connectTime"], hart["sendTime"], hart["waitTime"], hart["receiveTime"]])
-				except Exception as err:
-					if harStatus == 0:
-						logging.debug("Resource with no end time got no reply: " + str(hart["name"]))
-						endtime = starttime
-					elif harStatus < 0:
-						logging.warn("Resource got an unknown status code and no timings: " + str(hart["name"]))
-						endtime = starttime
-					else:
-						print("Error with " + str(hart))
-						raise(err)
-
-				if harOnLoadTime is None or harOnLoadTime == "NA":
-					# The browser did not log an onLoad event -- every logged resource is before onLoad then
-					har_timings_before_onload.append(hart)
-				elif endtime > harOnLoadTime:
-					harFinishedAfterOnLoad += 1
-					logging.debug("Resource finished after onLoad -- skipping " + str(hart["name"]))
-					continue
-				else:
-					har_timings_before_onload.append(hart)
+	har_timings = harrecord["entries"]
+
+	# Process HAR timings
+	if har_timings:
+
+		harNumberOfRequests = len(har_timings)
+		harFinishedAfterOnLoad = 0
+
+		harNoReply = 0
+		harStatus1xx = 0
+		harStatus200 = 0
+		harStatusOther2xx = 0
+		harStatus3xx = 0
+		harStatus4xx = 0
+		harStatus5xx = 0
+		harUnknownStatus = 0
+		harNonFailedRequests = 0 	# between 100 and 399
+
+		sum_of_respbodysize = 0
+		sum_of_contentlength = 0
+		sum_of_contentsize = 0
+		sum_of_bodyorcontent = 0
+		sum_of_transfersize = 0
+		respbodysizes_counted = 0
+		contentsizes_counted = 0
 
+		harFirst200Starttime = -1
+		harRedirectsBeforeFirst200 = 0
+		harLastRequestStartBeforeOnLoad = 0
+		harLastResourceEndBeforeOnLoad = 0
+
+		object_finish_times = []
+		object_finish_times_bodysize = []
+		object_finish_times_bodyorcontent = []
+		object_finish_times_transfersize = []
+		object_sizes_har_bodysize = []
+		object_sizes_bodyorcontent = []
+		object_sizes_transfersize = []
+
+		har_timings_before_onload = []
+		for hart in har_timings:
+
+			harStatus = hart["status"]
+
+			# Compute finish time of this resource/object
+			try:
+				starttime = hart["start_delta"]
+				endtime = sum_timings([starttime, hart["blockedTime"], hart["dnsTime"], hart["connectTime"], hart["sendTime"], hart["waitTime"], hart["receiveTime"]])
+			except Exception as err:
 				if harStatus == 0:
-					harNoReply += 1
-				elif harStatus >= 100 and harStatus < 200:
-					harStatus1xx += 1
-				elif harStatus == 200:
-					harStatus200 += 1
-					if harFirst200Starttime == -1:
-						harFirst200Starttime = starttime
-						harRedirectsBeforeFirst200 = harStatus3xx
-				elif harStatus >= 201 and harStatus < 300:
-					harStatusOther2xx += 1
-				elif harStatus >= 300 and harStatus < 400:
-					harStatus3xx += 1
-				elif harStatus >= 400 and harStatus < 500:
-					harStatus4xx += 1
-				elif harStatus >= 500 and harStatus < 600:
-					harStatus5xx += 1
+					logging.debug("Resource with no end time got no reply: " + str(hart["name"]))
+					endtime = starttime
 				elif harStatus < 0:
-					harUnknownStatus += 1
+					logging.warn("Resource got an unknown status code and no timings: " + str(hart["name"]))
+					endtime = starttime
 				else:
-					raise ValueError("Invalid HTTP Status code " + str(harStatus))
+					print("Error with " + str(hart))
+					raise(err)
+
+			if harOnLoadTime is None or harOnLoadTime == "NA":
+				# The browser did not log an onLoad event -- every logged resource is before onLoad then
+				har_timings_before_onload.append(hart)
+			elif endtime > harOnLoadTime:
+				harFinishedAfterOnLoad += 1
+				logging.debug("Resource finished after onLoad -- skipping " + str(hart["name"]))
+				continue
+			else:
+				har_timings_before_onload.append(hart)
+
+			if harStatus == 0:
+				harNoReply += 1
+			elif harStatus >= 100 and harStatus < 200:
+				harStatus1xx += 1
+			elif harStatus == 200:
+				harStatus200 += 1
+				if harFirst200Starttime == -1:
+					harFirst200Starttime = starttime
+					harRedirectsBeforeFirst200 = harStatus3xx
+			elif harStatus >= 201 and harStatus < 300:
+				harStatusOther2xx += 1
+			elif harStatus >= 300 and harStatus < 400:
+				harStatus3xx += 1
+			elif harStatus >= 400 and harStatus < 500:
+				harStatus4xx += 1
+			elif harStatus >= 500 and harStatus < 600:
+				harStatus5xx += 1
+			elif harStatus < 0:
+				harUnknownStatus += 1
+			else:
+				raise ValueError("Invalid HTTP Status code " + str(harStatus))
 
-				if starttime > harLastRequestStartBeforeOnLoad and harStatus != 0:
-					harLastRequestStartBeforeOnLoad = starttime
+			if starttime > harLastRequestStartBeforeOnLoad and harStatus != 0:
+				harLastRequestStartBeforeOnLoad = starttime
 
-				if endtime > harLastResourceEndBeforeOnLoad and harStatus != 0:
-					harLastResourceEndBeforeOnLoad = endtime
+			if endtime > harLastResourceEndBeforeOnLoad and harStatus != 0:
+				harLastResourceEndBeforeOnLoad = endtime
 
-				# If this is a successful object after the first 200 (or is the first 200)
-				# add object finish time to list
-				# so we can compute Object Index and Byte Index later
-				if harFirst200Starttime >= 0 and harStatus >= 100 and harStatus < 400:
-					object_finish_times.append(endtime)
+			# If this is a successful object after the first 200 (or is the first 200)
+			# add object finish time to list
+			# so we can compute Object Index and Byte Index later
+			if harFirst200Starttime >= 0 and harStatus >= 100 and harStatus < 400:
+				object_finish_times.append(endtime)
 
-				# Various possibilities for "object sizes":
+			# Various possibilities for "object sizes":
 
-				# What got logged as "response body size" in the HAR file (possibly compressed)
-				respbodysize = int(hart["respbodysize"])
-				if respbodysize <= 0:
-					respbodysize = 0
-				else:
-					respbodysizes_counted += 1
-					if harFirst200Starttime > 0 and harStatus >= 100 and harStatus < 400:
-						# Count body size of successful objects to compute ByteIndex later
-						object_sizes_har_bodysize.append(respbodysize)
-						object_finish_times_bodysize.append(endtime)
-
-				# What was in the HTTP response "Content-Length" header
-				try:
-					contentlength_from_header = int(hart["contentlengthheader"])
-				except ValueError:
-					contentlength_from_header = 0
-				if contentlength_from_header == -1:
-					contentlength_from_header = 0
-				# What got logged as "content size" in the HAR file (possibly non-compressed)
-				contentsize = int(hart["contentsize"])
-				if contentsize == -1:
-					contentsize = 0
-				else:
-					contentsizes_counted += 1
-
-				try:
-					# What got logged as "transfer size" in the HAR file (header + body)
-					transfersize = int(hart["resptransfersize"])
-					if transfersize > 0:
-						if harFirst200Starttime > 0 and harStatus >= 100 and harStatus < 400:
-							# Count transfer size of successful objects to compute ByteIndex later
-							object_sizes_transfersize.append(transfersize)
-							object_finish_times_transfersize.append(endtime)
-				except ValueError:
-					transfersize = 0
-
-				# To compute "sum of object sizes", we can just sum up any of these...
-				sum_of_respbodysize += respbodysize
-				sum_of_contentlength += contentlength_from_header
-				sum_of_contentsize += contentsize
-				sum_of_transfersize += transfersize
-
-				# ... or try to be smarter:
-				# if content-length exists, use it, otherwise use respbodysize
-				# Count Content-Length or body size of successful objects to compute ByteIndex later
-				if contentlength_from_header > 0:
-					sum_of_bodyorcontent += contentlength_from_header
-					object_sizes_bodyorcontent.append(contentlength_from_header)
-					object_finish_times_bodyorcontent.append(endtime)
-				elif respbodysize > 0:
-					sum_of_bodyorcontent += respbodysize
-					object_sizes_bodyorcontent.append(respbodysize)
-					object_finish_times_bodyorcontent.append(endtime)
-
-			harNonFailedRequests = harStatus1xx + harStatus200 + harStatusOther2xx + harStatus3xx
-
-			harObjectIndex = compute_object_index(object_finish_times, harFirst200Starttime)
-			harByteIndexBodysize = compute_byte_index(object_finish_times_bodysize, object_sizes_har_bodysize, harFirst200Starttime)
-			harByteIndexBodyorcontent = compute_byte_index(object_finish_times_bodyorcontent, object_sizes_bodyorcontent, harFirst200Starttime)
-			harByteIndexTransfersize = compute_byte_index(object_finish_times_transfersize, object_sizes_transfersize, harFirst200Starttime)
-
-			print("\nHAR file summary:\n\t\t" + str(harNumberOfRequests) + " Requests\n\t\t" + str(harFinishedAfterOnLoad) + " of which finished after onLoad\n\t\t" + str(harNoReply) + " of which had no reply\n\n\t\t" + str(harStatus1xx) + " Status 1xx\n\t\t" + str(harStatus200) + " Status 200\n\t\t" + str(harStatusOther2xx) + " Status 2xx other than 200\n\t\t" + str(harStatus3xx) + " Status 3xx\n\t\t" + str(harStatus4xx) + " Status 4xx\n\t\t" + str(harStatus5xx) + " Status 5xx\n\t\t" + str(harUnknownStatus) + " unknown status\n\n\t\t" + str(harNonFailedRequests) + " non-failed requests before onLoad (100 <= status < 400)")
-			print("\n\t\tfirst200StartTime:\t\t\t" + str(harFirst200Starttime) + "\n\t\tRedirects before first 200:\t\t" + str(harRedirectsBeforeFirst200) + "\n\t\tLast Request Start Before OnLoad:\t" + str(harLastRequestStartBeforeOnLoad) + "\n\t\tLast Resource end before onLoad:\t" + str(harLastResourceEndBeforeOnLoad) + "\n\t\tonLoad:\t\t\t\t\t" + str(harOnLoadTime))
-			print("\n\t\tSum of response body sizes:\t" + str(sum_of_respbodysize) + " (counted " + str(respbodysizes_counted) + ")\n\t\tSum of content lengths:\t\t" + str(sum_of_contentlength) + "\n\t\tSum of content size:\t\t" + str(sum_of_contentsize) + " (counted " + str(contentsizes_counted) + ")\n\t\tSum of body or contentlength:\t" + str(sum_of_bodyorcontent) + " (counted " + str(len(object_sizes_bodyorcontent)) + ")")
-			print("\n\t\tObject Index:\t\t\t" + str(harObjectIndex) + " (counted " + str(len(object_finish_times)) + ")\n\t\tByte Index (body size):\t\t" + str(harByteIndexBodysize) + " (counted " + str(len(object_sizes_har_bodysize)) + ")\n\t\tByte Index (Content-Length or body): " + str(harByteIndexBodyorcontent) + " (counted " + str(len(object_sizes_bodyorcontent)) + ")\n\t\tByte Index (TransferSize):\t" + str(harByteIndexTransfersize) + " (counted " + str(len(object_sizes_transfersize)) + ")")
+			# What got logged as "response body size" in the HAR file (possibly compressed)
+			respbodysize = hart["respbodysize"]
+			if respbodysize <= 0:
+				respbodysize = 0
+			else:
+				respbodysizes_counted += 1
+				if harFirst200Starttime > 0 and harStatus >= 100 and harStatus < 400:
+					# Count body size of successful objects to compute ByteIndex later
+					object_sizes_har_bodysize.append(respbodysize)
+					object_finish_times_bodysize.append(endtime)
 
-		else:
-			# No HAR timings - no valid values
-			harNumberOfRequests = "NA"
-			harFinishedAfterOnLoad = "NA"
-			harNoReply = "NA"
-			harStatus1xx = "NA"
-			harStatus200 = "NA"
-			harStatusOther2xx = "NA"
-			harStatus3xx = "NA"
-			harStatus4xx = "NA"
-			harStatus5xx = "NA"
-			harUnknownStatus = "NA"
-			harNonFailedRequests = "NA"
-
-			sum_of_respbodysize = "NA"
-			sum_of_contentlength = "NA"
-			sum_of_contentsize = "NA"
-			sum_of_bodyorcontent = "NA"
-
-			harFirst200Starttime = "NA"
-			harRedirectsBeforeFirst200 = "NA"
-			harLastRequestStartBeforeOnLoad = "NA"
-			harLastResourceEndBeforeOnLoad = "NA"
-
-			harObjectIndex = "NA"
-			harByteIndexBodysize = "NA"
-			harByteIndexBodyorcontent = "NA"
-
-			har_timings = []
-			max_hartiming = "NA"
-
-
-		# Process Resource Timings
-		try:
-			res_timings = read_csvfile(run + "res/" + pagelabel + RESTIMINGS_FILENAME, restiming_fields)
-			if res_timings:
-
-				resNumberOfResources = len(res_timings)
-				resFinishedAfterOnLoad = 0
-				resLastResourceEndBeforeOnLoad = 0
-
-				sum_of_resource_encoded = 0
-				sum_of_resource_decoded = 0
-
-				resObjectIndex = 0
-				resByteIndex = 0
-
-				object_end_times_res = []
-				res_timings_before_onload = []
-				object_sizes_res = []
-
-				for rest in res_timings:
-					# Find last resource load end time before onLoad event
-					endtime = float(rest["responseEnd"])
-					if float(navt["loadEventStart"]) > 0 and endtime > float(navt["loadEventStart"]):
-						logging.debug("Resource load ended after load Event started -- skipping " + str(rest["name"]))
-						resFinishedAfterOnLoad += 1
-						continue
-					else:
-						res_timings_before_onload.append(rest)
-					if endtime > resLastResourceEndBeforeOnLoad:
-						resLastResourceEndBeforeOnLoad = endtime
-					# Sum resource sizes before onLoad
-					sum_of_resource_encoded += int(rest["encodedBodySize"])
-					sum_of_resource_decoded += int(rest["decodedBodySize"])
-
-					# Object end times (for Object and Byte Index) and object sizes (for Byte Index)
-					object_end_times_res.append(endtime)
-					object_sizes_res.append(int(rest["encodedBodySize"]))
-
-				resNumberOfResourcesFinishedBeforeOnLoad = resNumberOfResources - resFinishedAfterOnLoad
-				resObjectIndex = compute_object_index(object_end_times_res, float(navt["fetchStart"]))
-				resByteIndex = compute_byte_index(object_end_times_res, object_sizes_res, float(navt["fetchStart"]))
-
-				print("\nResource timings summary:\n\t\t" + str(resNumberOfResources) + " Requests\n\t\t" + str(resFinishedAfterOnLoad) + " of which finished after onLoad\n\n\t\t" + str(resNumberOfResourcesFinishedBeforeOnLoad) + " Resources finished before OnLoad\n\t\tLast Resource end before onLoad:\t" + str(resLastResourceEndBeforeOnLoad) + "\n\n\t\tSum of encoded sizes:\t\t" + str(sum_of_resource_encoded) + "\n\t\tSum of decoded sizes:\t\t" + str(sum_of_resource_decoded))
-				print("\n\t\tObject Index:\t\t\t" + str(resObjectIndex) + " (counted " + str(len(object_end_times_res)) + ")\n\t\tByte Index:\t\t\t" + str(resByteIndex))
+			# What was in the HTTP response "Content-Length" header
+			try:
+				contentlength_from_header = int(hart["contentlengthheader"])
+			except ValueError:
+				contentlength_from_header = 0
+			if contentlength_from_header == -1:
+				contentlength_from_header = 0
+			# What got logged as "content size" in the HAR file (possibly non-compressed)
+			contentsize = hart["contentsize"]
+			if contentsize == -1:
+				contentsize = 0
 			else:
-				resNumberOfResources = "NA"
-				resFinishedAfterOnLoad = "NA"
-				resLastResourceBeforeOnLoad = "NA"
+				contentsizes_counted += 1
+
+			try:
+				# What got logged as "transfer size" in the HAR file (header + body)
+				transfersize = int(hart["resptransfersize"])
+				if transfersize > 0:
+					if harFirst200Starttime > 0 and harStatus >= 100 and harStatus < 400:
+						# Count transfer size of successful objects to compute ByteIndex later
+						object_sizes_transfersize.append(transfersize)
+						object_finish_times_transfersize.append(endtime)
+			except ValueError:
+				transfersize = 0
+
+			# To compute "sum of object sizes", we can just sum up any of these...
+			sum_of_respbodysize += respbodysize
+			sum_of_contentlength += contentlength_from_header
+			sum_of_contentsize += contentsize
+			sum_of_transfersize += transfersize
+
+			# ... or try to be smarter:
+			# if content-length exists, use it, otherwise use respbodysize
+			# Count Content-Length or body size of successful objects to compute ByteIndex later
+			if contentlength_from_header > 0:
+				sum_of_bodyorcontent += contentlength_from_header
+				object_sizes_bodyorcontent.append(contentlength_from_header)
+				object_finish_times_bodyorcontent.append(endtime)
+			elif respbodysize > 0:
+				sum_of_bodyorcontent += respbodysize
+				object_sizes_bodyorcontent.append(respbodysize)
+				object_finish_times_bodyorcontent.append(endtime)
+
+		harNonFailedRequests = harStatus1xx + harStatus200 + harStatusOther2xx + harStatus3xx
+
+		harObjectIndex = compute_object_index(object_finish_times, harFirst200Starttime)
+		harByteIndexBodysize = compute_byte_index(object_finish_times_bodysize, object_sizes_har_bodysize, harFirst200Starttime)
+		harByteIndexBodyorcontent = compute_byte_index(object_finish_times_bodyorcontent, object_sizes_bodyorcontent, harFirst200Starttime)
+		harByteIndexTransfersize = compute_byte_index(object_finish_times_transfersize, object_sizes_transfersize, harFirst200Starttime)
+
+		print("\nHAR file summary:\n\t\t" + str(harNumberOfRequests) + " Requests\n\t\t" + str(harFinishedAfterOnLoad) + " of which finished after onLoad\n\t\t" + str(harNoReply) + " of which had no reply\n\n\t\t" + str(harStatus1xx) + " Status 1xx\n\t\t" + str(harStatus200) + " Status 200\n\t\t" + str(harStatusOther2xx) + " Status 2xx other than 200\n\t\t" + str(harStatus3xx) + " Status 3xx\n\t\t" + str(harStatus4xx) + " Status 4xx\n\t\t" + str(harStatus5xx) + " Status 5xx\n\t\t" + str(harUnknownStatus) + " unknown status\n\n\t\t" + str(harNonFailedRequests) + " non-failed requests before onLoad (100 <= status < 400)")
+		print("\n\t\tfirst200StartTime:\t\t\t" + str(harFirst200Starttime) + "\n\t\tRedirects before first 200:\t\t" + str(harRedirectsBeforeFirst200) + "\n\t\tLast Request Start Before OnLoad:\t" + str(harLastRequestStartBeforeOnLoad) + "\n\t\tLast Resource end before onLoad:\t" + str(harLastResourceEndBeforeOnLoad) + "\n\t\tonLoad:\t\t\t\t\t" + str(harOnLoadTime))
+		print("\n\t\tSum of response body sizes:\t" + str(sum_of_respbodysize) + " (counted " + str(respbodysizes_counted) + ")\n\t\tSum of content lengths:\t\t" + str(sum_of_contentlength) + "\n\t\tSum of content size:\t\t" + str(sum_of_contentsize) + " (counted " + str(contentsizes_counted) + ")\n\t\tSum of body or contentlength:\t" + str(sum_of_bodyorcontent) + " (counted " + str(len(object_sizes_bodyorcontent)) + ")")
+		print("\n\t\tObject Index:\t\t\t" + str(harObjectIndex) + " (counted " + str(len(object_finish_times)) + ")\n\t\tByte Index (body size):\t\t" + str(harByteIndexBodysize) + " (counted " + str(len(object_sizes_har_bodysize)) + ")\n\t\tByte Index (Content-Length or body): " + str(harByteIndexBodyorcontent) + " (counted " + str(len(object_sizes_bodyorcontent)) + ")\n\t\tByte Index (TransferSize):\t" + str(harByteIndexTransfersize) + " (counted " + str(len(object_sizes_transfersize)) + ")")
 
-				resObjectIndex = "NA"
-				resByteIndex = "NA"
+	else:
+		# No HAR timings - no valid values
+		harNumberOfRequests = "NA"
+		harFinishedAfterOnLoad = "NA"
+		harNoReply = "NA"
+		harStatus1xx = "NA"
+		harStatus200 = "NA"
+		harStatusOther2xx = "NA"
+		harStatus3xx = "NA"
+		harStatus4xx = "NA"
+		harStatus5xx = "NA"
+		harUnknownStatus = "NA"
+		harNonFailedRequests = "NA"
+
+		sum_of_respbodysize = "NA"
+		sum_of_contentlength = "NA"
+		sum_of_contentsize = "NA"
+		sum_of_bodyorcontent = "NA"
+
+		harFirst200Starttime = "NA"
+		harRedirectsBeforeFirst200 = "NA"
+		harLastRequestStartBeforeOnLoad = "NA"
+		harLastResourceEndBeforeOnLoad = "NA"
+
+		harObjectIndex = "NA"
+		harByteIndexBodysize = "NA"
+		harByteIndexBodyorcontent = "NA"
+
+		har_timings = []
+		max_hartiming = "NA"
+
+
+	# Process Resource Timings
+	try:
+		res_timings = read_csvfile(run + "res/" + pagelabel + RESTIMINGS_FILENAME, restiming_fields)
+		if res_timings:
 
+			resNumberOfResources = len(res_timings)
+			resFinishedAfterOnLoad = 0
+			resLastResourceEndBeforeOnLoad = 0
 
-			smart_total_page_size = compare_har_to_resource(har_timings_before_onload, res_timings_before_onload, run, pagelabel, logfile=compare_logfile)
-			print("\n\t\tSmart total page size:\t\t" + str(smart_total_page_size))
+			sum_of_resource_encoded = 0
+			sum_of_resource_decoded = 0
 
-		except Exception as err:
-			print("Something went wrong with restimings: " + str(err))
+			resObjectIndex = 0
+			resByteIndex = 0
+
+			object_end_times_res = []
+			res_timings_before_onload = []
+			object_sizes_res = []
 
+			for rest in res_timings:
+				# Find last resource load end time before onLoad event
+				endtime = float(rest["responseEnd"])
+				if float(navt["loadEventStart"]) > 0 and endtime > float(navt["loadEventStart"]):
+					logging.debug("Resource load ended after load Event started -- skipping " + str(rest["name"]))
+					resFinishedAfterOnLoad += 1
+					continue
+				else:
+					res_timings_before_onload.append(rest)
+				if endtime > resLastResourceEndBeforeOnLoad:
+					resLastResourceEndBeforeOnLoad = endtime
+				# Sum resource sizes before onLoad
+				sum_of_resource_encoded += int(rest["encodedBodySize"])
+				sum_of_resource_decoded += int(rest["decodedBodySize"])
+
+				# Object end times (for Object and Byte Index) and object sizes (for Byte Index)
+				object_end_times_res.append(endtime)
+				object_sizes_res.append(int(rest["encodedBodySize"]))
+
+			resNumberOfResourcesFinishedBeforeOnLoad = resNumberOfResources - resFinishedAfterOnLoad
+			resObjectIndex = compute_object_index(object_end_times_res, float(navt["fetchStart"]))
+			resByteIndex = compute_byte_index(object_end_times_res, object_sizes_res, float(navt["fetchStart"]))
+
+			print("\nResource timings summary:\n\t\t" + str(resNumberOfResources) + " Requests\n\t\t" + str(resFinishedAfterOnLoad) + " of which finished after onLoad\n\n\t\t" + str(resNumberOfResourcesFinishedBeforeOnLoad) + " Resources finished before OnLoad\n\t\tLast Resource end before onLoad:\t" + str(resLastResourceEndBeforeOnLoad) + "\n\n\t\tSum of encoded sizes:\t\t" + str(sum_of_resource_encoded) + "\n\t\tSum of decoded sizes:\t\t" + str(sum_of_resource_decoded))
+			print("\n\t\tObject Index:\t\t\t" + str(resObjectIndex) + " (counted " + str(len(object_end_times_res)) + ")\n\t\tByte Index:\t\t\t" + str(resByteIndex))
+		else:
 			resNumberOfResources = "NA"
 			resFinishedAfterOnLoad = "NA"
 			resLastResourceBeforeOnLoad = "NA"
-			resNumberOfResourcesFinishedBeforeOnLoad = "NA"
-			smart_total_page_size = "NA"
 
 			resObjectIndex = "NA"
 			resByteIndex = "NA"
 
+
+		smart_total_page_size = compare_har_to_resource(har_timings_before_onload, res_timings_before_onload, run, pagelabel, logfile=compare_logfile)
+		print("\n\t\tSmart total page size:\t\t" + str(smart_total_page_size))
+
+	except Exception as err:
+		print("Something went wrong with restimings: " + str(err))
+
+		resNumberOfResources = "NA"
+		resFinishedAfterOnLoad = "NA"
+		resLastResourceBeforeOnLoad = "NA"
+		resNumberOfResourcesFinishedBeforeOnLoad = "NA"
+		smart_total_page_size = "NA"
+
+		resObjectIndex = "NA"
+		resByteIndex = "NA"
+
+	rowfile = io.StringIO()
+	csv.writer(rowfile, delimiter=",").writerow([navt["page"], navt["scenario"], navt["starttime"], navt["fetchStart"], navt["responseStart"], navt["domInteractive"], navt["domContentLoadedEventStart"], navt["domContentLoadedEventEnd"], navt["domComplete"], navt["loadEventStart"], navt["loadEventEnd"], navt["firstPaint"],
+		str(harNumberOfRequests), str(harFinishedAfterOnLoad), str(harNoReply), str(harStatus1xx), str(harStatus200), str(harStatusOther2xx), str(harStatus3xx), str(harStatus4xx), str(harStatus5xx), str(harUnknownStatus), str(harNonFailedRequests), str(harStartTime),
+		str(harFirst200Starttime), str(harRedirectsBeforeFirst200), str(harLastRequestStartBeforeOnLoad), str(harLastResourceEndBeforeOnLoad), str(harOnLoadTime), str(harContentLoadTime),
+		str(harObjectIndex), str(harByteIndexBodysize), str(harByteIndexBodyorcontent), str(harByteIndexTransfersize),
+		str(sum_of_respbodysize), str(sum_of_contentlength), str(sum_of_contentsize), str(sum_of_bodyorcontent), str(sum_of_transfersize),
+		str(resNumberOfResources), str(resFinishedAfterOnLoad), str(resNumberOfResourcesFinishedBeforeOnLoad), str(resLastResourceEndBeforeOnLoad),
+		str(sum_of_resource_encoded), str(sum_of_resource_decoded),
+		str(resObjectIndex), str(resByteIndex),
+		str(smart_total_page_size)
+		])
+
+	return (rowfile.getvalue(), compare_logfile.getvalue())
+
+def get_pagelabel(navt):
+	return str(navt["page"].split('/')[2] + "+" + navt["starttime"])
+
+# Packet capture segment of a page load, relative to the run directory, or None if the capture was not segmented
+def get_capture_segment(run, pagelabel):
+	segment = CAPTURE_SEGMENT_DIR + pagelabel + CAPTURE_SEGMENT_SUFFIX
+	if os.path.exists(run + segment):
+		return segment
+	return None
+
+# Store the results of one page load, so compute_timings does not have to compute them again
+def write_page_results(run, navt, row, comparerows):
+	createDirectory(run + PAGE_RESULTS_DIR)
+	pagepath = run + PAGE_RESULTS_DIR + get_pagelabel(navt)
+	# Write the row last and atomically: if it exists, the results are complete
+	with open(pagepath + PAGE_COMPARE_SUFFIX, "w", newline='') as comparefile:
+		comparefile.write(comparerows)
+	with open(pagepath + PAGE_ROW_SUFFIX + ".tmp", "w", newline='') as rowfile:
+		rowfile.write(row)
+	os.rename(pagepath + PAGE_ROW_SUFFIX + ".tmp", pagepath + PAGE_ROW_SUFFIX)
+
+# When the code that computes the results of a page load last changed
+def get_code_mtime():
+	return max([ os.path.getmtime(module.__file__) for module in [ sys.modules[__name__], hartimings, timestamps, validate_object_size ] ])
+
+# Read stored results of one page load, None if there are none or if they may be outdated:
+# if its HAR file, HAR timings log, or Resource Timings changed since, if its HAR timings log was deleted,
+# or if the code that computes them changed since
+def read_page_results(run, navt):
+	pagelabel = get_pagelabel(navt)
+	pagepath = run + PAGE_RESULTS_DIR + pagelabel
+	try:
+		computed = os.path.getmtime(pagepath + PAGE_ROW_SUFFIX)
+		if get_code_mtime() > computed:
+			return None
+		harfile = hartimings.find_harfile(run + "har/" + pagelabel)
+		hartimingslogfile = run + "har/" + pagelabel + ".har.log"
+		if os.path.exists(harfile) and not os.path.exists(hartimingslogfile):
+			return None
+		for inputfile in [ harfile, hartimingslogfile, run + "res/" + pagelabel + RESTIMINGS_FILENAME, run + "res/" + pagelabel + OBJTIMINGS_FILENAME ]:
+			if os.path.exists(inputfile) and os.path.getmtime(inputfile) > computed:
+				return None
+		with open(pagepath + PAGE_ROW_SUFFIX, "r", newline='') as rowfile:
+			row = rowfile.read()
+		with open(pagepath + PAGE_COMPARE_SUFFIX, "r", newline='') as comparefile:
+			comparerows = comparefile.read()
+	except (IOError, OSError):
+		return None
+	return (row, comparerows)
+
+# Results of one page load: stored ones if they exist, otherwise compute them
+def get_page_timings(navt, run):
+	results = read_page_results(run, navt)
+	if results is not None:
+		logging.debug("Using stored results for " + run + get_pagelabel(navt))
+		return results
+	return compute_page_timings(navt, run)
+
+# Results of one page load as by get_page_timings, and what computing them printed
+def get_page_timings_captured(navt, run):
+	output = io.StringIO()
+	with contextlib.redirect_stdout(output):
+		(row, comparerows) = get_page_timings(navt, run)
+	return (row, comparerows, output.getvalue())
+
+# Results of all page loads in order, computed by a pool of this many processes if jobs > 1
+# What computing them prints is printed in order as well, as if they were computed one after another
+def get_all_page_timings(navtimings, run, jobs=1):
+	if jobs <= 1 or len(navtimings) <= 1:
+		for navt in navtimings:
+			yield get_page_timings(navt, run)
+		return
+
+	# Some pages take much longer than others, so hand them out in small chunks
+	chunksize = max(1, len(navtimings) // (jobs * 8))
+	with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+		for (row, comparerows, output) in pool.map(get_page_timings_captured, navtimings, itertools.repeat(run), chunksize=chunksize):
+			sys.stdout.write(output)
+			yield (row, comparerows)
+
+def compute_timings(navtimings, run, log=False, jobs=1):
+
+	compare_logfile = None
+
+	if log:
+		# Logfile for timings and per-page statistics
+		try:
+			if os.path.exists(run + LOGFILENAME):
+				os.remove(run + LOGFILENAME)
+				print("Deleted old " + run + LOGFILENAME)
+		except Exception as err:
+			print("Could not delete " + run + LOGFILENAME + ": " + str(err))
+		# Write to temporary files first, so there is never a half-written log if a page load fails
+		try:
+			csvfile = open(run + LOGFILENAME + ".tmp", "w", newline='')
+		except TypeError as e:
+			print("Error opening " + run + LOGFILENAME + ": " + str(e))
+			csvfile = open(run + LOGFILENAME + ".tmp", 'wb')
+
+		# Logfile for comparing HAR objects to Resource Timing objects
+		logfilename = run + "compare_har_res.log"
+		try:
+			if os.path.exists(logfilename):
+				os.remove(logfilename)
+				print("Deleted old " + logfilename)
+		except Exception as err:
+			print("Could not delete " + logfilename + ": " + str(err))
+		try:
+			compare_logfile = open(logfilename + ".tmp", "w", newline='')
+		except TypeError as e:
+			print("Error opening " + logfilename + ": " + str(e))
+			compare_logfile = open(logfilename + ".tmp", 'wb')
+
+
+	# For each Navigation Timing, also get HAR file content and resource timings
+	try:
+		for (row, comparerows) in get_all_page_timings(list(navtimings), run, jobs):
+			if log:
+				csvfile.write(row)
+				compare_logfile.write(comparerows)
+	except Exception:
 		if log:
-			csvwriter.writerow([navt["page"], navt["scenario"], navt["starttime"], navt["fetchStart"], navt["responseStart"], navt["domInteractive"], navt["domContentLoadedEventStart"], navt["domContentLoadedEventEnd"], navt["domComplete"], navt["loadEventStart"], navt["loadEventEnd"], navt["firstPaint"],
-			str(harNumberOfRequests), str(harFinishedAfterOnLoad), str(harNoReply), str(harStatus1xx), str(harStatus200), str(harStatusOther2xx), str(harStatus3xx), str(harStatus4xx), str(harStatus5xx), str(harUnknownStatus), str(harNonFailedRequests), str(harStartTime),
-			str(harFirst200Starttime), str(harRedirectsBeforeFirst200), str(harLastRequestStartBeforeOnLoad), str(harLastResourceEndBeforeOnLoad), str(harOnLoadTime), str(harContentLoadTime),
-			str(harObjectIndex), str(harByteIndexBodysize), str(harByteIndexBodyorcontent), str(harByteIndexTransfersize),
-			str(sum_of_respbodysize), str(sum_of_contentlength), str(sum_of_contentsize), str(sum_of_bodyorcontent), str(sum_of_transfersize),
-			str(resNumberOfResources), str(resFinishedAfterOnLoad), str(resNumberOfResourcesFinishedBeforeOnLoad), str(resLastResourceEndBeforeOnLoad),
-			str(sum_of_resource_encoded), str(sum_of_resource_decoded),
-			str(resObjectIndex), str(resByteIndex),
-			str(smart_total_page_size)
-			])
+			csvfile.close()
+			compare_logfile.close()
+			os.remove(run + LOGFILENAME + ".tmp")
+			os.remove(logfilename + ".tmp")
+		raise
 
 	if log:
 		csvfile.close()
+		os.rename(run + LOGFILENAME + ".tmp", run + LOGFILENAME)
 
 		print("Logged to " + logfilename)
 		compare_logfile.close()
+		os.rename(logfilename + ".tmp", logfilename)
 
 
 def navtiming_exists(run, url, starttime, navtimings):
@@ -701,7 +918,7 @@ def dump_packets(run, url, starttime):
 
 	DUMP_TRACE_SCRIPT = "./get_trace_for_timestamps.sh"
 
-	starttimings = read_starttimings(run)
+	starttimings = get_node_starttimings(read_starttimings(run), read_merged_pages(run), domainname + "+" + starttime)
 	starttime_to_match = starttime.replace("+", " ").replace("-", ":").replace(":", "-", 2)
 
 	for index, startt in enumerate(starttimings):
@@ -713,12 +930,14 @@ def dump_packets(run, url, starttime):
 				timestamp2 = nextpage["starttime"]
 			except IndexError:
 				# This is the last URL in starttimings - make the second timestamp 33 seconds later
-				timestamp2 = datetime.datetime.strftime(datetime.datetime.strptime(timestamp1, "%Y-%m-%d %H:%M:%S.%f") + datetime.timedelta(seconds=33), "%Y-%m-%d %H:%M:%S.%f")
+				timestamp2 = timestamps.format_time(timestamps.parse_time(timestamp1, timestamps.SPACE_FORMAT) + 33 * timestamps.US_PER_SECOND, timestamps.SPACE_FORMAT)
 			#print("Next page " + nextpage["url"] + " at index " + str(index + 1) + ", started at " + str(nextpage["starttime"]))
 			break
 
-	print("Running " + str(DUMP_TRACE_SCRIPT) + " " + run + " " + domainname + " " + timestamp1 + " " + timestamp2)
-	subprocess.run(DUMP_TRACE_SCRIPT + " "+ run + " " +  domainname + " \"" +  timestamp1 + "\" \"" + timestamp2 + "\"", shell=True)
+	# Only read the packets of this page load, if the capture was segmented
+	segment = get_capture_segment(run, domainname + "+" + starttime)
+	print("Running " + str(DUMP_TRACE_SCRIPT) + " " + run + " " + domainname + " " + timestamp1 + " " + timestamp2 + (" " + segment if segment else ""))
+	subprocess.run(DUMP_TRACE_SCRIPT + " "+ run + " " +  domainname + " \"" +  timestamp1 + "\" \"" + timestamp2 + "\"" + (" \"" + segment + "\"" if segment else ""), shell=True)
 
 def analyze_failed_page_load(run, url, starttime, plotlabel, navt):
 	print("Analyzing failed page load for " + plotlabel)
@@ -820,6 +1039,12 @@ def read_starttimings(run):
 	if os.path.exists(starttimingsfilename):
 		print("Starttimings file: " + str(starttimingsfilename))
 		starttimings = read_csvfile(starttimingsfilename, ["url", "starttime"])
+		# Convert all timestamps at once, so we only compare them later (see find_first_url_in_starttimings)
+		try:
+			for (startt, starttime_us) in zip(starttimings, timestamps.parse_times([ startt["starttime"] for startt in starttimings ], timestamps.SPACE_FORMAT)):
+				startt["starttime_us"] = starttime_us
+		except (ValueError, TypeError):
+			pass
 
 	if not starttimings:
 		# Fall back to just reading the original workload file
@@ -830,9 +1055,38 @@ def read_starttimings(run):
 
 	return starttimings
 
+# Start of a page load from starttimings in microseconds since the epoch, converting it only once
+def get_starttime_us(startt):
+	try:
+		return startt["starttime_us"]
+	except KeyError:
+		startt["starttime_us"] = timestamps.parse_time(startt["starttime"], timestamps.SPACE_FORMAT)
+		return startt["starttime_us"]
+
+# Page label of a line of starttimings
+def get_starttiming_pagelabel(startt):
+	return startt["url"].split('/')[2] + "+" + startt["starttime"].replace(" ", "+").replace(":", "-")
+
+# Node of every page label of a run merged from the runs of several hosts (see merge_runs.py),
+# None if the run was not merged
+def read_merged_pages(run):
+	if not os.path.exists(run + MERGED_PAGES_FILENAME):
+		return None
+	return dict([ (merged["pagelabel"], merged["node"]) for merged in read_csvfile(run + MERGED_PAGES_FILENAME, merged_pages_fields) or [] ])
+
+# Start timings of the page loads of the same node as this page load, in the order of its clock, if the run
+# was merged from several nodes -- timestamps of a node (e.g., of its packets) can only be compared to its own
+# Otherwise all start timings
+def get_node_starttimings(starttimings, mergedpages, pagelabel):
+	if mergedpages is None or pagelabel not in mergedpages:
+		return starttimings
+	node = mergedpages[pagelabel]
+	return sorted([ startt for startt in starttimings if mergedpages.get(get_starttiming_pagelabel(startt)) == node ], key=get_starttime_us)
+
+# Page load from starttimings that this timestamp (microseconds since the epoch) belongs to, as (url, starttime)
 def find_first_url_in_starttimings(starttimings, timestamp):
 	for (index, startt) in enumerate(starttimings):
-		if timestamp >= datetime.datetime.strptime(startt["starttime"], "%Y-%m-%d %H:%M:%S.%f") and index == len(starttimings)-1 or timestamp < datetime.datetime.strptime(starttimings[index+1]["starttime"], "%Y-%m-%d %H:%M:%S.%f"):
+		if timestamp >= get_starttime_us(startt) and index == len(starttimings)-1 or timestamp < get_starttime_us(starttimings[index+1]):
 			return (startt["url"], startt["starttime"])
 	return (None, None)
 
@@ -928,7 +1182,114 @@ def check_which_were_successful(run, plotlabel, navtimings, workload_filter=None
 		raise(err)
 
 # Process runs, call plotting functions on each of them
+# Run function(run, *args) for every run, in a pool of this many processes if jobs > 1
+# Each run's console output is printed in one piece when it is done, an exception only ends its own run
+# Returns the runs that failed
+def process_runs(runs, function, args=(), jobs=1):
+	failed = []
+	if jobs <= 1 or len(runs) <= 1:
+		for run in runs:
+			(output, error) = process_run_captured(run, function, args, capture=False)
+			if error is not None:
+				print("Could not process " + run + ": " + error)
+				failed.append(run)
+		return failed
+
+	with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+		futures = dict([ (pool.submit(process_run_captured, run, function, args), run) for run in runs ])
+		for future in concurrent.futures.as_completed(futures):
+			run = futures[future]
+			try:
+				(output, error) = future.result()
+			except Exception as err:
+				# The worker process itself died
+				(output, error) = ("", str(type(err).__name__) + ": " + str(err))
+			print("===== " + run + " =====")
+			sys.stdout.write(output)
+			if error is not None:
+				print("Could not process " + run + ": " + error)
+				failed.append(run)
+			sys.stdout.flush()
+	return failed
+
+# Run function(run, *args), capturing what it prints if capture is set
+# Returns the output and None, or an error message
+def process_run_captured(run, function, args=(), capture=True):
+	output = io.StringIO()
+	error = None
+	with (contextlib.redirect_stdout(output) if capture else contextlib.suppress()):
+		try:
+			function(run, *args)
+		except Exception as err:
+			traceback.print_exc(file=sys.stdout)
+			error = str(type(err).__name__) + ": " + str(err)
+		sys.stdout.flush()
+	return (output.getvalue(), error)
+
+# Get "--jobs N" (or "--jobs=N") out of the command line arguments
+# Returns the number of jobs (default: 1) and the remaining arguments
+def get_jobs_argument(argv):
+	jobs = 1
+	remaining = []
+	index = 0
+	while index < len(argv):
+		arg = argv[index]
+		try:
+			if arg == "--jobs":
+				jobs = int(argv[index + 1])
+				index += 2
+				continue
+			elif arg.startswith("--jobs="):
+				jobs = int(arg.split("=", 1)[1])
+				index += 1
+				continue
+		except (IndexError, ValueError):
+			print("Invalid " + arg + " -- using one process")
+			index += 1
+			continue
+		remaining.append(arg)
+		index += 1
+	return (max(1, jobs), remaining)
+
+# Compute the timings of one run, the pages in a pool of this many processes if jobs > 1
+def process_run(run, workload=None, logtofile=True, jobs=1):
+	if run[-1] != "/":
+		run = run + "/"
+
+	createDirectory(run + "plots/")
+	runlabel= list(filter(None, run.split('/')))[-1]
+	plotlabel = runlabel
+
+	# Get all Navigation Timings as list of dicts
+	navtimings = read_navtimings(run)
+
+	if workload is not None:
+		navtimings = filter_timings(navtimings, workload, key="page")
+		plotlabel = '_'.join(workload) + '_' + plotlabel
+
+	if navtimings is None or len(navtimings) < 1:
+		print("Could not get navtimings for " + run + '...' + ("" if workload is None else ", " + str(workload)))
+		#continue
+
+	# The following requires workload_output.log and urlfile-*.log from the run(s)
+	# and, preferably, the .pcap file(s), so we can analyze the failure modes for failed runs
+
+	try:
+		successful_workload = check_which_were_successful(run, plotlabel, navtimings, workload_filter = workload, log=logtofile)
+
+		# Only plot and log timings for successful runs, i.e.:
+		# There exist Navigation Timings, Resource Timings, and a HAR file
+		successful_timestamps = [ s.split("+", 1)[1] for s in successful_workload ]
+		navtimings = filter_timings(navtimings, successful_timestamps, "starttime")
+	except Exception as e:
+		print("No workload_output.log found - cannot check for successful runs, using all runs instead.")
+
+	compute_timings(navtimings, run, log=logtofile, jobs=jobs)
+	if logtofile:
+		print("!!! Logged " + run + "!!!")
+
 def main(argv=[]):
+	(jobs, argv) = get_jobs_argument(argv)
 	runfilter=None
 	logtofile = True
 	if (len(argv) > 1):
@@ -938,7 +1299,7 @@ def main(argv=[]):
 	else:
 		workload = None
 	if (len(argv) > 3):
-		print("Trying to set log level to " + argv[4])
+		print("Trying to set log level to " + argv[3])
 		root = logging.getLogger()
 		if "debug" in argv[3]:
 			root.setLevel(logging.DEBUG)
@@ -954,41 +1315,15 @@ def main(argv=[]):
 	if runfilter is not None:
 		runs = [ r for r in runs if runfilter in r ]
 	print("Runs: " + str(runs) + "\n")
-	for run in runs:
-		if run[-1] != "/":
-			run = run + "/"
-
-		createDirectory(run + "plots/")
-		runlabel= list(filter(None, run.split('/')))[-1]
-		plotlabel = runlabel
-
-		# Get all Navigation Timings as list of dicts
-		navtimings = read_navtimings(run)
-
-		if workload is not None:
-			navtimings = filter_timings(navtimings, workload, key="page")
-			plotlabel = '_'.join(workload) + '_' + plotlabel
-
-		if navtimings is None or len(navtimings) < 1:
-			print("Could not get navtimings for " + run + '...' + ("" if workload is None else ", " + str(workload)))
-			#continue
-
-		# The following requires workload_output.log and urlfile-*.log from the run(s)
-		# and, preferably, the .pcap file(s), so we can analyze the failure modes for failed runs
-
-		try:
-			successful_workload = check_which_were_successful(run, plotlabel, navtimings, workload_filter = workload, log=logtofile)
-
-			# Only plot and log timings for successful runs, i.e.:
-			# There exist Navigation Timings, Resource Timings, and a HAR file
-			successful_timestamps = [ s.split("+", 1)[1] for s in successful_workload ]
-			navtimings = filter_timings(navtimings, successful_timestamps, "starttime")
-		except Exception as e:
-			print("No workload_output.log found - cannot check for successful runs, using all runs instead.")
-
-		compute_timings(navtimings, run, log=logtofile)
-		if logtofile:
-			print("!!! Logged " + run + "!!!")
+	if len(runs) > 1:
+		# One process per run, each computing its pages one after another
+		failed = process_runs(runs, process_run, (workload, logtofile), jobs)
+	else:
+		# All processes for the pages of this run
+		failed = process_runs(runs, process_run, (workload, logtofile, jobs))
+	if failed:
+		print("Failed runs: " + str(failed))
+	return 1 if failed else 0
 
 if __name__ == "__main__":
-	main(sys.argv)
+	sys.exit(main(sys.argv))
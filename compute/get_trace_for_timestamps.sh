@@ -2,10 +2,13 @@
 #
 # Get all DNS and HTTP traffic from a trace, log some relevant info to file
 # This only works if a pcap file exists!
+#
+# Usage: ./get_trace_for_timestamps.sh RUN PAGENAME TIMESTAMP1 TIMESTAMP2 [PCAPFILE]
+#        PCAPFILE: relative to RUN, e.g., the capture segment of this page load (default: pcap/local:eth0.pcap)
 
 SSLKEYLOGFILE="ssl_keys.log"
 
-PCAPFILE="pcap/local:eth0.pcap"
+PCAPFILE="${5:-pcap/local:eth0.pcap}"
 
 
 RUN="$1"
@@ -22,6 +25,6 @@ dir_before=$PWD
 cd "$RUN"
 echo "Getting packets from $TIMESTAMP1 to $TIMESTAMP2 for pcap/${PAGENAME}+${TIMESTAMP1_PRINT}_packets.log"
 
-tshark -o ssl.keylog_file:$SSLKEYLOGFILE -Y "frame.time >= \"$TIMESTAMP1\" and frame.time < \"$TIMESTAMP2\"" -r $PCAPFILE -T fields -Eseparator=, -e frame.protocols -e ip.src -e ip.dst -e http.request.method -e http.request.uri -e http.response.code -e http2.header.name -e http2.header.value -e dns.resp.name -e dns.a -e dns.aaaa > "pcap/${PAGENAME}+${TIMESTAMP1_PRINT}_packets.log"
+tshark -o ssl.keylog_file:$SSLKEYLOGFILE -Y "frame.time >= \"$TIMESTAMP1\" and frame.time < \"$TIMESTAMP2\"" -r "$PCAPFILE" -T fields -Eseparator=, -e frame.protocols -e ip.src -e ip.dst -e http.request.method -e http.request.uri -e http.response.code -e http2.header.name -e http2.header.value -e dns.resp.name -e dns.a -e dns.aaaa > "pcap/${PAGENAME}+${TIMESTAMP1_PRINT}_packets.log"
 
 cd $dir_before
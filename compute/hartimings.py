@@ -1,9 +1,19 @@
 #!/usr/bin/env python3
 import json
 import sys
-import datetime
+import os
+import io
+import re
+import gzip
 import logging
 
+import timestamps
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
 logger = logging.getLogger("main")
 logging.disable(logging.DEBUG) # Comment this out to enable debug logging!
 
@@ -27,37 +37,245 @@ def get_header(headerlist, name_to_look_for):
 	return None
 
 
-def load_harfile(harfilename):
-	print("Opening HAR file " + harfilename + " to parse timings")
+# HAR files can be plain, gzip-, or zstd-compressed, see compact_hars.py
+HAR_EXTENSIONS = [ ".har", ".har.gz", ".har.zst" ]
+
+# Find the HAR file for a page label path (e.g. run + "har/" + pagelabel), whichever compression it has
+# Returns the plain .har path if there is none
+def find_harfile(harpath):
+	for extension in HAR_EXTENSIONS:
+		if os.path.exists(harpath + extension):
+			return harpath + extension
+	return harpath + ".har"
+
+# Open a HAR file for reading text, decompressing it if necessary
+def open_harfile(harfilename):
+	if harfilename.endswith(".gz"):
+		return gzip.open(harfilename, 'rt')
+	elif harfilename.endswith(".zst"):
+		if zstandard is None:
+			raise IOError("Need the zstandard module to read " + harfilename)
+		return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(harfilename, 'rb')), encoding="utf-8")
+	else:
+		return open(harfilename, 'r')
+
+# Write a HAR file as compact JSON, compressed according to its extension (.har, .har.gz, or .har.zst)
+# If strip_content is set, leave out the response bodies
+def write_harfile(harfilename, parsedhar, strip_content=False):
+	if strip_content:
+		for entry in parsedhar["log"]["entries"]:
+			entry["response"].get("content", {}).pop("text", None)
+	data = json.dumps(parsedhar, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+	if harfilename.endswith(".gz"):
+		harfile = gzip.open(harfilename, 'wb')
+	elif harfilename.endswith(".zst"):
+		if zstandard is None:
+			raise IOError("Need the zstandard module to write " + harfilename)
+		data = zstandard.ZstdCompressor().compress(data)
+		harfile = open(harfilename, 'wb')
+	else:
+		harfile = open(harfilename, 'wb')
+	harfile.write(data)
+	harfile.close()
+
+# A HAR file that is not valid JSON, or not shaped like a HAR file
+class HarFormatError(ValueError):
+	pass
+
+# Fields of each HAR entry that parsehartimings uses: True for a whole value, a dict for some fields of an object
+# Everything else, e.g., request headers and response bodies, is skipped without decoding it
+HAR_ENTRY_FIELDS = {
+	"startedDateTime": True,
+	"request": { "url": True, "method": True, "httpVersion": True },
+	"response": { "status": True, "headers": True, "headersSize": True, "bodySize": True, "_transferSize": True,
+		"content": { "size": True, "mimeType": True } },
+	"timings": True,
+}
+
+# Reads the parts of a HAR file we use while going through it, keeping at most one entry in memory
+# Strings and large values we do not use (e.g., response bodies) are only scanned for where they end, not decoded
+class HarReader:
+	CHUNKSIZE = 1 << 16
+	WHITESPACE = re.compile(r"[ \t\n\r]*")
+	decoder = json.JSONDecoder()
+
+	def __init__(self, harfile):
+		self.harfile = harfile
+		self.buffer = ""
+		self.pos = 0
+
+	# Read more of the file, more at once the larger the current value is
+	def more(self):
+		data = self.harfile.read(max(self.CHUNKSIZE, len(self.buffer)))
+		if not data:
+			raise HarFormatError("Unexpected end of HAR file")
+		self.buffer += data
+
+	# Forget what we already went through, between values
+	def compact(self):
+		if self.pos > self.CHUNKSIZE:
+			self.buffer = self.buffer[self.pos:]
+			self.pos = 0
+
+	def peek(self):
+		while True:
+			self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+			if self.pos < len(self.buffer):
+				return self.buffer[self.pos]
+			self.more()
+
+	def expect(self, character):
+		if self.peek() != character:
+			raise HarFormatError("Expected " + character + " but got " + self.buffer[self.pos:self.pos + 20])
+		self.pos += 1
+
+	def skip_string(self):
+		# Look for the first quote without a backslash before it
+		index = self.pos + 1
+		while True:
+			end = self.buffer.find('"', index)
+			if end < 0:
+				index = len(self.buffer)
+				self.more()
+				continue
+			backslashes = end - 1
+			while self.buffer[backslashes] == "\\":
+				backslashes -= 1
+			if (end - 1 - backslashes) % 2 == 0:
+				self.pos = end + 1
+				return
+			index = end + 1
+
+	# Go to the end of the next value
+	def skip(self):
+		character = self.peek()
+		if character == '"':
+			self.skip_string()
+		elif character in "[{":
+			try:
+				# Already in the buffer as a whole? Then decoding it is quicker than going through it
+				self.pos = self.decoder.raw_decode(self.buffer, self.pos)[1]
+				return
+			except ValueError:
+				pass
+			for key in (self.members() if character == "{" else self.items()):
+				self.skip()
+		else:
+			self.value()
+
+	# Decode the next value
+	def value(self):
+		self.peek()
+		while True:
+			try:
+				(value, end) = self.decoder.raw_decode(self.buffer, self.pos)
+				# A number is only complete if something follows it
+				if end < len(self.buffer):
+					self.pos = end
+					return value
+			except ValueError:
+				# Not complete yet, or not valid -- then we run out of file
+				pass
+			self.more()
+
+	# Go through the members of the next object, yields each key -- the caller has to read or skip its value
+	def members(self):
+		self.expect("{")
+		if self.peek() == "}":
+			self.pos += 1
+			return
+		while True:
+			key = self.value()
+			self.expect(":")
+			yield key
+			self.compact()
+			character = self.peek()
+			self.pos += 1
+			if character == "}":
+				return
+			elif character != ",":
+				raise HarFormatError("Expected , or } but got " + character)
+
+	# Go through the items of the next array, yields each index -- the caller has to read or skip its value
+	def items(self):
+		self.expect("[")
+		if self.peek() == "]":
+			self.pos += 1
+			return
+		index = 0
+		while True:
+			yield index
+			self.compact()
+			character = self.peek()
+			self.pos += 1
+			if character == "]":
+				return
+			elif character != ",":
+				raise HarFormatError("Expected , or ] but got " + character)
+			index += 1
+
+	# Decode only these fields of the next object (see HAR_ENTRY_FIELDS)
+	def select(self, fields):
+		if self.peek() != "{":
+			return self.value()
+		selected = {}
+		for key in self.members():
+			if fields.get(key) is True:
+				selected[key] = self.value()
+			elif key in fields:
+				selected[key] = self.select(fields[key])
+			else:
+				self.skip()
+		return selected
+
+	# Go through the HAR file, yields ("creator", creator), ("page", first page), and ("entry", entry) for every entry,
+	# in the order in which they are in the file -- entries only with HAR_ENTRY_FIELDS, and only if entries is set
+	def read(self, entries=True):
+		for key in self.members():
+			if key != "log":
+				self.skip()
+				continue
+			for logkey in self.members():
+				if logkey == "creator":
+					yield ("creator", self.value())
+				elif logkey == "pages":
+					for index in self.items():
+						if index == 0:
+							yield ("page", self.value())
+						else:
+							self.skip()
+				elif logkey == "entries" and entries:
+					for index in self.items():
+						yield ("entry", self.select(HAR_ENTRY_FIELDS))
+				else:
+					self.skip()
+
+# Go through a HAR file, see HarReader.read
+def iter_harfile(harfilename, entries=True):
+	harfile = open_harfile(harfilename)
 	try:
-		harfile = open(harfilename, 'r')
-		hartext = harfile.read()
-		run = harfilename.split('/')[-1]
+		for item in HarReader(harfile).read(entries):
+			yield item
+	finally:
 		harfile.close()
-	except IOError as e:
-		print("Error opening HAR file " + harfilename + ": " + str(e))
-		return None
-	except Exception as e:
-		print("Error parsing log file " + harfilename + ": " + str(e))
-		return None
 
-	return json.loads(hartext)
+# First page of a HAR file (startedDateTime, pageTimings, ...), without reading its entries
+def load_harpage(harfilename):
+	for (kind, value) in iter_harfile(harfilename, entries=False):
+		if kind == "page":
+			return value
+	raise HarFormatError("No page in " + harfilename)
 
 def get_number_of_objects_and_sum_of_object_sizes(harfilename):
-
-	parsedhar = load_harfile(harfilename)
-	if parsedhar is None:
+	try:
+		record = read_har_record(harfilename)
+	except IOError as e:
+		print("Error opening HAR file " + harfilename + ": " + str(e))
 		return None
-	entries = parsedhar["log"]["entries"]
 
-	sum_of_body_sizes = 0
-
-	for entry in entries:
-		respbodysize = entry["response"]["bodySize"]
-		sum_of_body_sizes += respbodysize
-
-	print("This one has " + str(len(entries)) + " objects with a total size of " + str(sum_of_body_sizes) + " bytes")
-	return(len(entries), sum_of_body_sizes)
+	print("This one has " + str(record["number_of_objects"]) + " objects with a total size of " + str(record["sum_of_body_sizes"]) + " bytes")
+	return (record["number_of_objects"], record["sum_of_body_sizes"])
 
 # Check if value is -1, provide useful error message otherwise
 def check_and_error_if_present(value, label, entry):
@@ -74,159 +292,249 @@ def is_server_push(respheaders, entry):
             push = True
     return push
 
-def parsehartimings(harfilename, logfilename="hartimings.log", scenario="unknown"):
-
-	logfile = None
-	if logfilename is not None:
-		try:
-			logfile = open(logfilename, 'a')
-		except IOError as e:
-			print("Error opening log file " + logfilename + ": " + str(e))
-			logfile = None
+# HAR timestamps are in local time with offset (Firefox) or UTC with Z (WebInspector, i.e., Chrome) -- ignore the zone
+# Returns microseconds since the epoch (see timestamps.py)
+def parse_har_time(timestamp, creatorname):
+	if creatorname == "WebInspector":
+		return timestamps.parse_time(timestamp[:-1], timestamps.ISO_FORMAT)
 	else:
-		print("There is no log file.")
-		logfile = None
+		return timestamps.parse_time(timestamp[:-6], timestamps.ISO_FORMAT)
 
-	parsedhar = load_harfile(harfilename)
-	if parsedhar is None:
-		return
+# Fields of an entry record, in the order of the HAR timings log
+HARTIMING_FIELDS = [ "name", "method", "httpVersion", "status", "mimeType", "scenario", "mahttpp_ip1", "mahttpp_port1", "mahttpp_ip2", "mahttpp_port2", "resptransfersize", "respheadersize", "respbodysize", "contentlengthheader", "contentsize", "startedDateTime", "start_delta", "blockedTime", "dnsTime", "connectTime", "sslTime", "sendTime", "waitTime", "receiveTime" ]
 
-	entries = parsedhar["log"]["entries"]
-	if parsedhar["log"]["creator"]["name"] == "WebInspector":
-		startedTime = datetime.datetime.strptime(parsedhar['log']['pages'][0]['startedDateTime'][:-1], "%Y-%m-%dT%H:%M:%S.%f")
-	else:
-		startedTime = datetime.datetime.strptime(parsedhar['log']['pages'][0]['startedDateTime'][:-6], "%Y-%m-%dT%H:%M:%S.%f")
-	logger.debug("Logging time from HAR for page " + entries[0]['request']['url'] + " started at " + startedTime.strftime("%Y-%m-%dT%H:%M:%S.%f"))
+# Fields of an entry record that are numbers (int or float), unless they were not logged ("NA", "None")
+# contentlengthheader stays the header value as it was sent
+HARTIMING_NUMBER_FIELDS = [ "status", "resptransfersize", "respheadersize", "respbodysize", "contentsize", "start_delta", "blockedTime", "dnsTime", "connectTime", "sslTime", "sendTime", "waitTime", "receiveTime" ]
 
-	for entry in entries:
-		if parsedhar["log"]["creator"]["name"] == "WebInspector":
-			startedObjectTime = datetime.datetime.strptime(entry['startedDateTime'][:-1], "%Y-%m-%dT%H:%M:%S.%f")
-		else:
-			startedObjectTime = datetime.datetime.strptime(entry['startedDateTime'][:-6], "%Y-%m-%dT%H:%M:%S.%f")
-		startDelta = startedObjectTime - startedTime
-		startDelta_milliseconds = startDelta.total_seconds() * 1000.0
+HARTIMING_TIME_FORMAT = timestamps.LABEL_FORMAT
 
-		mahttpp1 = get_mahttpp(entry["response"]["headers"], "x-mahttpp-source")
-		mahttpp2 = get_mahttpp(entry["response"]["headers"], "x-mahttpp-source2")
+# A value of the HAR timings log as int or float, as it was before it got logged, or unchanged if it is no number
+def to_number(value):
+	try:
+		return int(value)
+	except (ValueError, TypeError):
+		pass
+	try:
+		return float(value)
+	except (ValueError, TypeError):
+		return value
+
+# Entry record from a line of the HAR timings log as read by csv.DictReader (all strings)
+def typed_hartiming(hartiming):
+	for field in HARTIMING_NUMBER_FIELDS:
+		hartiming[field] = to_number(hartiming[field])
+	try:
+		hartiming["startedDateTime"] = timestamps.parse_time(hartiming["startedDateTime"], HARTIMING_TIME_FORMAT)
+	except (ValueError, TypeError):
+		pass
+	return hartiming
 
-		# Look for request method, response body size, and response status -- they need to be there
-		try:
-			requestMethod = entry["request"]["method"]
-			respbodysize = entry["response"]["bodySize"]
-			status = entry["response"]["status"]
-		except KeyError as err:
-			print("Did not find " + str(err) + " for " + str(entry["request"]["url"]) + " -- This HAR file seems broken")
-			raise(err)
+# Entry records from all lines of a HAR timings log, converting their timestamps at once
+def typed_hartimings(hartimings):
+	try:
+		startedDateTimes = timestamps.parse_times([ hart["startedDateTime"] for hart in hartimings ], HARTIMING_TIME_FORMAT)
+	except (ValueError, TypeError):
+		return [ typed_hartiming(hart) for hart in hartimings ]
+	for (hart, startedDateTime) in zip(hartimings, startedDateTimes):
+		for field in HARTIMING_NUMBER_FIELDS:
+			hart[field] = to_number(hart[field])
+		hart["startedDateTime"] = startedDateTime
+	return hartimings
+
+# Line of the HAR timings log for an entry record
+def format_hartiming(hartiming):
+	return ",".join([ timestamps.format_time(hartiming["startedDateTime"], HARTIMING_TIME_FORMAT) if field == "startedDateTime" else str(hartiming[field]) for field in HARTIMING_FIELDS ]) + "\n"
+
+# Entry record of one HAR entry (see HARTIMING_FIELDS), None if it could not be made
+# Numbers are the same as when reading them back from the HAR timings log (see typed_hartiming),
+# startedDateTime is in microseconds since the epoch (see timestamps.py)
+def get_entry_timings(entry, creatorname, startedTime, scenario):
+	startedObjectTime = parse_har_time(entry['startedDateTime'], creatorname)
+	startDelta_milliseconds = timestamps.us_to_ms(startedObjectTime - startedTime)
+
+	mahttpp1 = get_mahttpp(entry["response"]["headers"], "x-mahttpp-source")
+	mahttpp2 = get_mahttpp(entry["response"]["headers"], "x-mahttpp-source2")
+
+	# Look for request method, response body size, and response status -- they need to be there
+	try:
+		requestMethod = entry["request"]["method"]
+		respbodysize = entry["response"]["bodySize"]
+		status = entry["response"]["status"]
+	except KeyError as err:
+		print("Did not find " + str(err) + " for " + str(entry["request"]["url"]) + " -- This HAR file seems broken")
+		raise(err)
 
-		if respbodysize is None:
-			# It got logged as "null" -- same as -1 (invalid)
-			respbodysize = -1
+	if respbodysize is None:
+		# It got logged as "null" -- same as -1 (invalid)
+		respbodysize = -1
 
 
-		# Look for more response fields: content size (number of bytes after decompressing), header, header size
-		# These are allowed to be missing, e.g., if there was no reply
-		# Sometimes they are missing even though there was a reply.
-		# As we ignore them in the rest of our evaluation, here we only care if they have a valid value or not.
-		# If missing, they are invalid, so here we can set them to -1 or empty list safely.
+	# Look for more response fields: content size (number of bytes after decompressing), header, header size
+	# These are allowed to be missing, e.g., if there was no reply
+	# Sometimes they are missing even though there was a reply.
+	# As we ignore them in the rest of our evaluation, here we only care if they have a valid value or not.
+	# If missing, they are invalid, so here we can set them to -1 or empty list safely.
 
-		try:
-			respContentSize = entry["response"]["content"]["size"]
-		except KeyError as err:
-			logging.info("Did not find response content size for " + str(entry["request"]["url"]) + " -- setting to -1")
-			respContentSize = -1
-		if respContentSize == 0:
-			# It got logged as 0 - might still be no response
-			respContentSize = -1
+	try:
+		respContentSize = entry["response"]["content"]["size"]
+	except KeyError as err:
+		logging.info("Did not find response content size for " + str(entry["request"]["url"]) + " -- setting to -1")
+		respContentSize = -1
+	if respContentSize == 0:
+		# It got logged as 0 - might still be no response
+		respContentSize = -1
 
 
-		try:
-			respheaders = entry["response"]["headers"]
-		except KeyError as err:
-			logging.info("Did not find response headers for " + str(entry["request"]["url"]) + " -- setting to empty list")
-			respheaders = []
+	try:
+		respheaders = entry["response"]["headers"]
+	except KeyError as err:
+		logging.info("Did not find response headers for " + str(entry["request"]["url"]) + " -- setting to empty list")
+		respheaders = []
 
-		try:
-			respheadersize = entry["response"]["headersSize"]
-		except KeyError as err:
-			logging.info("Did not find response headersSize for " + str(entry["request"]["url"]) + " -- setting to -1")
-			respheadersize = -1
+	try:
+		respheadersize = entry["response"]["headersSize"]
+	except KeyError as err:
+		logging.info("Did not find response headersSize for " + str(entry["request"]["url"]) + " -- setting to -1")
+		respheadersize = -1
 
-		# Log response Content-Length header
-		respcontentlength = get_header(respheaders, "Content-Length")
-		if not respcontentlength:
-			respcontentlength = "NA"
+	# Log response Content-Length header
+	respcontentlength = get_header(respheaders, "Content-Length")
+	if not respcontentlength:
+		respcontentlength = "NA"
 
-		try:
-			resptransfersize = entry["response"]["_transferSize"]
-		except KeyError as err:
-			logging.info("Did not find response transferSize for " + str(entry["request"]["url"]) + " -- setting to NA")
-			resptransfersize = "NA"
+	try:
+		resptransfersize = entry["response"]["_transferSize"]
+	except KeyError as err:
+		logging.info("Did not find response transferSize for " + str(entry["request"]["url"]) + " -- setting to NA")
+		resptransfersize = "NA"
+
+	try:
+		httpversion = entry["request"]["httpVersion"]
+	except KeyError as err:
+		logging.info("Did not find HTTP version for " + str(entry["request"]["url"]) + " -- setting to NA")
+		httpversion = "NA"
+
+	# Perform consistency check:
+	# Status code 0 means there was no HTTP response - Was there actually no response?
+	# This may be inconsistent in case of HTTP/2 server push.
+	# There are also cases in which we got an actual HTTP 200 over HTTP/1.1, but still Status 0 was logged
+	if status == 0:
 
 		try:
-			httpversion = entry["request"]["httpVersion"]
-		except KeyError as err:
-			logging.info("Did not find HTTP version for " + str(entry["request"]["url"]) + " -- setting to NA")
-			httpversion = "NA"
+			check_and_error_if_present(respbodysize, "Got Status Code 0, which indicates no response, but response body size", entry)
+			check_and_error_if_present(respContentSize, "Got Status Code 0, which indicates no response, but response content size", entry)
+			check_and_error_if_present(respcontentlength, "Got Status Code 0, which indicates no response, but response content length", entry)
+			check_and_error_if_present(respheadersize, "Got Status Code 0, which indicates no response, but response header size", entry)
+			check_and_error_if_present(respheaders, "Got Status Code 0, which indicates no response, but response headers", entry)
+		except ValueError as err:
+			print("HAR file is inconsistent: " + str(err))
+			if is_server_push(respheaders, entry):
+				print("This was an HTTP/2 Server Push -- logging status -2")
+				status = -2
+			else:
+				# We probably did get a reply, but the correct status code was not logged - invalidate status
+				print("Found no header indicating HTTP/2 Server Push - we cannot know the actual code, logging -1")
+				status = -1
 
-		# Perform consistency check:
-		# Status code 0 means there was no HTTP response - Was there actually no response?
-		# This may be inconsistent in case of HTTP/2 server push.
-		# There are also cases in which we got an actual HTTP 200 over HTTP/1.1, but still Status 0 was logged
-		if status == 0:
 
-			try:
-				check_and_error_if_present(respbodysize, "Got Status Code 0, which indicates no response, but response body size", entry)
-				check_and_error_if_present(respContentSize, "Got Status Code 0, which indicates no response, but response content size", entry)
-				check_and_error_if_present(respcontentlength, "Got Status Code 0, which indicates no response, but response content length", entry)
-				check_and_error_if_present(respheadersize, "Got Status Code 0, which indicates no response, but response header size", entry)
-				check_and_error_if_present(respheaders, "Got Status Code 0, which indicates no response, but response headers", entry)
-			except ValueError as err:
-				print("HAR file is inconsistent: " + str(err))
-				if is_server_push(respheaders, entry):
-					print("This was an HTTP/2 Server Push -- logging status -2")
-					status = -2
-				else:
-					# We probably did get a reply, but the correct status code was not logged - invalidate status
-					print("Found no header indicating HTTP/2 Server Push - we cannot know the actual code, logging -1")
-					status = -1
+	try:
+		mimetype = entry["response"]["content"]["mimeType"]
+	except:
+		mimetype = get_header(respheaders, "mimeType")
+		if not mimetype:
+			mimetype = "NA"
 
+	try:
+		sendTime = entry["timings"]["send"]
+		waitTime = entry["timings"]["wait"]
+		receiveTime = entry["timings"]["receive"]
+	except KeyError as err:
+		logging.debug("Did not find timing " + str(err) + " for " + str(entry["request"]["url"]) + " -- that's okay if there was no reply.")
+		if status <= 0:
+			sendTime = "NA"
+			waitTime = "NA"
+			receiveTime = "NA"
+		else:
+			print("No timings for " + str(entry["request"]["url"]) + ", but there was a reply -- something went wrong!")
+			raise(err)
+	try:
+		blockedTime = entry["timings"]["blocked"]
+		dnsTime = entry["timings"]["dns"]
+		connectTime = entry["timings"]["connect"]
+		sslTime = entry["timings"]["ssl"]
+	except KeyError as err:
+		logging.debug("Did not find timing " + str(err) + " for " + str(entry["request"]["url"]) + ", but it is optional -- setting to 0")
+		blockedTime = 0
+		dnsTime = 0
+		connectTime = 0
+		sslTime = 0
+	try:
+		hartiming = dict(zip(HARTIMING_FIELDS, [ entry["request"]["url"].replace(",", ""), str(requestMethod), str(httpversion), status, str(mimetype), str(scenario), str(mahttpp1[0]), str(mahttpp1[1]), str(mahttpp2[0]), str(mahttpp2[1]), resptransfersize, respheadersize, respbodysize, str(respcontentlength), respContentSize, startedObjectTime, startDelta_milliseconds, blockedTime, dnsTime, connectTime, sslTime, sendTime, waitTime, receiveTime ]))
+	except Exception as err:
+		print("Error: " + str(err))
+		return None
+	for field in HARTIMING_NUMBER_FIELDS:
+		if not isinstance(hartiming[field], (int, float)) or isinstance(hartiming[field], bool):
+			hartiming[field] = to_number(str(hartiming[field]))
+	return hartiming
+
+# Everything we use of a HAR file, read in one pass: its first page (startedDateTime, pageTimings, ...),
+# an entry record for every entry (see get_entry_timings), and summary counts
+# Raises an exception if the HAR file cannot be read, or one of its entries is broken
+def read_har_record(harfilename, scenario="unknown"):
+	print("Opening HAR file " + harfilename + " to parse timings")
 
-		try:
-			mimetype = entry["response"]["content"]["mimeType"]
-		except:
-			mimetype = get_header(respheaders, "mimeType")
-			if not mimetype:
-				mimetype = "NA"
+	# Entries may come before the creator and the page, which we need to compute their times
+	creatorname = None
+	page = None
+	startedTime = None
+	entries = []
+	hartimings = []
+	for (kind, value) in iter_harfile(harfilename):
+		if kind == "creator":
+			creatorname = value["name"]
+		elif kind == "page":
+			page = value
+		else:
+			entries.append(value)
+		if startedTime is None and creatorname is not None and page is not None:
+			startedTime = parse_har_time(page['startedDateTime'], creatorname)
+		if startedTime is not None:
+			for entry in entries:
+				if not hartimings:
+					logger.debug("Logging time from HAR for page " + entry['request']['url'] + " started at " + timestamps.format_time(startedTime, timestamps.ISO_FORMAT))
+				hartiming = get_entry_timings(entry, creatorname, startedTime, scenario)
+				if hartiming is not None:
+					hartimings.append(hartiming)
+			entries = []
+	if startedTime is None:
+		raise HarFormatError("No creator or page in " + harfilename)
+
+	return { "page": page, "entries": hartimings,
+		"number_of_objects": len(hartimings), "sum_of_body_sizes": sum([ hart["respbodysize"] for hart in hartimings if isinstance(hart["respbodysize"], int) and hart["respbodysize"] > 0 ]) }
+
+# Write the HAR timings log for the entry records of a HAR file
+def write_hartimings(logfilename, hartimings):
+	with open(logfilename, 'a') as logfile:
+		logfile.writelines([ format_hartiming(hart) for hart in hartimings ])
 
-		try:
-			sendTime = entry["timings"]["send"]
-			waitTime = entry["timings"]["wait"]
-			receiveTime = entry["timings"]["receive"]
-		except KeyError as err:
-			logging.debug("Did not find timing " + str(err) + " for " + str(entry["request"]["url"]) + " -- that's okay if there was no reply.")
-			if status <= 0:
-				sendTime = "NA"
-				waitTime = "NA"
-				receiveTime = "NA"
-			else:
-				print("No timings for " + str(entry["request"]["url"]) + ", but there was a reply -- something went wrong!")
-				raise(err)
-		try:
-			blockedTime = entry["timings"]["blocked"]
-			dnsTime = entry["timings"]["dns"]
-			connectTime = entry["timings"]["connect"]
-			sslTime = entry["timings"]["ssl"]
-		except KeyError as err:
-			logging.debug("Did not find timing " + str(err) + " for " + str(entry["request"]["url"]) + ", but it is optional -- setting to 0")
-			blockedTime = 0
-			dnsTime = 0
-			connectTime = 0
-			sslTime = 0
-		try:
-			logfile.write(entry["request"]["url"].replace(",", "") + "," + str(requestMethod) + "," + str(httpversion) + "," + str(status) + "," + str(mimetype) + "," + str(scenario) + "," + str(mahttpp1[0]) + "," + str(mahttpp1[1]) + "," + str(mahttpp2[0]) + "," + str(mahttpp2[1]) + "," + str(resptransfersize) + "," + str(respheadersize) + "," + str(respbodysize) + "," + str(respcontentlength) + "," + str(respContentSize) + "," + str(datetime.datetime.strftime(startedObjectTime, "%Y-%m-%d+%H-%M-%S.%f")) + "," + str(startDelta_milliseconds) + "," + str(blockedTime) + "," + str(dnsTime) + "," + str(connectTime) + "," + str(sslTime) + "," + str(sendTime) + "," + str(waitTime) + "," + str(receiveTime) + "\n")
-		except Exception as err:
-			print("Error: " + str(err))
-	logfile.close()
+def parsehartimings(harfilename, logfilename="hartimings.log", scenario="unknown"):
+	if logfilename is None:
+		print("There is no log file.")
+		return
+
+	try:
+		record = read_har_record(harfilename, scenario)
+	except IOError as e:
+		print("Error opening HAR file " + harfilename + ": " + str(e))
+		return
+
+	try:
+		write_hartimings(logfilename, record["entries"])
+	except IOError as e:
+		print("Error opening log file " + logfilename + ": " + str(e))
+		return
 	print("Logged to " + str(logfilename))
 
 if __name__ == "__main__":
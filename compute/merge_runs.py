@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+#
+# Merge the runs of several measurement hosts into one run, which computetimings.py processes in one pass
+#
+# If a URL list was split across several hosts, every host (node) has its own run directory (shard) with its
+# own navtimings.log, workload_output.log, har/, res/, and so on. This creates a combined run directory from
+# them: HAR files, Resource Timings, packet capture segments, and stored per-page results are hardlinked
+# (copied only if the shards are on another file system), the logs are concatenated.
+#
+# Every node logged its times with its own clock. Page labels (<host>+<timestamp>) name the files of a page
+# load, so they keep the time of their node, and so do the timestamps in starttimings.log, which name the same
+# page loads. The combined navtimings.log and starttimings.log are sorted by start time on a common clock:
+# node time minus the clock offset of the node, which is estimated from
+#   - a reference exchange: clock_reference.log in the shard, lines of four Unix timestamps as in NTP
+#     (sent by the node, received by the reference host, sent by the reference host, received by the node),
+#     the offset of the exchange with the shortest round trip counts,
+#   - or NTP logs: ntp.log in the shard, output of "chronyc tracking" or "ntpq -pn" during the run,
+#   - or given on the command line as <SHARD>@<OFFSET>, in seconds (node clock minus reference clock).
+# The offsets are logged to clock_offsets.log (node, shard, offset in seconds, how it was estimated, page loads).
+# Packets are on the clock of their node as well, so computetimings.py and validate_object_size.py only match
+# them to the page loads of the same node (see computetimings.get_node_starttimings).
+#
+# The full packet capture of every node (and other files that do not belong to one page load) goes to
+# <subdir>/<node>/, e.g., pcap/<node>/local:any.pcap. validate_object_size.py cannot use these for a merged run,
+# so validating object sizes of a merged run needs segmented captures (SEGMENT_CAPTURE=1 for capture.sh, see load/segment_capture.py).
+#
+# If two shards contain a page load with the same label, the second one is skipped if it is the same page load
+# (same line in navtimings.log, e.g., a shard given twice), otherwise it is renamed by moving its timestamp by a
+# microsecond. merged_pages.log lists all page labels with their node, original label, and start time on the
+# common clock.
+#
+# Usage:
+#           ./merge_runs.py <MERGED_RUN> <SHARD>[@<OFFSET>] [<SHARD>[@<OFFSET>] ...]
+#                   MERGED_RUN: Run directory to create, e.g., ../testdata/run-<DATE>-merged (has to be new)
+#                   SHARD:      Run directory of one node
+
+import os
+import re
+import sys
+import glob
+import shutil
+import computetimings
+import timestamps
+
+CLOCK_REFERENCE_FILENAME = "clock_reference.log"
+NTP_FILENAME = "ntp.log"
+CLOCK_OFFSETS_FILENAME = "clock_offsets.log"
+MERGED_PAGES_FILENAME = computetimings.MERGED_PAGES_FILENAME
+STARTTIMINGS_FILENAME = "starttimings.log"
+WORKLOAD_FILENAME = "workload_output.log"
+URLFILE_FILENAME = "urlfile-merged.log"
+
+# Subdirectories with one or more files per page load, named <pagelabel><suffix>
+PAGE_DIRS = [ "har/", "res/", computetimings.CAPTURE_SEGMENT_DIR, computetimings.PAGE_RESULTS_DIR ]
+
+# Logs that computetimings.py and friends compute from the page loads -- computed again for the merged run
+DERIVED_LOGS = [ computetimings.LOGFILENAME, "compare_har_res.log", "success_or_fail.log", "object_sizes_trace.log", "phase_summary.log", STARTTIMINGS_FILENAME, CLOCK_OFFSETS_FILENAME, MERGED_PAGES_FILENAME ]
+
+# Logs with one line per page load (or phase), simply concatenated
+CONCATENATED_LOGS = [ "failed_navtimings.log", "observer.log", "loader_phases.log", "waittimes.log", "contexts.log" ]
+
+PAGELABEL_PATTERN = re.compile(r"^(.+\+\d{4}-\d{2}-\d{2}\+\d{2}-\d{2}-\d{2}\.\d+)(\..*)$")
+FETCHING_PATTERN = re.compile(r"Run 1/1 - Fetching (\S+) at (\S+)")
+# First line of the output of a page load in workload_output.log (see load/fetchurl.sh and load/worker.py)
+PAGE_OUTPUT_START_PATTERN = re.compile(r"^Fetching \S+$")
+CHRONY_PATTERN = re.compile(r"System time\s*:\s*([0-9.]+) seconds (fast|slow) of NTP time")
+
+
+def read_lines(filename):
+	try:
+		with open(filename, 'r') as f:
+			return [ line for line in f if line.strip() ]
+	except IOError:
+		return []
+
+# Offset of a node from its reference exchange: the exchange with the shortest round trip
+def offset_from_reference(lines):
+	best = None
+	for line in lines:
+		try:
+			(t0, t1, t2, t3) = [ float(value) for value in line.split(",")[:4] ]
+		except ValueError:
+			continue
+		delay = (t3 - t0) - (t2 - t1)
+		offset = ((t0 - t1) + (t3 - t2)) / 2.0
+		if best is None or delay < best[0]:
+			best = (delay, offset)
+	return best[1] if best is not None else None
+
+# Offset of a node from chronyc tracking or ntpq -pn output (the peer marked "*"), the last one counts
+def offset_from_ntp(lines):
+	offset = None
+	for line in lines:
+		match = CHRONY_PATTERN.search(line)
+		if match:
+			offset = float(match.group(1)) * (1 if match.group(2) == "fast" else -1)
+		elif line.startswith("*"):
+			# remote refid st t when poll reach delay offset jitter, offset in ms (of the peer, so negated)
+			fields = line.split()
+			try:
+				offset = -float(fields[8]) / 1000.0
+			except (IndexError, ValueError):
+				continue
+	return offset
+
+# Clock offset of a shard in seconds and how it was estimated
+def estimate_clock_offset(shard, given=None):
+	if given is not None:
+		return (given, "given")
+	offset = offset_from_reference(read_lines(shard + CLOCK_REFERENCE_FILENAME))
+	if offset is not None:
+		return (offset, "reference")
+	offset = offset_from_ntp(read_lines(shard + NTP_FILENAME))
+	if offset is not None:
+		return (offset, "ntp")
+	print("No clock reference or NTP log in " + shard + " -- assuming its clock is right")
+	return (0.0, "none")
+
+# Page label with its timestamp moved by this many microseconds
+def shift_pagelabel(pagelabel, microseconds):
+	(host, timestamp) = pagelabel.split("+", 1)
+	return host + "+" + timestamps.format_time(timestamps.parse_time(timestamp) + microseconds)
+
+# Start time of a page label on the common clock, in microseconds since the epoch (see timestamps.py)
+def aligned_starttime(pagelabel, offset):
+	return timestamps.parse_time(pagelabel.split("+", 1)[1]) - int(round(offset * timestamps.US_PER_SECOND))
+
+# Hardlink a file, or copy it if that is not possible
+def link_or_copy(source, destination):
+	try:
+		os.link(source, destination)
+	except OSError:
+		shutil.copy2(source, destination)
+
+# Start timings of a shard (URL and timestamp of every page load as in workload_output.log), as page labels -> URL
+def read_shard_starttimings(shard):
+	starttimings = {}
+	for line in read_lines(shard + WORKLOAD_FILENAME):
+		match = FETCHING_PATTERN.search(line)
+		if match:
+			starttimings[match.group(1).split('/')[2] + "+" + match.group(2)] = match.group(1)
+	return starttimings
+
+class Shard:
+	def __init__(self, spec, node):
+		(path, given) = (spec.rsplit("@", 1) + [ None ])[:2] if "@" in spec else (spec, None)
+		self.path = path.rstrip("/") + "/"
+		self.node = node
+		(self.offset, self.method) = estimate_clock_offset(self.path, float(given) if given is not None else None)
+		# Page label in the shard -> page label in the merged run (None if skipped)
+		self.labels = {}
+		self.navtimings = {}
+		for line in read_lines(self.path + computetimings.NAVTIMINGS_FILENAME):
+			fields = line.split(",")
+			try:
+				self.navtimings[fields[0].split('/')[2] + "+" + fields[2]] = line
+			except IndexError:
+				continue
+
+	def rename(self, line, pagelabel):
+		if self.labels.get(pagelabel, pagelabel) == pagelabel:
+			return line
+		return line.replace(pagelabel.split("+", 1)[1], self.labels[pagelabel].split("+", 1)[1])
+
+# Assign every page load of every shard its label in the merged run
+# Returns a dict of merged page label -> (shard, original page label)
+def assign_pagelabels(shards):
+	merged = {}
+	for shard in shards:
+		for (pagelabel, line) in shard.navtimings.items():
+			newlabel = pagelabel
+			microseconds = 0
+			while newlabel in merged:
+				(othershard, otherlabel) = merged[newlabel]
+				if othershard.navtimings.get(otherlabel) == line:
+					print("Skipping " + pagelabel + " of " + shard.path + ", same page load as in " + othershard.path)
+					newlabel = None
+					break
+				microseconds += 1
+				newlabel = shift_pagelabel(pagelabel, microseconds)
+			shard.labels[pagelabel] = newlabel
+			if newlabel is not None:
+				if newlabel != pagelabel:
+					print("Renaming " + pagelabel + " of " + shard.path + " to " + newlabel)
+				merged[newlabel] = (shard, pagelabel)
+	return merged
+
+def link_page_files(shard, merged_run):
+	linked = 0
+	for subdir in PAGE_DIRS:
+		for source in sorted(glob.glob(shard.path + subdir + "*")):
+			filename = os.path.basename(source)
+			match = PAGELABEL_PATTERN.match(filename)
+			if match is None:
+				# e.g., the full capture of a node -- keep one per node, not named like a capture segment
+				if os.path.isfile(source):
+					computetimings.createDirectory(merged_run + subdir + shard.node + "/")
+					link_or_copy(source, merged_run + subdir + shard.node + "/" + filename)
+				continue
+			(pagelabel, suffix) = match.groups()
+			newlabel = shard.labels.get(pagelabel, pagelabel)
+			if newlabel is None or (newlabel != pagelabel and subdir == computetimings.PAGE_RESULTS_DIR):
+				# Stored results of a renamed page load name the old label, compute them again
+				continue
+			computetimings.createDirectory(merged_run + subdir)
+			link_or_copy(source, merged_run + subdir + newlabel + suffix)
+			linked += 1
+	return linked
+
+def main(argv=[]):
+	if len(argv) < 3:
+		print("Usage: " + argv[0] + " <MERGED_RUN> <SHARD>[@<OFFSET>] [<SHARD>[@<OFFSET>] ...]")
+		return 1
+	merged_run = argv[1].rstrip("/") + "/"
+	if os.path.exists(merged_run):
+		print(merged_run + " already exists -- not merging into it")
+		return 1
+
+	shards = []
+	nodes = set()
+	for (index, spec) in enumerate(argv[2:]):
+		node = os.path.basename(spec.split("@")[0].rstrip("/"))
+		if node in nodes:
+			node = node + "-" + str(index)
+		nodes.add(node)
+		shards.append(Shard(spec, node))
+	merged = assign_pagelabels(shards)
+
+	computetimings.createDirectory(merged_run)
+	navtimings = []
+	starttimings = []
+	urls = []
+	for shard in shards:
+		print("Merging " + shard.path + " (node " + shard.node + ", clock offset " + str(round(shard.offset, 6)) + " s, " + shard.method + ")")
+		linked = link_page_files(shard, merged_run)
+		print("Linked " + str(linked) + " files of " + str(len([ l for l in shard.labels.values() if l is not None ])) + " page loads")
+
+		for (pagelabel, line) in shard.navtimings.items():
+			if shard.labels[pagelabel] is not None:
+				navtimings.append((aligned_starttime(pagelabel, shard.offset), shard.rename(line, pagelabel)))
+		for (pagelabel, url) in read_shard_starttimings(shard.path).items():
+			newlabel = shard.labels.get(pagelabel, pagelabel)
+			if newlabel is not None:
+				timestamp = timestamps.parse_time(newlabel.split("+", 1)[1])
+				starttimings.append((aligned_starttime(pagelabel, shard.offset), url + "," + timestamps.format_time(timestamp, timestamps.SPACE_FORMAT) + "\n"))
+
+		for urlfile in sorted(glob.glob(shard.path + "urlfile-*")):
+			urls += [ line.strip() for line in read_lines(urlfile) if line.strip() not in urls ]
+		with open(merged_run + WORKLOAD_FILENAME, 'a') as f:
+			# The output of a page load goes from "Fetching <URL>" to the next one, with "Run 1/1 - Fetching <URL> at
+			# <TIMESTAMP>" in between, which tells which page load it is -- leave it all out if it was skipped
+			pending = []
+			skipping = False
+			for line in read_lines(shard.path + WORKLOAD_FILENAME):
+				if PAGE_OUTPUT_START_PATTERN.match(line.strip()):
+					# Output of a page load without "Run" line (e.g., the loader did not start) is kept
+					f.writelines(pending)
+					pending = [ line ]
+					skipping = False
+					continue
+				match = FETCHING_PATTERN.search(line)
+				if match is None:
+					if pending:
+						pending.append(line)
+					elif not skipping:
+						f.write(line)
+					continue
+				pagelabel = match.group(1).split('/')[2] + "+" + match.group(2)
+				skipping = shard.labels.get(pagelabel, pagelabel) is None
+				if not skipping:
+					f.writelines(pending)
+					f.write(shard.rename(line, pagelabel))
+				pending = []
+			f.writelines(pending)
+		for logname in CONCATENATED_LOGS:
+			lines = read_lines(shard.path + logname)
+			if lines:
+				with open(merged_run + logname, 'a') as f:
+					f.writelines(lines)
+
+	with open(merged_run + computetimings.NAVTIMINGS_FILENAME, 'w') as f:
+		f.writelines([ line for (starttime, line) in sorted(navtimings, key=lambda n: n[0]) ])
+	with open(merged_run + STARTTIMINGS_FILENAME, 'w') as f:
+		f.writelines([ line for (starttime, line) in sorted(starttimings, key=lambda s: s[0]) ])
+	with open(merged_run + URLFILE_FILENAME, 'w') as f:
+		f.write("\n".join(urls) + "\n")
+	with open(merged_run + CLOCK_OFFSETS_FILENAME, 'w') as f:
+		for shard in shards:
+			f.write(",".join([ shard.node, shard.path, str(round(shard.offset, 6)), shard.method, str(len([ l for l in shard.labels.values() if l is not None ])) ]) + "\n")
+	with open(merged_run + MERGED_PAGES_FILENAME, 'w') as f:
+		for (newlabel, (shard, pagelabel)) in sorted(merged.items(), key=lambda m: aligned_starttime(m[1][1], m[1][0].offset)):
+			f.write(",".join([ newlabel, shard.node, pagelabel, timestamps.format_time(aligned_starttime(pagelabel, shard.offset)) ]) + "\n")
+
+	print("Merged " + str(len(merged)) + " page loads of " + str(len(shards)) + " nodes into " + merged_run)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
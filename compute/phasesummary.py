@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+#
+# Summarize where the loaders spend their time: Percentiles of the duration of every phase
+# (browser launch, navigation, exporting timings and HAR files, ...) across all page loads of a run,
+# as logged by the loaders to loader_phases.log (see load/phases.py).
+#
+# Phases are sorted by their total time, so the phase that costs most across the run comes first.
+# Prints the summary and writes it to phase_summary.log in the run directory.
+#
+# Usage:
+#           ./phasesummary.py RUNFILTER
+#                   RUNFILTER:      every run which contains this string will be summarized (default: all runs)
+
+import sys
+import glob
+import math
+
+RUNDIR = "../testdata/"
+
+PHASES_FILENAME = "loader_phases.log"
+SUMMARY_FILENAME = "phase_summary.log"
+
+PERCENTILES = [ 50, 90, 99 ]
+
+# Linear interpolation between closest ranks, like R's default quantile type
+def percentile(sortedvalues, p):
+	if not sortedvalues:
+		return float("nan")
+	rank = (len(sortedvalues) - 1) * p / 100.0
+	lower = int(math.floor(rank))
+	upper = int(math.ceil(rank))
+	return sortedvalues[lower] + (sortedvalues[upper] - sortedvalues[lower]) * (rank - lower)
+
+# Read loader_phases.log of a run
+# Returns a dict of phase -> list of durations in ms, and the number of page loads
+def read_phases(run):
+	durations = {}
+	pageloads = set()
+	loaders = set()
+	with open(run + PHASES_FILENAME, 'r') as phasesfile:
+		for line in phasesfile:
+			# URLs may contain commas, so split from the right
+			fields = line.rstrip("\n").rsplit(",", 4)
+			if len(fields) < 5:
+				continue
+			try:
+				duration = float(fields[4])
+			except ValueError:
+				continue
+			(loader, url) = fields[0].split(",", 1) if "," in fields[0] else (fields[0], "")
+			loaders.add(loader)
+			pageloads.add((url, fields[2]))
+			durations.setdefault(fields[3], []).append(duration)
+	return (durations, len(pageloads), loaders)
+
+def summarize_run(run):
+	try:
+		(durations, pageloads, loaders) = read_phases(run)
+	except IOError as err:
+		print("Could not read " + run + PHASES_FILENAME + ": " + str(err))
+		return
+
+	overall = sum([ sum(values) for values in durations.values() ])
+	lines = [ "Run " + run + ": " + str(pageloads) + " page loads by " + ", ".join(sorted(loaders)) + ", " + str(round(overall / 1000.0, 1)) + " s in total" ]
+	lines.append("\t".join([ "phase", "n", "total_s", "share", "mean_ms" ] + [ "p" + str(p) + "_ms" for p in PERCENTILES ] + [ "max_ms" ]))
+	for (phase, values) in sorted(durations.items(), key=lambda item: sum(item[1]), reverse=True):
+		values = sorted(values)
+		total = sum(values)
+		share = 100.0 * total / overall if overall > 0 else 0
+		lines.append("\t".join([ phase, str(len(values)), str(round(total / 1000.0, 2)), str(round(share, 1)) + "%", str(round(total / len(values), 1)) ] + [ str(round(percentile(values, p), 1)) for p in PERCENTILES ] + [ str(round(values[-1], 1)) ]))
+
+	print("\n".join(lines) + "\n")
+	try:
+		with open(run + SUMMARY_FILENAME, 'w') as summaryfile:
+			summaryfile.write("\n".join(lines) + "\n")
+	except IOError as err:
+		print("Could not write " + run + SUMMARY_FILENAME + ": " + str(err))
+
+def main(argv=[]):
+	runfilter = None
+	if len(argv) > 1 and argv[1] != "all":
+		runfilter = argv[1]
+
+	runs = glob.glob(RUNDIR + "run-*")
+	if runfilter is not None:
+		runs = [ r for r in runs if runfilter in r ]
+	for run in sorted(runs):
+		if run[-1] != "/":
+			run = run + "/"
+		if not glob.glob(run + PHASES_FILENAME):
+			continue
+		summarize_run(run)
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# Post-process page loads in the background while the loader is still busy with the next page
+#
+# Started by the loaders in worker mode if POSTPROCESS is set (see load/worker.py). The loader writes
+# one line to our stdin after every page load -- then all page loads in navtimings.log are complete,
+# so all new lines of navtimings.log are handed to a pool of processes, which parse each HAR file to
+# its .har.log and compute the row of final_timings.log (stored in pages/, see computetimings.py).
+#
+# When stdin is closed (the loader is done), waits for the pool and writes final_timings.log and
+# compare_har_res.log for all page loads we could process from the stored results. computetimings.py later uses
+# the stored results as well, unless they may be outdated (see computetimings.read_page_results).
+#
+# Usage:
+#           ./postprocess.py LOGDIR [PROCESSES]
+#                   LOGDIR:     Log directory of the loader (a run directory)
+#                   PROCESSES:  How many page loads to process at the same time (default: 1)
+
+import os
+import io
+import sys
+import csv
+import contextlib
+import concurrent.futures
+import computetimings
+
+# Leave the CPU to the browser first
+NICENESS = 10
+
+# Process one page load, given its line of navtimings.log
+# Returns its page label and None, or an error message
+def process_page(run, navtline):
+	navt = next(csv.DictReader(io.StringIO(navtline), fieldnames=computetimings.navtiming_fields))
+	pagelabel = computetimings.get_pagelabel(navt)
+	try:
+		# Keep the per-page summary out of our log
+		with contextlib.redirect_stdout(io.StringIO()):
+			(row, comparerows) = computetimings.compute_page_timings(navt, run)
+		computetimings.write_page_results(run, navt, row, comparerows)
+	except Exception as err:
+		return (pagelabel, str(type(err).__name__) + ": " + str(err))
+	return (pagelabel, None)
+
+# Read the lines appended to a file since offset, only complete ones
+# Returns the lines and the new offset
+def read_new_lines(filename, offset):
+	try:
+		with open(filename, 'rb') as f:
+			f.seek(offset)
+			data = f.read()
+	except IOError:
+		return ([], offset)
+	complete = data[:data.rfind(b"\n") + 1]
+	return ([ line for line in complete.decode("utf-8").split("\n") if line ], offset + len(complete))
+
+def main(argv=[]):
+	if len(argv) < 2:
+		print("Usage: " + argv[0] + " LOGDIR [PROCESSES]")
+		return 1
+	run = argv[1]
+	if run[-1] != "/":
+		run = run + "/"
+	try:
+		processes = int(argv[2])
+	except:
+		processes = 1
+
+	os.nice(NICENESS)
+	navtimingsfilename = run + computetimings.NAVTIMINGS_FILENAME
+	offset = 0
+	futures = []
+	with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+		while True:
+			line = sys.stdin.readline()
+			(navtlines, offset) = read_new_lines(navtimingsfilename, offset)
+			futures += [ pool.submit(process_page, run, navtline) for navtline in navtlines ]
+			if not line:
+				break
+
+		processed = set()
+		for future in futures:
+			(pagelabel, error) = future.result()
+			if error is not None:
+				print("Could not process " + pagelabel + ": " + error)
+			else:
+				processed.add(pagelabel)
+	print("Processed " + str(len(processed)) + "/" + str(len(futures)) + " page loads of " + run)
+	sys.stdout.flush()
+
+	# Only page loads we could process (e.g., not the ones without HAR file), as computetimings.py would
+	# only take the successful ones
+	navtimings = [ navt for navt in (computetimings.read_navtimings(run) or []) if computetimings.get_pagelabel(navt) in processed ]
+	if navtimings:
+		try:
+			computetimings.compute_timings(navtimings, run, log=True)
+		except Exception as err:
+			print("Could not write " + computetimings.LOGFILENAME + " for " + run + ": " + str(type(err).__name__) + ": " + str(err))
+			return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+#
+# Timestamps as integers: microseconds since 1970-01-01, in the same (local, naive) clock as the page labels
+#
+# The same instant shows up in several formats -- page labels and HAR timings logs ("%Y-%m-%d+%H-%M-%S.%f"),
+# HAR files (ISO, with Z or an offset, which we ignore, see hartimings.parse_har_time), starttimings.log
+# ("%Y-%m-%d %H:%M:%S.%f") and tshark (epoch seconds as float). Convert them once when reading them,
+# so matching objects to page loads only compares integers.
+#
+# Timestamps in these formats have a fixed layout, so we take them apart by position instead of using strptime,
+# which is slow. Anything else goes to strptime, and fails the same way as before.
+# If numpy is installed, parse_times converts a whole list at once.
+
+import math
+import datetime
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+LABEL_FORMAT = "%Y-%m-%d+%H-%M-%S.%f"
+SPACE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+US_PER_SECOND = 10**6
+US_PER_DAY = 86400 * US_PER_SECOND
+
+# Separators of a timestamp in this format, e.g., "--+--." -- all formats above have the same layout:
+# year in [0:4], month in [5:7], ... seconds in [17:19], one separator in between each (every three characters
+# from [4]), and the fraction of seconds from [20:]
+def get_separators(fmt):
+	return datetime.datetime(2000, 1, 1).strftime(fmt)[4:20:3]
+
+SEPARATORS = {}
+
+# Digits of a timestamp with the fixed layout of this format (year, month, ..., fraction of seconds), otherwise None
+def get_digits(timestamp, fmt):
+	try:
+		separators = SEPARATORS[fmt]
+	except KeyError:
+		separators = SEPARATORS.setdefault(fmt, get_separators(fmt))
+	if timestamp[4:20:3] != separators or not 20 < len(timestamp) <= 26:
+		return None
+	digits = timestamp[0:4] + timestamp[5:7] + timestamp[8:10] + timestamp[11:13] + timestamp[14:16] + timestamp[17:19] + timestamp[20:]
+	if not digits.isdigit() or not digits.isascii():
+		return None
+	return digits
+
+# Microseconds since the epoch, if the timestamp has the fixed layout of this format, otherwise None
+def parse_fixed(timestamp, fmt):
+	digits = get_digits(timestamp, fmt)
+	if digits is None:
+		return None
+	(hours, minutes, seconds) = (int(digits[8:10]), int(digits[10:12]), int(digits[12:14]))
+	if hours > 23 or minutes > 59 or seconds > 59:
+		return None
+	try:
+		days = datetime.date(int(digits[0:4]), int(digits[4:6]), int(digits[6:8])).toordinal() - EPOCH_ORDINAL
+	except ValueError:
+		return None
+	return days * US_PER_DAY + ((hours * 60 + minutes) * 60 + seconds) * US_PER_SECOND + int(digits[14:].ljust(6, "0"))
+
+# Microseconds since the epoch of a timestamp string in this format
+# Raises ValueError like datetime.strptime if it is not in this format
+def parse_time(timestamp, fmt=LABEL_FORMAT):
+	us = parse_fixed(timestamp, fmt)
+	if us is None:
+		us = to_us(datetime.datetime.strptime(timestamp, fmt))
+	return us
+
+# Microseconds since the epoch of a list of timestamp strings in this format, using numpy if we have it
+# Raises ValueError if one of them is not in this format
+def parse_times(timestamps, fmt=LABEL_FORMAT):
+	if numpy is not None and timestamps:
+		# numpy only reads ISO timestamps, bring them into this layout first
+		# It checks the fields itself, and we fall back to parse_time for anything it does not like
+		if all([ get_digits(timestamp, fmt) is not None for timestamp in timestamps ]):
+			isotimestamps = [ timestamp[0:10] + "T" + timestamp[11:13] + ":" + timestamp[14:16] + ":" + timestamp[17:] for timestamp in timestamps ]
+			try:
+				return numpy.array(isotimestamps, dtype="datetime64[us]").astype("int64").tolist()
+			except ValueError:
+				pass
+	return [ parse_time(timestamp, fmt) for timestamp in timestamps ]
+
+# Microseconds since the epoch of a naive datetime
+def to_us(dt):
+	return (dt - EPOCH) // datetime.timedelta(microseconds = 1)
+
+def to_datetime(us):
+	return EPOCH + datetime.timedelta(microseconds = us)
+
+# Timestamp string in this format, like datetime.strftime (always six digits of fractional seconds)
+def format_time(us, fmt=LABEL_FORMAT):
+	return to_datetime(us).strftime(fmt)
+
+# Microseconds since the epoch of a Unix timestamp (seconds as float or string, e.g., from tshark), in local time
+def from_epoch(seconds):
+	return to_us(datetime.datetime.fromtimestamp(float(seconds)))
+
+# Milliseconds (float) to microseconds, rounded like datetime.timedelta(milliseconds = ms)
+def ms_to_us(ms):
+	(fraction, whole) = math.modf(ms)
+	return int(whole) * 1000 + round(fraction * 1000.0)
+
+# Microseconds to seconds, like datetime.timedelta.total_seconds()
+def us_to_seconds(us):
+	return us / US_PER_SECOND
+
+# Microseconds to milliseconds, like datetime.timedelta.total_seconds() * 1000.0
+def us_to_ms(us):
+	return us_to_seconds(us) * 1000.0
@@ -5,6 +5,11 @@
 
 # This script computes object sizes from a packet capture trace
 # and compare them to HAR and Resource Timings
+#
+# Usage:
+#           ./validate_object_size.py [--jobs N] [RUNFILTER]
+#                   --jobs N:   process N runs at the same time, each in its own process (default: 1)
+#                   RUNFILTER:  every run which contains this string will be considered (default: consider all runs)
 
 import os
 import sys
@@ -13,13 +18,16 @@ import subprocess
 import logging
 import csv
 import re
-import datetime
+import timestamps
 import computetimings
 
 RUNDIR="../testdata/"
 
 CAPTURE_FILE_NAME = "local\:any.pcap"
 
+# HTTP traffic of each capture segment, if the capture was segmented by page load
+HTTP_SEGMENT_DIR = "pcap/http_and_not_ssl/"
+
 # For debugging
 #ADDITIONAL_TSHARK_FILTER = " \"frame.number >= 0 and frame.number <= 1000\" "
 ADDITIONAL_TSHARK_FILTER = ""
@@ -36,15 +44,15 @@ def get_matching_hartiming(hartimings, uri_to_look_for, timestamp_to_look_for, s
 	candidates = []
 	for hart in hartimings:
 		har_uri = hart["name"]
-		if har_uri == uri_to_look_for and (hart["status"] == statuscode_to_look_for or statuscode_to_look_for == ""):
+		if har_uri == uri_to_look_for and (str(hart["status"]) == statuscode_to_look_for or statuscode_to_look_for == ""):
 			logging.debug("HAR: " + str(hart))
-			startedDateTime = datetime.datetime.strptime(hart["startedDateTime"], "%Y-%m-%d+%H-%M-%S.%f")
+			startedDateTime = hart["startedDateTime"]
 			if not use_starttime:
-				pre_send_duration = datetime.timedelta(milliseconds = 0)
+				pre_send_duration = 0
 				try:
 					# See if this HAR timing is within timing range +- 1 ms (due to rounding)
-					pre_send_duration = datetime.timedelta(milliseconds=computetimings.sum_timings([hart["blockedTime"], hart["dnsTime"], hart["connectTime"], hart["sslTime"]]) - 1)
-					post_send_duration = datetime.timedelta(milliseconds=computetimings.sum_timings([hart["blockedTime"], hart["dnsTime"], hart["connectTime"], hart["sslTime"], hart["sendTime"]]) + 1)
+					pre_send_duration = timestamps.ms_to_us(computetimings.sum_timings([hart["blockedTime"], hart["dnsTime"], hart["connectTime"], hart["sslTime"]]) - 1)
+					post_send_duration = timestamps.ms_to_us(computetimings.sum_timings([hart["blockedTime"], hart["dnsTime"], hart["connectTime"], hart["sslTime"], hart["sendTime"]]) + 1)
 				except ValueError:
 					# No timings available - not taking this object
 					logging.debug("No timings for " + str(hart))
@@ -52,8 +60,8 @@ def get_matching_hartiming(hartimings, uri_to_look_for, timestamp_to_look_for, s
 				pre_send_time = startedDateTime + pre_send_duration
 				post_send_time = startedDateTime + post_send_duration
 			else:
-				pre_send_time = startedDateTime - datetime.timedelta(milliseconds = 1)
-				post_send_time = startedDateTime + datetime.timedelta(milliseconds = computetimings.sum_timings([hart["dnsTime"], hart["connectTime"], hart["sslTime"], hart["sendTime"], hart["waitTime"], hart["receiveTime"]]))
+				pre_send_time = startedDateTime - timestamps.ms_to_us(1)
+				post_send_time = startedDateTime + timestamps.ms_to_us(computetimings.sum_timings([hart["dnsTime"], hart["connectTime"], hart["sslTime"], hart["sendTime"], hart["waitTime"], hart["receiveTime"]]))
 			logging.debug("\tchecking if timestamp_to_look_for " + str(timestamp_to_look_for) + " is between " + str(pre_send_time) + " and " + str(post_send_time))
 			# Return the first HAR timing that falls into our timing range
 			if timestamp_to_look_for >= pre_send_time and timestamp_to_look_for <= post_send_time:
@@ -61,7 +69,7 @@ def get_matching_hartiming(hartimings, uri_to_look_for, timestamp_to_look_for, s
 				candidates.append(hart)
 				logging.debug("\t\tYes!\n")
 			else:
-				hart["timediff"] = min(abs((timestamp_to_look_for - pre_send_time).total_seconds()), abs((post_send_time - timestamp_to_look_for).total_seconds()))
+				hart["timediff"] = timestamps.us_to_seconds(min(abs(timestamp_to_look_for - pre_send_time), abs(post_send_time - timestamp_to_look_for)))
 				candidates.append(hart)
 				logging.debug("\tTimediff " + str(hart["timediff"]))
 
@@ -104,8 +112,8 @@ def get_matching_restiming(restimings, uri_to_look_for, timestamp_to_look_for, p
 	for rest in restimings:
 		res_uri = rest["name"]
 		if res_uri == uri_to_look_for:
-			startedDateTime = page_startedDateTime + datetime.timedelta(milliseconds = float(rest["starttime"]))
-			duration = datetime.timedelta(milliseconds=float(rest["duration"]))
+			startedDateTime = page_startedDateTime + timestamps.ms_to_us(float(rest["starttime"]))
+			duration = timestamps.ms_to_us(float(rest["duration"]))
 			endTime = startedDateTime + duration
 			logging.debug("Is " + str(timestamp_to_look_for) + " between " + str(startedDateTime) + " and " + str(endTime) + "?")
 			if not match_closest:
@@ -115,7 +123,7 @@ def get_matching_restiming(restimings, uri_to_look_for, timestamp_to_look_for, p
 				if timestamp_to_look_for >= startedDateTime and timestamp_to_look_for <= endTime:
 					timediff = 0
 				else:
-					timediff = min(abs((timestamp_to_look_for - startedDateTime).total_seconds()), abs((endTime - timestamp_to_look_for).total_seconds()))
+					timediff = timestamps.us_to_seconds(min(abs(timestamp_to_look_for - startedDateTime), abs(endTime - timestamp_to_look_for)))
 				rest["timediff"] = timediff
 				candidates.append(rest)
 	if not match_closest or len(candidates) < 1:
@@ -129,19 +137,20 @@ def get_matching_restiming(restimings, uri_to_look_for, timestamp_to_look_for, p
 				logging.debug("new min candidate with " + str(mincandidate["timediff"]))
 		return mincandidate
 
-def log_validation(run, log=True):
-	HTTP_PCAP_FILE = run + "pcap/http_and_not_ssl.pcap"
-	print("Logging validation object sizes for " + HTTP_PCAP_FILE)
-
-	if not os.path.exists(HTTP_PCAP_FILE):
+# Filter a packet capture for only HTTP (not HTTPS) traffic, unless this has been done before
+def filter_http(pcapfile, httppcapfile):
+	if not os.path.exists(httppcapfile):
 		print("Filtering pcap for only http traffic, this may take a while...")
-		subprocess.run("tshark -r " + run + "pcap/" + CAPTURE_FILE_NAME + " -w " + HTTP_PCAP_FILE + " -Y \"(tcp.srcport == 80 or tcp.dstport == 80 and not ssl) and tcp.len > 0\"", shell=True)
+		subprocess.run("tshark -r " + pcapfile + " -w " + httppcapfile + " -Y \"(tcp.srcport == 80 or tcp.dstport == 80 and not ssl) and tcp.len > 0\"", shell=True)
 
+# Read HTTP requests and responses from a filtered packet capture, compute header and body sizes
+# Returns a dict of tcp.stream -> list of resources
+def read_tcpstreams(httppcapfile):
 	csv.register_dialect('sepbyhash', delimiter='#')
 
-	process_headers = subprocess.run("tshark -r " + HTTP_PCAP_FILE + (" -Y" + ADDITIONAL_TSHARK_FILTER if ADDITIONAL_TSHARK_FILTER else "") + " -T fields -E separator=# -e frame.time_epoch -e tcp.stream -e tcp.srcport -e tcp.seq -e tcp.ack -e http.host -e http.request.uri -e http.response.code -e tcp.len", shell=True, stdout=subprocess.PIPE, universal_newlines=True)
+	process_headers = subprocess.run("tshark -r " + httppcapfile + (" -Y" + ADDITIONAL_TSHARK_FILTER if ADDITIONAL_TSHARK_FILTER else "") + " -T fields -E separator=# -e frame.time_epoch -e tcp.stream -e tcp.srcport -e tcp.seq -e tcp.ack -e http.host -e http.request.uri -e http.response.code -e tcp.len", shell=True, stdout=subprocess.PIPE, universal_newlines=True)
 	# Process trace once more to get raw TCP data - this only works if data has not been analyzed by HTTP dissector
-	process_data = subprocess.run("tshark -r " + HTTP_PCAP_FILE + (" -Y" + ADDITIONAL_TSHARK_FILTER if ADDITIONAL_TSHARK_FILTER else "") + " --disable-protocol http -T fields -e data", shell=True, stdout=subprocess.PIPE, universal_newlines=True)
+	process_data = subprocess.run("tshark -r " + httppcapfile + (" -Y" + ADDITIONAL_TSHARK_FILTER if ADDITIONAL_TSHARK_FILTER else "") + " --disable-protocol http -T fields -e data", shell=True, stdout=subprocess.PIPE, universal_newlines=True)
 
 	headers = process_headers.stdout.splitlines()
 	data = process_data.stdout.splitlines()
@@ -279,29 +288,13 @@ def log_validation(run, log=True):
 					else:
 						# Got something, but not the start of an HTTP reply... invalidating this resource
 						resource["tcp.seq_to_expect"] = -1
+	return tcpstreams
 
-	logfilename = run + "object_sizes_trace.log"
-
-	if log:
-		try:
-			if os.path.exists(logfilename):
-				os.remove(logfilename)
-				print("Deleted old " + logfilename)
-		except Exception as err:
-			print("Could not delete " + logfilename + ": " + str(err))
-		try:
-			csvfile = open(logfilename, "w", newline='')
-		except TypeError as e:
-			print("Error opening " + logfilename + ": " + str(e))
-			csvfile = open(logfilename, 'wb')
-		csvwriter = csv.writer(csvfile, delimiter=",")
-
-	starttimings = computetimings.read_starttimings(run)
-	navtimings = computetimings.read_navtimings(run)
-	hartimings = {}
-	restimings = {}
-	resources_per_page_load = {}
-
+# Match TCP streams to page loads (pagelabel) based on timestamps, add their resources to resources_per_page_load
+# If the streams come from the capture segment of one page load (segmentlabel), only take the ones of that page load
+def assign_tcpstreams(tcpstreams, starttimings, resources_per_page_load, segmentlabel=None):
+	if not tcpstreams:
+		return
 	max_tcpstream = max([ int(streamid) for streamid in tcpstreams.keys() ])
 	logging.debug("Max tcpstream: " + str(max_tcpstream))
 
@@ -315,7 +308,7 @@ def log_validation(run, log=True):
 			continue
 
 		# Find out which page load the first resource belongs to
-		requesttimestamp = datetime.datetime.fromtimestamp(float(resources[0]["requesttimestamp"]))
+		requesttimestamp = timestamps.from_epoch(resources[0]["requesttimestamp"])
 		(pageurl, starttime) = computetimings.find_first_url_in_starttimings(starttimings, requesttimestamp)
 		if not pageurl:
 			# Did not find which page load this belongs to - cannot do anything
@@ -324,19 +317,77 @@ def log_validation(run, log=True):
 			logging.debug("Found page url " + pageurl)
 		starttimestamp = starttime.replace(" ", "+").replace(":", "-")
 		pagelabel = pageurl.replace("http://", "") + "+" + starttimestamp
+		if segmentlabel is not None and pageurl.split('/')[2] + "+" + starttimestamp != segmentlabel:
+			# Connection of another page load that ran at the same time -- it is in that page load's segment, too
+			continue
 
 		try:
 			resources_per_page_load[pagelabel].extend(resources)
 		except KeyError:
 			resources_per_page_load[pagelabel] = resources
 
+# Capture segments of single page loads (see load/segment_capture.py), as a list of (pagelabel, file)
+def get_capture_segments(run):
+	segments = []
+	for segmentfile in sorted(glob.glob(run + computetimings.CAPTURE_SEGMENT_DIR + "*+*" + computetimings.CAPTURE_SEGMENT_SUFFIX)):
+		segments.append((os.path.basename(segmentfile)[:-len(computetimings.CAPTURE_SEGMENT_SUFFIX)], segmentfile))
+	return segments
+
+def log_validation(run, log=True):
+	segments = get_capture_segments(run)
+	mergedpages = computetimings.read_merged_pages(run)
+	if mergedpages is not None and not segments:
+		# The nodes' full captures are on different clocks, see merge_runs.py
+		print("Cannot validate object sizes for " + run + ": merged from several nodes, but without segmented captures")
+		return
+	if segments:
+		# Each page load has its own (small) capture, so only read that
+		print("Logging validation object sizes for " + str(len(segments)) + " capture segments in " + run + computetimings.CAPTURE_SEGMENT_DIR)
+		os.makedirs(run + HTTP_SEGMENT_DIR, exist_ok=True)
+		tcpstreams_per_segment = []
+		for (segmentlabel, segmentfile) in segments:
+			httpsegmentfile = run + HTTP_SEGMENT_DIR + segmentlabel + computetimings.CAPTURE_SEGMENT_SUFFIX
+			filter_http(segmentfile, httpsegmentfile)
+			tcpstreams_per_segment.append((segmentlabel, read_tcpstreams(httpsegmentfile)))
+	else:
+		HTTP_PCAP_FILE = run + "pcap/http_and_not_ssl.pcap"
+		print("Logging validation object sizes for " + HTTP_PCAP_FILE)
+		filter_http(run + "pcap/" + CAPTURE_FILE_NAME, HTTP_PCAP_FILE)
+		tcpstreams_per_segment = [ (None, read_tcpstreams(HTTP_PCAP_FILE)) ]
+
+	logfilename = run + "object_sizes_trace.log"
+
+	if log:
+		try:
+			if os.path.exists(logfilename):
+				os.remove(logfilename)
+				print("Deleted old " + logfilename)
+		except Exception as err:
+			print("Could not delete " + logfilename + ": " + str(err))
+		try:
+			csvfile = open(logfilename, "w", newline='')
+		except TypeError as e:
+			print("Error opening " + logfilename + ": " + str(e))
+			csvfile = open(logfilename, 'wb')
+		csvwriter = csv.writer(csvfile, delimiter=",")
+
+	starttimings = computetimings.read_starttimings(run)
+	navtimings = computetimings.read_navtimings(run)
+	hartimings = {}
+	restimings = {}
+	resources_per_page_load = {}
+
+	for (segmentlabel, tcpstreams) in tcpstreams_per_segment:
+		# Packets of a merged run are on the clock of their node
+		assign_tcpstreams(tcpstreams, computetimings.get_node_starttimings(starttimings, mergedpages, segmentlabel), resources_per_page_load, segmentlabel)
+
 	for (pagelabel, resources) in resources_per_page_load.items():
 		print("Page load: " + pagelabel)
 		# Sort resources in this page load by requesttimestamp, then match them to HAR and resource timings
 		for r in sorted(resources, key=lambda k: float(k["requesttimestamp"])):
 			try:
 				uri = "http://" + r["host"] + r["uri"]
-				requesttimestamp = datetime.datetime.fromtimestamp(float(r["requesttimestamp"]))
+				requesttimestamp = timestamps.from_epoch(r["requesttimestamp"])
 				bodylen = r["bodylen"]
 			except KeyError:
 				logging.info("\t\t" + "no reply for " + str(r["uri"]))
@@ -378,10 +429,10 @@ def log_validation(run, log=True):
 			else:
 				# Get a resource timing matching this specific resource
 				try:
-					rest = get_matching_restiming(restimings[pagelabel], uri, requesttimestamp, datetime.datetime.fromtimestamp(float(navt["navigationStart"])))
+					rest = get_matching_restiming(restimings[pagelabel], uri, requesttimestamp, timestamps.from_epoch(navt["navigationStart"]))
 				except KeyError:
 					restimings[pagelabel] = computetimings.get_restimings(run, pagelabel)
-					rest = get_matching_restiming(restimings[pagelabel], uri, requesttimestamp, datetime.datetime.fromtimestamp(float(navt["navigationStart"])))
+					rest = get_matching_restiming(restimings[pagelabel], uri, requesttimestamp, timestamps.from_epoch(navt["navigationStart"]))
 
 			if not rest:
 				res_bodylen = "NA"
@@ -403,6 +454,7 @@ def log_validation(run, log=True):
 
 
 def main(argv=[]):
+	(jobs, argv) = computetimings.get_jobs_argument(argv)
 	log = True
 	if ADDITIONAL_TSHARK_FILTER:
 		log = False
@@ -413,10 +465,11 @@ def main(argv=[]):
 		runs = [ r for r in runs if runfilter in r ]
 
 	print("Running for " + str(runs))
-	for run in runs:
-		if run[-1] != "/":
-			run = run + "/"
-		log_validation(run, log)
+	runs = [ run if run[-1] == "/" else run + "/" for run in runs ]
+	failed = computetimings.process_runs(runs, log_validation, (log,), jobs)
+	if failed:
+		print("Failed runs: " + str(failed))
+	return 1 if failed else 0
 
 if __name__ == "__main__":
-	main(sys.argv)
+	sys.exit(main(sys.argv))
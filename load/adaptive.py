@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+#
+# Repeat page loads only as often as needed: adaptive number of repetitions per URL
+#
+# Instead of loading every URL the same number of times, loads every URL $MIN_TIMES times first,
+# then computes for every URL the 95% confidence interval of the mean of its onLoad time (loadEventStart,
+# from navtimings.log) and of its Byte Index (from final_timings.log and the per-page results in pages/,
+# see compute/postprocess.py). Only URLs whose confidence interval is wider than $CI_TARGET times its mean,
+# for either metric, get more repetitions -- as many as the current variance says are needed, at most
+# twice as many as so far, and at most MAX_TIMES in total. This goes on in rounds until all URLs are
+# precise enough or reached MAX_TIMES.
+#
+# The repetitions are jobs in a job queue (see jobqueue.py), so an interrupted campaign can be resumed by
+# running this again. Every round runs orchestrate.py on the queue and writes to its own run directories
+# <LOGPREFIX>-r<ROUND>-k<INSTANCE>/, which computetimings.py can process like any other runs.
+# If URLFILE is a job queue itself ("queue:<DBFILE>[:<SCENARIO>]"), this only adds the repetitions to it
+# and waits for workers elsewhere (e.g., other hosts) to load them, reading their results from <LOGPREFIX>*/.
+#
+# Usage:
+#           ./adaptive.py <URLFILE> [<MIN_TIMES>] [<MAX_TIMES>] [<SCENARIO>] [<LOGPREFIX>] [<INSTANCES>]
+#                   URLFILE:    Text file containing one or more URLs, one each line,
+#                               or "queue:<DBFILE>[:<SCENARIO>]" to add the repetitions to a job queue
+#                   MIN_TIMES:  How often to load every URL at least (default: 5, at least 2)
+#                   MAX_TIMES:  How often to load every URL at most (default: 30)
+#                   SCENARIO:   String describing the scenario (default: "test")
+#                   LOGPREFIX:  Prefix of the run directories (default: log/run-<DATE>-<SCENARIO>_adaptive),
+#                               the job queue is <LOGPREFIX>.db and the log of all rounds <LOGPREFIX>.adaptive.log
+#                               (round, URL, repetitions, successful page loads, mean and relative CI half width
+#                               of onLoad and of Byte Index, precise/more/cap, repetitions scheduled)
+#                   INSTANCES:  How many loaders to run at the same time (default: see orchestrate.py)
+#
+# Environment:
+#                   CI_TARGET:      Largest acceptable half width of the 95% confidence interval, relative to the mean (default: 0.05)
+#                   WAIT_INTERVAL:  With a job queue of other workers, check this often if they are done, in seconds (default: 30)
+#                   LOADER:         Which loader to use (default: ./load_url_using_marionette.py, see orchestrate.py)
+
+import os
+import sys
+import csv
+import glob
+import math
+import time
+import datetime
+
+# Compute the Byte Index of every page load while loading the next ones (see worker.py)
+os.environ.setdefault("POSTPROCESS", "1")
+
+import orchestrate
+import jobqueue
+
+CI_TARGET = float(os.environ.get("CI_TARGET", 0.05))
+
+WAIT_INTERVAL = float(os.environ.get("WAIT_INTERVAL", 30))
+
+# Fields of navtimings.log (see collect_timings.py)
+NAVT_PAGE_FIELD = 0
+NAVT_STARTTIME_FIELD = 2
+LOAD_EVENT_START_FIELD = 21
+
+# Fields of final_timings.log and pages/*.row.csv (see compute/computetimings.py):
+# Byte Index based on Content-Length or body size
+FINAL_PAGE_FIELD = 0
+FINAL_STARTTIME_FIELD = 2
+BYTE_INDEX_FIELD = 32
+
+PAGE_RESULTS_GLOB = "pages/*.row.csv"
+
+# Two-sided 97.5% quantiles of Student's t distribution by degrees of freedom, for 95% confidence intervals
+T_QUANTILES = { 1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+	11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086,
+	21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042,
+	40: 2.021, 60: 2.000, 120: 1.980 }
+T_QUANTILE_LIMIT = 1.960
+
+
+# t quantile for this many degrees of freedom, from the next smaller entry of the table (so, on the safe side)
+def tQuantile(df):
+	known = [ d for d in T_QUANTILES if d <= df ]
+	if df > max(T_QUANTILES) * 2:
+		return T_QUANTILE_LIMIT
+	return T_QUANTILES[max(known)]
+
+# Mean and half width of the 95% confidence interval of the mean, None if there are less than two values
+def confidenceInterval(values):
+	n = len(values)
+	if n < 2:
+		return None
+	mean = sum(values) / n
+	stdev = math.sqrt(sum([ (v - mean) ** 2 for v in values ]) / (n - 1))
+	return (mean, tQuantile(n - 1) * stdev / math.sqrt(n), stdev)
+
+# How many values we need for a confidence interval of at most target times the mean, given the current ones
+def neededRepetitions(values, target=CI_TARGET):
+	ci = confidenceInterval(values)
+	if ci is None:
+		return 2
+	(mean, halfwidth, stdev) = ci
+	if mean <= 0 or halfwidth <= target * mean:
+		return len(values)
+	return int(math.ceil((tQuantile(len(values) - 1) * stdev / (target * mean)) ** 2))
+
+# Read a comma-separated value of every line of these files, keyed by (page, starttime)
+def readValues(filenames, pagefield, starttimefield, valuefield):
+	values = {}
+	for filename in filenames:
+		try:
+			with open(filename, 'r', newline='') as f:
+				for fields in csv.reader(f):
+					try:
+						value = float(fields[valuefield])
+					except (IndexError, ValueError):
+						continue
+					if value > 0:
+						values[(fields[pagefield], fields[starttimefield])] = value
+		except IOError as err:
+			print("Could not read " + filename + ": " + str(err))
+	return values
+
+# Group values keyed by (page, starttime) by page
+def byUrl(values):
+	urls = {}
+	for ((url, starttime), value) in sorted(values.items()):
+		urls.setdefault(url, []).append(value)
+	return urls
+
+# onLoad times and Byte Indexes of all page loads in these run directories, as dicts of URL -> list of values
+def readMetrics(logdirs):
+	onload = readValues([ logdir + "navtimings.log" for logdir in logdirs if os.path.exists(logdir + "navtimings.log") ], NAVT_PAGE_FIELD, NAVT_STARTTIME_FIELD, LOAD_EVENT_START_FIELD)
+	# Stored per-page results are complete even while final_timings.log is still being written
+	finalfiles = []
+	for logdir in logdirs:
+		finalfiles += sorted(glob.glob(logdir + PAGE_RESULTS_GLOB))
+		if os.path.exists(logdir + "final_timings.log"):
+			finalfiles.append(logdir + "final_timings.log")
+	byteindex = readValues(finalfiles, FINAL_PAGE_FIELD, FINAL_STARTTIME_FIELD, BYTE_INDEX_FIELD)
+	return (byUrl(onload), byUrl(byteindex))
+
+# Decide how many repetitions every URL should have in total
+# Returns a dict of URL -> total repetitions (unchanged for URLs that are done), and one log line per URL
+def schedule(urls, repetitions, onload, byteindex, maxtimes, roundnumber):
+	totals = {}
+	lines = []
+	for url in urls:
+		done = repetitions.get(url, 0)
+		samples = onload.get(url, [])
+		needed = max(neededRepetitions(samples), neededRepetitions(byteindex.get(url, [])) if byteindex.get(url) else 0)
+		if needed <= len(samples):
+			status = "precise"
+			totals[url] = done
+		elif done >= maxtimes:
+			status = "cap"
+			totals[url] = done
+		else:
+			status = "more"
+			# The variance estimate of few samples is rough, so at most double the repetitions per round
+			totals[url] = min(maxtimes, max(done + 1, done + min(needed, 2 * len(samples) + 1) - len(samples)))
+
+		fields = [ roundnumber, url, done, len(samples) ]
+		for values in [ samples, byteindex.get(url, []) ]:
+			ci = confidenceInterval(values)
+			if ci is None:
+				fields += [ "NA", "NA" ]
+			else:
+				fields += [ round(ci[0], 1), round(ci[1] / ci[0], 4) if ci[0] > 0 else "NA" ]
+		lines.append(",".join([ str(field) for field in fields + [ status, totals[url] ] ]))
+	return (totals, lines)
+
+# Wait until workers elsewhere have no more jobs of this scenario to do
+def waitForWorkers(db, scenario):
+	while jobqueue.countJobs(db, "pending", scenario) + jobqueue.countJobs(db, "leased", scenario) > 0:
+		time.sleep(WAIT_INTERVAL)
+
+def main(argv=[]):
+	if len(argv) < 2 or argv[1] == "--help":
+		print("Usage: " + argv[0] + " <URLFILE> [<MIN_TIMES>] [<MAX_TIMES>] [<SCENARIO>] [<LOGPREFIX>] [<INSTANCES>]")
+		return 1
+	urlfile = argv[1]
+
+	try:
+		mintimes = max(2, int(argv[2]))
+	except:
+		mintimes = 5
+
+	try:
+		maxtimes = max(mintimes, int(argv[3]))
+	except:
+		maxtimes = max(mintimes, 30)
+
+	try:
+		scenario = str(argv[4])
+	except:
+		scenario = "test"
+
+	try:
+		logprefix = str(argv[5]).rstrip("/")
+	except:
+		logprefix = "log/run-" + datetime.datetime.now().strftime("%Y-%m-%dT%H:%M") + "-" + scenario + "_adaptive"
+
+	try:
+		instances = [ str(int(argv[6])) ]
+	except:
+		instances = []
+
+	orchestrate.createDirectory(os.path.dirname(logprefix) or ".")
+	if urlfile.startswith(jobqueue.PREFIX):
+		# Workers elsewhere load the pages
+		(dbfile, queuescenario) = jobqueue.parseSpec(urlfile)
+		scenario = queuescenario or scenario
+		db = jobqueue.openQueue(dbfile)
+		urls = jobqueue.getUrls(db, scenario)
+		external = True
+	else:
+		dbfile = logprefix + ".db"
+		db = jobqueue.openQueue(dbfile)
+		with open(urlfile, 'r') as f:
+			urls = [ line.strip() for line in f if line.strip() ]
+		external = False
+
+	totals = dict([ (url, mintimes) for url in urls ])
+	roundnumber = 1
+	while True:
+		added = sum([ jobqueue.addJobs(db, [ url ], total, scenario) for (url, total) in totals.items() ])
+		print("Round " + str(roundnumber) + ": added " + str(added) + " page loads")
+		if external:
+			waitForWorkers(db, scenario)
+			logdirs = [ logdir + "/" for logdir in sorted(glob.glob(logprefix + "*")) if os.path.isdir(logdir) ]
+		else:
+			orchestrate.main([ "orchestrate.py", jobqueue.PREFIX + dbfile + ":" + scenario, "1", scenario, logprefix + "-r" + str(roundnumber) ] + instances)
+			logdirs = [ logdir + "/" for logdir in sorted(glob.glob(logprefix + "-r*-k*")) if os.path.isdir(logdir) ]
+
+		repetitions = dict(db.execute("SELECT url, MAX(repetition) FROM jobs WHERE scenario = ? GROUP BY url", (scenario,)).fetchall())
+		(onload, byteindex) = readMetrics(logdirs)
+		(totals, lines) = schedule(urls, repetitions, onload, byteindex, maxtimes, roundnumber)
+		with open(logprefix + ".adaptive.log", 'a') as f:
+			f.write("\n".join(lines) + "\n")
+
+		more = [ url for url in urls if totals[url] > repetitions.get(url, 0) ]
+		print("Round " + str(roundnumber) + ": " + str(len(more)) + " of " + str(len(urls)) + " URLs need more page loads")
+		sys.stdout.flush()
+		if not more:
+			break
+		roundnumber += 1
+
+	loads = sum([ len(values) for values in onload.values() ])
+	precise = len([ line for line in lines if line.split(",")[-2] == "precise" ])
+	print(str(precise) + " of " + str(len(urls)) + " URLs are precise enough after " + str(loads) + " successful page loads (" + str(len(urls) * maxtimes) + " with " + str(maxtimes) + " repetitions each), see " + logprefix + ".adaptive.log")
+	db.close()
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
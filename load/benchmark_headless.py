@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+#
+# How many headless loaders can this host run at the same time, before the timings get noisy?
+#
+# Runs orchestrate.py with HEADLESS=1 and 1, 2, 4, ... instances, each time on the same URL list,
+# and compares for every number of instances: page loads per minute, share of successful page loads,
+# the load average of the host, and the timing noise -- for every URL, the coefficient of variation
+# (standard deviation / mean) of its onLoad time (loadEventStart) across its repetitions, median over
+# all URLs. Stops once the noise exceeds $NOISE_THRESHOLD times the noise of a single instance, or
+# once fewer page loads succeed than with a single instance, and reports the largest number of
+# instances that kept the noise below the threshold.
+#
+# Usage:
+#           ./benchmark_headless.py <URLFILE> [<TIMES>] [<MAX_INSTANCES>] [<LOGPREFIX>]
+#                   URLFILE:        Text file containing one or more URLs, one each line
+#                   TIMES:          How often to fetch each URL for every number of instances (default: 5, at least 2)
+#                   MAX_INSTANCES:  Try at most this many instances (default: number of CPUs)
+#                   LOGPREFIX:      Prefix of the run directories (default: log/benchmark-headless-<DATE>),
+#                                   the summary is written to <LOGPREFIX>.log
+#
+# Environment:
+#                   LOADER:           Which loader to use (default: ./load_url_using_marionette.py, see orchestrate.py)
+#                   NOISE_THRESHOLD:  How much more noise than with one instance is acceptable (default: 1.5)
+
+import os
+import sys
+import glob
+import math
+import time
+import datetime
+
+# All instances of orchestrate.py inherit this
+os.environ["HEADLESS"] = "1"
+
+import orchestrate
+
+NOISE_THRESHOLD = float(os.environ.get("NOISE_THRESHOLD", 1.5))
+
+# Fields of navtimings.log (see collect_timings.py)
+PAGE_FIELD = 0
+LOAD_EVENT_START_FIELD = 21
+
+# Success share may drop by this much before it counts as fewer successful page loads
+SUCCESS_TOLERANCE = 0.02
+
+
+# Read the onLoad times (ms after navigationStart) of all page loads in these run directories
+# Returns a dict of URL -> list of onLoad times
+def readOnLoadTimes(logdirs):
+	onload = {}
+	for logdir in logdirs:
+		try:
+			with open(logdir + "navtimings.log", 'r') as f:
+				for line in f:
+					fields = line.rstrip("\n").split(",")
+					try:
+						value = float(fields[LOAD_EVENT_START_FIELD])
+					except (IndexError, ValueError):
+						continue
+					if value > 0:
+						onload.setdefault(fields[PAGE_FIELD], []).append(value)
+		except IOError as err:
+			print("Could not read navtimings of " + logdir + ": " + str(err))
+	return onload
+
+def coefficientOfVariation(values):
+	mean = sum(values) / len(values)
+	variance = sum([ (v - mean) ** 2 for v in values ]) / (len(values) - 1)
+	return math.sqrt(variance) / mean
+
+def median(values):
+	values = sorted(values)
+	middle = len(values) // 2
+	if len(values) % 2:
+		return values[middle]
+	return (values[middle - 1] + values[middle]) / 2.0
+
+# Median across URLs of the coefficient of variation of their onLoad times, None if no URL was loaded twice
+def timingNoise(onload):
+	variations = [ coefficientOfVariation(values) for values in onload.values() if len(values) > 1 ]
+	if not variations:
+		return None
+	return median(variations)
+
+# Run all page loads with this many instances, return the measurements
+def runLevel(urlfile, times, numinstances, logprefix):
+	scenario = "headless-n" + str(numinstances)
+	levelprefix = logprefix + "-n" + str(numinstances)
+	start = time.time()
+	orchestrate.main([ "orchestrate.py", urlfile, str(times), scenario, levelprefix, str(numinstances) ])
+	minutes = (time.time() - start) / 60.0
+
+	logdirs = [ levelprefix + "-k" + str(index) + "/" for index in range(0, numinstances) ]
+	onload = readOnLoadTimes(logdirs)
+	successful = sum([ len(values) for values in onload.values() ])
+	return { "instances": numinstances, "successful": successful, "rate": successful / minutes if minutes > 0 else 0, "noise": timingNoise(onload), "loadavg": os.getloadavg()[0] }
+
+def formatLevel(level, loads, baseline=None):
+	noise = level["noise"]
+	relative = ""
+	if baseline is not None and noise is not None and baseline["noise"]:
+		relative = " (" + str(round(noise / baseline["noise"], 2)) + "x)"
+	return "\t".join([ str(level["instances"]), str(level["successful"]) + "/" + str(loads), str(round(level["rate"], 2)), str(round(noise * 100, 2)) + "%" + relative if noise is not None else "NA", str(round(level["loadavg"], 2)) ])
+
+def main(argv=[]):
+	if len(argv) < 2 or argv[1] == "--help":
+		print("Usage: " + argv[0] + " <URLFILE> [<TIMES>] [<MAX_INSTANCES>] [<LOGPREFIX>]")
+		return 1
+	urlfile = argv[1]
+
+	try:
+		times = max(2, int(argv[2]))
+	except:
+		times = 5
+
+	try:
+		maxinstances = int(argv[3])
+	except:
+		maxinstances = os.cpu_count() or 1
+
+	try:
+		logprefix = str(argv[4]).rstrip("/")
+	except:
+		logprefix = "log/benchmark-headless-" + datetime.datetime.now().strftime("%Y-%m-%dT%H:%M")
+
+	with open(urlfile, 'r') as f:
+		loads = len([ line for line in f if line.strip() ]) * times
+
+	lines = [ "\t".join([ "instances", "successful", "loads_per_minute", "onload_noise", "loadavg" ]) ]
+	baseline = None
+	sustained = None
+	numinstances = 1
+	while numinstances <= maxinstances:
+		level = runLevel(urlfile, times, numinstances, logprefix)
+		if baseline is None:
+			baseline = level
+		lines.append(formatLevel(level, loads, baseline))
+		print("\n".join(lines) + "\n")
+		sys.stdout.flush()
+
+		if level["noise"] is None:
+			print("Not enough successful page loads with " + str(numinstances) + " instances to measure timing noise")
+			break
+		if level["noise"] > NOISE_THRESHOLD * baseline["noise"]:
+			print("Timing noise with " + str(numinstances) + " instances exceeds " + str(NOISE_THRESHOLD) + " times the noise with one instance")
+			break
+		if level["successful"] < baseline["successful"] * (1 - SUCCESS_TOLERANCE):
+			print("Fewer successful page loads with " + str(numinstances) + " instances than with one instance")
+			break
+		sustained = numinstances
+		numinstances *= 2
+
+	if sustained is not None:
+		lines.append("This host sustains " + str(sustained) + " headless instances of " + orchestrate.LOADER)
+	else:
+		lines.append("Could not determine how many headless instances of " + orchestrate.LOADER + " this host sustains")
+	print(lines[-1])
+	with open(logprefix + ".log", 'w') as f:
+		f.write("\n".join(lines) + "\n")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
@@ -12,6 +12,10 @@
 # E.g. on Linux:
 # setcap cap_net_raw,cap_net_admin=eip /usr/sbin/tcpdump
 # ln -s /usr/sbin/tcpdump /usr/local/bin/tcpdump
+#
+# With SEGMENT_CAPTURE=1, the capture is also split into one file per page load,
+# pcap/<pagelabel>.pcap, see segment_capture.py (CAPTURE_SNAPLEN and CAPTURE_FILTER
+# apply to both ways of capturing)
 
 
 if [ "$1" == "" ]
@@ -34,7 +38,8 @@ CAPTURE_LOCAL=("any")
 echo "Capture traffic on: $CAPTURE_ON, runscript: $RUNSCRIPT, WORKLOADARGS: ${WORKLOADARGS[@]}"
 
 
-tcpdumpfilter="port 80 or port 53 or port 443"
+tcpdumpfilter="${CAPTURE_FILTER:-port 80 or port 53 or port 443}"
+snaplen="${CAPTURE_SNAPLEN:-0}"
 
 DATERUN=$(date +%Y-%m-%dT%H:%M)
 
@@ -54,8 +59,15 @@ i=0
 for capture in "${CAPTURE_LOCAL[@]}"
 do
 	interface=$capture
-	echo "    Local: Starting tcpdump interface $interface filtering ($tcpdumpfilter) ..."
-	tcpdump -i $interface -w- "$tcpdumpfilter" > $DIRECTORY/local:${capture}.pcap &
+	if [ "$SEGMENT_CAPTURE" == "1" ]
+	then
+		echo "    Local: Starting segmented capture on interface $interface filtering ($tcpdumpfilter) ..."
+		./segment_capture.py "$DIRECTORY" "$interface" "$tcpdumpfilter" &
+		SEGMENT_PIDS="$SEGMENT_PIDS $!"
+	else
+		echo "    Local: Starting tcpdump interface $interface filtering ($tcpdumpfilter) ..."
+		tcpdump -i $interface -s $snaplen -w- "$tcpdumpfilter" > $DIRECTORY/local:${capture}.pcap &
+	fi
 	sleep 1
 	i=`expr $i + 1`
 done
@@ -88,6 +100,11 @@ echo ""
 echo "    Local: Stopping tcpdump..."
 killall tcpdump
 sleep 1
+if [ -n "$SEGMENT_PIDS" ]
+then
+	# Segmented capture finishes writing its files once tcpdump is gone
+	wait $SEGMENT_PIDS
+fi
 
 echo "    Trying to match $RUNSCRIPT output with a log from ${WORKLOAD_LOGDIR}..."
 
@@ -106,7 +123,8 @@ then
 	then
 		echo "    Copying this capture to $WORKLOAD_LOGDIR/$logdir"
 		mkdir -p "$WORKLOAD_LOGDIR/$logdir/pcap"
-		mv ./$DIRECTORY/*.pcap "$WORKLOAD_LOGDIR/$logdir/pcap/"
+		# One segment per page load may be too many files for the command line
+		find ./$DIRECTORY -maxdepth 1 -name "*.pcap" -exec mv -t "$WORKLOAD_LOGDIR/$logdir/pcap/" {} +
 		mv ./$DIRECTORY/*.log "$WORKLOAD_LOGDIR/$logdir/"
 		rmdir ./$DIRECTORY
 		echo "	Done with $WORKLOAD_LOGDIR/$logdir/"
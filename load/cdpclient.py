@@ -0,0 +1,231 @@
+"""
+asyncio client for the Chrome DevTools Protocol
+
+Unlike PyChromeDevTools, which blocks on one socket per tab and drops every event
+that arrives while it waits for a command result, this client reads all messages
+in one background task and dispatches them:
+
+    - Command results go to the command that is waiting for them, so any number of
+      commands can be in flight at the same time.
+    - Events go to every subscription that matches them. Each subscription has its
+      own bounded queue -- if nobody reads it, the oldest events are dropped and counted.
+
+One connection to the browser serves all targets (tabs, browser contexts) using
+flattened sessions (Target.attachToTarget with flatten=true), so many page loads
+can share one process and one event loop.
+
+Example:
+
+    connection = await cdpclient.connect(await cdpclient.browserWebSocketUrl(9222))
+    session = await connection.attach(targetId)
+    events = session.subscribe([ "Network.", "Page.loadEventFired" ])
+    await session.send("Network.enable")
+    await session.send("Page.enable")
+    await session.send("Page.navigate", url="http://example.com")
+    await session.waitFor("Page.loadEventFired", timeout=60)
+    messages = events.drain()
+
+Dependencies:
+    websockets (https://pypi.org/project/websockets/)
+
+"""
+
+import asyncio
+import collections
+import json
+import urllib.request
+
+try:
+	import websockets
+except ImportError:
+	websockets = None
+
+
+# How many events a subscription keeps before dropping the oldest
+QUEUE_SIZE = 10000
+
+# Default timeout for commands (in seconds)
+COMMAND_TIMEOUT = 30
+
+
+class CDPError(Exception):
+	pass
+
+
+# Get the WebSocket URL to talk to the whole browser (not just one tab)
+async def browserWebSocketUrl(port, host="localhost"):
+	def get():
+		with urllib.request.urlopen("http://" + host + ":" + str(port) + "/json/version", timeout=5) as response:
+			return json.loads(response.read().decode("utf-8"))["webSocketDebuggerUrl"]
+	return await asyncio.get_event_loop().run_in_executor(None, get)
+
+async def connect(url):
+	if websockets is None:
+		raise CDPError("Need the websockets module to use the asyncio DevTools client")
+	connection = CDPConnection(await websockets.connect(url, max_size=None))
+	connection.start()
+	return connection
+
+
+class Subscription:
+	"""Bounded queue of the events matching methods (full names, or domain prefixes like "Network.")"""
+
+	def __init__(self, methods=None, sessionId=None, maxsize=QUEUE_SIZE):
+		self.methods = methods
+		self.sessionId = sessionId
+		self.queue = collections.deque(maxlen=maxsize)
+		self.dropped = 0
+		self.waiter = None
+
+	def matches(self, message):
+		if self.sessionId is not None and message.get("sessionId") != self.sessionId:
+			return False
+		if self.methods is None:
+			return True
+		method = message["method"]
+		return any([ method == m or (m.endswith(".") and method.startswith(m)) for m in self.methods ])
+
+	def put(self, message):
+		if len(self.queue) == self.queue.maxlen:
+			self.dropped += 1
+		self.queue.append(message)
+		if self.waiter is not None and not self.waiter.done():
+			self.waiter.set_result(None)
+
+	# Wait for the next event, return None on timeout
+	async def get(self, timeout=None):
+		if not self.queue:
+			self.waiter = asyncio.get_event_loop().create_future()
+			try:
+				await asyncio.wait_for(self.waiter, timeout)
+			except asyncio.TimeoutError:
+				return None
+			finally:
+				self.waiter = None
+		return self.queue.popleft()
+
+	# All events queued so far
+	def drain(self):
+		messages = list(self.queue)
+		self.queue.clear()
+		return messages
+
+
+class CDPConnection:
+	def __init__(self, websocket):
+		self.websocket = websocket
+		self.counter = 0
+		# Futures of commands waiting for their result, by message id
+		self.pending = {}
+		self.subscriptions = []
+		self.reader = None
+		self.closed = False
+
+	def start(self):
+		self.reader = asyncio.ensure_future(self.readMessages())
+
+	async def readMessages(self):
+		try:
+			async for text in self.websocket:
+				self.dispatch(json.loads(text))
+		except Exception as e:
+			error = e
+		else:
+			error = None
+		self.closed = True
+		for future in self.pending.values():
+			if not future.done():
+				future.set_exception(CDPError("Connection closed" + (": " + str(error) if error else "")))
+		self.pending = {}
+
+	def dispatch(self, message):
+		if "id" in message:
+			future = self.pending.pop(message["id"], None)
+			if future is None or future.done():
+				return
+			if "error" in message:
+				future.set_exception(CDPError(message["error"].get("message", str(message["error"]))))
+			else:
+				future.set_result(message.get("result", {}))
+		elif "method" in message:
+			for subscription in self.subscriptions:
+				if subscription.matches(message):
+					subscription.put(message)
+
+	# Send a command and wait for its result
+	async def send(self, method, params=None, sessionId=None, timeout=COMMAND_TIMEOUT):
+		if self.closed:
+			raise CDPError("Connection closed")
+		self.counter += 1
+		messageid = self.counter
+		message = { "id": messageid, "method": method, "params": params or {} }
+		if sessionId is not None:
+			message["sessionId"] = sessionId
+
+		future = asyncio.get_event_loop().create_future()
+		self.pending[messageid] = future
+		await self.websocket.send(json.dumps(message))
+		try:
+			return await asyncio.wait_for(future, timeout)
+		finally:
+			self.pending.pop(messageid, None)
+
+	def subscribe(self, methods=None, sessionId=None, maxsize=QUEUE_SIZE):
+		subscription = Subscription(methods, sessionId, maxsize)
+		self.subscriptions.append(subscription)
+		return subscription
+
+	def unsubscribe(self, subscription):
+		if subscription in self.subscriptions:
+			self.subscriptions.remove(subscription)
+
+	# Wait for one event (optionally also matching predicate), return it or None on timeout
+	async def waitFor(self, method, sessionId=None, timeout=None, predicate=None):
+		subscription = self.subscribe([ method ], sessionId, maxsize=None)
+		try:
+			deadline = asyncio.get_event_loop().time() + timeout if timeout is not None else None
+			while True:
+				remaining = deadline - asyncio.get_event_loop().time() if deadline is not None else None
+				if remaining is not None and remaining <= 0:
+					return None
+				message = await subscription.get(remaining)
+				if message is None:
+					return None
+				if predicate is None or predicate(message):
+					return message
+		finally:
+			self.unsubscribe(subscription)
+
+	# Attach to a target (e.g., a tab), returns a session for it
+	async def attach(self, targetId):
+		result = await self.send("Target.attachToTarget", { "targetId": targetId, "flatten": True })
+		return CDPSession(self, result["sessionId"], targetId)
+
+	async def close(self):
+		await self.websocket.close()
+		if self.reader is not None:
+			await self.reader
+
+
+class CDPSession:
+	"""One target of a connection: Commands and events of this target only"""
+
+	def __init__(self, connection, sessionId, targetId=None):
+		self.connection = connection
+		self.sessionId = sessionId
+		self.targetId = targetId
+
+	async def send(self, method, timeout=COMMAND_TIMEOUT, **params):
+		return await self.connection.send(method, params, self.sessionId, timeout)
+
+	def subscribe(self, methods=None, maxsize=QUEUE_SIZE):
+		return self.connection.subscribe(methods, self.sessionId, maxsize)
+
+	def unsubscribe(self, subscription):
+		self.connection.unsubscribe(subscription)
+
+	async def waitFor(self, method, timeout=None, predicate=None):
+		return await self.connection.waitFor(method, self.sessionId, timeout, predicate)
+
+	async def detach(self):
+		await self.connection.send("Target.detachFromTarget", { "sessionId": self.sessionId })
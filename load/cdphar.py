@@ -0,0 +1,250 @@
+"""
+Build a HAR file from Chrome DevTools Protocol Network events
+
+Instead of opening DevTools and exporting the HAR through an extension, the Chrome
+loader collects all messages it gets over its DevTools connection and passes
+them to a HARBuilder. It uses the same format as Chrome's own HAR export
+(creator "WebInspector", times in UTC), so hartimings.py can parse it as before.
+
+Used events:
+    Network.requestWillBeSent   starts an entry (or finishes the previous one of a redirect)
+    Network.responseReceived    response headers, status, protocol, and timing
+    Network.dataReceived        decoded body size
+    Network.loadingFinished     exact number of bytes on the wire (encodedDataLength, logged as _transferSize)
+    Network.loadingFailed       failed requests
+    Page.domContentEventFired   onContentLoad
+    Page.loadEventFired         onLoad
+
+"""
+
+import datetime
+
+try:
+	from urllib.parse import urlsplit, parse_qsl
+except ImportError:
+	from urlparse import urlsplit, parse_qsl
+
+
+HTTP_VERSIONS = { "http/0.9": "HTTP/0.9", "http/1.0": "HTTP/1.0", "http/1.1": "HTTP/1.1", "h2": "HTTP/2.0", "spdy": "HTTP/2.0" }
+
+PAGE_ID = "page_1"
+
+# Timings that add up to the time of an entry -- ssl is already part of connect
+TIME_FIELDS = [ "blocked", "dns", "connect", "send", "wait", "receive" ]
+
+
+# Format a Unix timestamp like Chrome's HAR export does
+def formatWallTime(walltime):
+	return datetime.datetime.utcfromtimestamp(walltime).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+def httpVersion(protocol):
+	if not protocol:
+		return ""
+	return HTTP_VERSIONS.get(protocol.lower(), protocol.upper())
+
+# DevTools gives headers as dict, multiple values of the same header separated by newlines
+def headerList(headers):
+	result = []
+	for (name, value) in (headers or {}).items():
+		for v in str(value).split("\n"):
+			result.append({ "name": name, "value": v })
+	return result
+
+def getHeader(headers, name):
+	for (key, value) in (headers or {}).items():
+		if key.lower() == name.lower():
+			return value
+	return None
+
+def leastNonNegative(values):
+	nonnegative = [ v for v in values if v >= 0 ]
+	return min(nonnegative) if nonnegative else None
+
+# Compute HAR timings from ResourceTiming of the DevTools Protocol (ms relative to requestTime)
+# Follows Chrome's own HAR export
+def harTimings(timing, issuetime, endtime):
+	if not timing:
+		return { "blocked": 0, "dns": -1, "connect": -1, "ssl": -1, "send": 0, "wait": 0, "receive": 0 }
+
+	requesttime = timing["requestTime"]
+	blocked = max((requesttime - issuetime) * 1000, 0) if issuetime is not None else 0
+	blockedstart = leastNonNegative([ timing["dnsStart"], timing["connectStart"], timing["sendStart"] ])
+	if blockedstart is not None:
+		blocked += blockedstart
+	else:
+		blockedstart = 0
+	if timing["proxyEnd"] != -1:
+		blocked = max(blocked, timing["proxyEnd"] - timing["proxyStart"])
+
+	dnsend = timing["dnsEnd"] if timing["dnsEnd"] >= 0 else -1
+	dns = (dnsend - blockedstart) if timing["dnsEnd"] >= 0 else -1
+
+	sslend = timing["sslEnd"] if timing["sslEnd"] > 0 else -1
+	ssl = (sslend - timing["sslStart"]) if timing["sslEnd"] > 0 else -1
+
+	connectend = timing["connectEnd"] if timing["connectEnd"] >= 0 else -1
+	connect = (connectend - leastNonNegative([ dnsend, blockedstart ])) if timing["connectEnd"] >= 0 else -1
+
+	sendend = timing["sendEnd"] if timing["sendEnd"] >= 0 else 0
+	send = max(sendend - max(connectend, dnsend, blockedstart), 0) if timing["sendEnd"] >= 0 else 0
+
+	highest = max(sendend, connectend, sslend, dnsend, blockedstart, 0)
+	wait = max(timing["receiveHeadersEnd"] - highest, 0)
+	receive = max((endtime - requesttime) * 1000 - timing["receiveHeadersEnd"], 0) if endtime is not None else 0
+
+	return { "blocked": blocked, "dns": dns, "connect": connect, "ssl": ssl, "send": send, "wait": wait, "receive": receive }
+
+
+class HARBuilder:
+	def __init__(self):
+		self.entries = []
+		# Entries of requests that are not finished yet, by requestId
+		self.pending = {}
+		self.pagestart = None
+		self.pagewalltime = None
+		self.pageurl = None
+		self.oncontentload = -1
+		self.onload = -1
+
+	def addMessages(self, messages):
+		for m in messages:
+			self.addMessage(m)
+
+	def addMessage(self, message):
+		method = message.get("method")
+		params = message.get("params", {})
+		if method == "Network.requestWillBeSent":
+			self.requestWillBeSent(params)
+		elif method == "Network.responseReceived":
+			entry = self.pending.get(params["requestId"])
+			if entry is not None:
+				entry["response"] = params["response"]
+		elif method == "Network.dataReceived":
+			entry = self.pending.get(params["requestId"])
+			if entry is not None:
+				entry["decodedSize"] += params.get("dataLength", 0)
+				entry["encodedSize"] += params.get("encodedDataLength", 0)
+		elif method == "Network.loadingFinished":
+			entry = self.pending.pop(params["requestId"], None)
+			if entry is not None:
+				self.finish(entry, params["timestamp"], params.get("encodedDataLength"))
+		elif method == "Network.loadingFailed":
+			entry = self.pending.pop(params["requestId"], None)
+			if entry is not None:
+				entry["error"] = params.get("errorText")
+				self.finish(entry, params["timestamp"], None)
+		elif method == "Page.domContentEventFired" and self.pagestart is not None:
+			self.oncontentload = (params["timestamp"] - self.pagestart) * 1000
+		elif method == "Page.loadEventFired" and self.pagestart is not None:
+			self.onload = (params["timestamp"] - self.pagestart) * 1000
+
+	def requestWillBeSent(self, params):
+		requestid = params["requestId"]
+		if "redirectResponse" in params and requestid in self.pending:
+			# Same requestId: The previous request got redirected
+			entry = self.pending.pop(requestid)
+			entry["response"] = params["redirectResponse"]
+			self.finish(entry, params["timestamp"], params["redirectResponse"].get("encodedDataLength"))
+
+		if self.pagestart is None:
+			# The first document request is the navigation to the page, ignore anything left over from before
+			if params.get("type", "Document") != "Document":
+				return
+			self.pagestart = params["timestamp"]
+			self.pagewalltime = params["wallTime"]
+			self.pageurl = params["request"]["url"]
+
+		self.pending[requestid] = {
+			"request": params["request"],
+			"issuetime": params["timestamp"],
+			"walltime": params["wallTime"] if "wallTime" in params else self.pagewalltime + params["timestamp"] - self.pagestart,
+			"response": None,
+			"decodedSize": 0,
+			"encodedSize": 0,
+			"error": None
+		}
+
+	def finish(self, entry, endtime, transfersize):
+		entry["endtime"] = endtime
+		entry["transferSize"] = transfersize
+		self.entries.append(entry)
+
+	# Entries of requests that did not finish are included as far as we know them
+	def getHAR(self):
+		entries = self.entries + [ dict(entry, endtime=None, transferSize=None) for entry in self.pending.values() ]
+		entries = sorted(entries, key=lambda e: e["walltime"])
+		return {
+			"version": "1.2",
+			"creator": { "name": "WebInspector", "version": "537.36" },
+			"pages": [ {
+				"startedDateTime": formatWallTime(self.pagewalltime) if self.pagewalltime is not None else "",
+				"id": PAGE_ID,
+				"title": self.pageurl or "",
+				"pageTimings": { "onContentLoad": self.oncontentload, "onLoad": self.onload }
+			} ],
+			"entries": [ self.harEntry(entry) for entry in entries ]
+		}
+
+	def harEntry(self, entry):
+		request = entry["request"]
+		response = entry["response"] or {}
+		protocol = httpVersion(response.get("protocol"))
+		requestheaders = response.get("requestHeaders") or request.get("headers", {})
+		postdata = request.get("postData")
+
+		harrequest = {
+			"method": request["method"],
+			"url": request["url"],
+			"httpVersion": protocol,
+			"headers": headerList(requestheaders),
+			"queryString": [ { "name": name, "value": value } for (name, value) in parse_qsl(urlsplit(request["url"]).query, keep_blank_values=True) ],
+			"cookies": [],
+			"headersSize": len(response["requestHeadersText"]) if response.get("requestHeadersText") else -1,
+			"bodySize": len(postdata) if postdata else 0
+		}
+		if postdata:
+			harrequest["postData"] = { "mimeType": getHeader(requestheaders, "Content-Type") or "", "text": postdata }
+
+		if response:
+			headerssize = len(response["headersText"]) if response.get("headersText") else -1
+			if response.get("fromDiskCache") or response.get("status") == 304:
+				bodysize = 0
+			elif headerssize >= 0 and entry["transferSize"] is not None:
+				bodysize = entry["transferSize"] - headerssize
+			elif entry["encodedSize"] > 0:
+				bodysize = entry["encodedSize"]
+			else:
+				bodysize = -1
+			harresponse = {
+				"status": response.get("status", 0),
+				"statusText": response.get("statusText", ""),
+				"httpVersion": protocol,
+				"headers": headerList(response.get("headers")),
+				"cookies": [],
+				"content": { "size": entry["decodedSize"], "mimeType": response.get("mimeType", "") },
+				"redirectURL": getHeader(response.get("headers"), "Location") or "",
+				"headersSize": headerssize,
+				"bodySize": bodysize,
+				"_transferSize": entry["transferSize"] if entry["transferSize"] is not None else entry["encodedSize"]
+			}
+		else:
+			# No response at all
+			harresponse = { "status": 0, "statusText": "", "httpVersion": "", "headers": [], "cookies": [], "content": { "size": 0, "mimeType": "x-unknown" }, "redirectURL": "", "headersSize": -1, "bodySize": -1, "_transferSize": 0 }
+		if entry["error"]:
+			harresponse["_error"] = entry["error"]
+
+		timings = harTimings(response.get("timing"), entry["issuetime"], entry["endtime"])
+		harentry = {
+			"pageref": PAGE_ID,
+			"startedDateTime": formatWallTime(entry["walltime"]),
+			"time": sum([ timings[field] for field in TIME_FIELDS if timings[field] > 0 ]),
+			"request": harrequest,
+			"response": harresponse,
+			"cache": {},
+			"timings": timings
+		}
+		if response.get("remoteIPAddress"):
+			harentry["serverIPAddress"] = response["remoteIPAddress"].strip("[]")
+		if "connectionId" in response:
+			harentry["connection"] = str(response["connectionId"])
+		return harentry
@@ -0,0 +1,449 @@
+"""
+Collect timings from a loaded page -- shared by all loaders
+
+Every loader passes an evaluate function, which runs a JavaScript expression
+in the page and returns its value, e.g., via Marionette, Selenium, or DevTools.
+All timings are read using a single script, so they are read at the same moment
+and cost only one round trip to the browser.
+
+The Resource Timing buffer of a page only holds 150 to 250 entries by default,
+so heavy pages drop entries before they can be read. The loaders therefore inject
+OBSERVER_SCRIPT into every page before it loads: It enlarges the buffer, and a
+PerformanceObserver collects all resource, paint, longtask, and navigation entries
+as they arrive. After the page load, drainTimings gets all of them together with
+the Navigation Timings in one call. How many entries did not fit into the buffer
+is logged per page (see logObserverCounts). If the script could not be injected,
+the timings are read from the buffer as before.
+
+Environment:
+    RESTIMING_BUFFER_SIZE  Resource Timing buffer size set in every page (default: 10000)
+
+HAR files are written as compact JSON, optionally compressed (HAR_COMPRESSION=gzip
+or zstd) and without response bodies (HAR_STRIP_CONTENT=1).
+
+With HAR_DOWNLOAD=1, the Firefox loaders let the browser write the HAR file itself,
+as a download into the har/ directory of the run, instead of getting the whole HAR
+through Marionette or WebDriver (see downloadHAR). It is compressed afterwards.
+
+With NO_HAR=1, the loaders do not export a HAR file at all. Instead, they log one
+line per object from the Resource Timings and the navigation entry of the page,
+including transfer sizes and (if the browser has it) the response status, to a
+.obj.log file (see logObjectTimings). computetimings.py uses it in place of the HAR.
+
+"""
+
+import os
+import gzip
+import json
+import shutil
+import readiness
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+
+# How to write HAR files: none, gzip, or zstd (needs the zstandard module, otherwise uses gzip)
+HAR_COMPRESSION = os.environ.get("HAR_COMPRESSION", "none")
+
+# Set to 1 to leave out response bodies (response.content.text) from HAR files
+HAR_STRIP_CONTENT = (os.environ.get("HAR_STRIP_CONTENT", "0") == "1")
+
+RESTIMING_BUFFER_SIZE = int(os.environ.get("RESTIMING_BUFFER_SIZE", 10000))
+
+# Set to 1 to let Firefox write the HAR file as a download (see downloadHAR)
+HAR_DOWNLOAD = (os.environ.get("HAR_DOWNLOAD", "0") == "1")
+
+# Set to 1 to skip the HAR export and log a .obj.log file per page instead
+NO_HAR = (os.environ.get("NO_HAR", "0") == "1")
+
+# Navigation Timings logged relative to navigationStart, in the order they are logged to navtimings.log
+NAVTIMING_FIELDS = [ "fetchStart", "domainLookupStart", "domainLookupEnd", "connectStart", "secureConnectionStart", "connectEnd", "requestStart", "responseStart", "responseEnd", "domLoading", "domInteractive", "domContentLoadedEventStart", "domContentLoadedEventEnd", "domComplete", "loadEventStart", "loadEventEnd" ]
+
+# Non-standard timings only exported by Firefox, also relative to navigationStart
+FIREFOX_PAINT_FIELDS = [ "timeToNonBlankPaint", "timeToDOMContentFlushed" ]
+
+# Paint Timing entries (already relative to navigationStart)
+PAINT_ENTRIES = [ "first-paint", "first-contentful-paint" ]
+
+# Returns performance.timing and paint entries as one JSON string
+# Timings that the browser does not support are left out
+NAVTIMING_SCRIPT = """(function() {
+	var timing = window.performance.timing;
+	var result = { "timing": {}, "paint": {} };
+	%s.forEach(function(field) { result.timing[field] = timing[field]; });
+	window.performance.getEntriesByType("paint").forEach(function(entry) { result.paint[entry.name] = entry.startTime; });
+	return JSON.stringify(result);
+})()""" % json.dumps([ "navigationStart", "redirectStart", "redirectEnd" ] + NAVTIMING_FIELDS + FIREFOX_PAINT_FIELDS)
+
+# Fields of each Resource Timing entry that we log
+# (transferSize and responseStatus only go to the .obj.log, see OBJTIMING_FIELDS)
+RESTIMING_FIELDS = [ "name", "initiatorType", "nextHopProtocol", "encodedBodySize", "decodedBodySize", "startTime", "redirectStart", "redirectEnd", "fetchStart", "domainLookupStart", "domainLookupEnd", "connectStart", "secureConnectionStart", "connectEnd", "requestStart", "responseStart", "responseEnd", "duration", "transferSize", "responseStatus" ]
+
+# Returns all Resource Timing entries as one JSON string:
+# A list of entries, each of them a list of the values of RESTIMING_FIELDS (to keep it compact)
+RESTIMING_SCRIPT = """(function() {
+	var fields = %s;
+	return JSON.stringify(window.performance.getEntriesByType("resource").map(function(entry) {
+		var e = entry.toJSON();
+		return fields.map(function(field) { return e[field]; });
+	}));
+})()""" % json.dumps(RESTIMING_FIELDS)
+
+# Fields of each object logged to a .obj.log file, in this order after the URL and the scenario
+OBJTIMING_FIELDS = [ "initiatorType", "responseStatus", "nextHopProtocol", "transferSize", "encodedBodySize", "decodedBodySize", "startTime", "domainLookupStart", "domainLookupEnd", "connectStart", "secureConnectionStart", "connectEnd", "requestStart", "responseStart", "responseEnd" ]
+
+# Returns the navigation entry (Navigation Timing Level 2) of the page as one JSON string,
+# in the same compact format as RESTIMING_SCRIPT, or null if the browser does not have it
+DOCUMENT_SCRIPT = """(function() {
+	var entries = performance.getEntriesByType("navigation");
+	if (!entries.length) { return null; }
+	var e = entries[0].toJSON();
+	return JSON.stringify(%s.map(function(field) { return e[field]; }));
+})()""" % json.dumps(RESTIMING_FIELDS)
+
+# Fields of the navigation entry (Navigation Timing Level 2) that the observer keeps
+NAVIGATION_ENTRY_FIELDS = [ "nextHopProtocol", "transferSize" ]
+
+# Runs in every page before any of its scripts: Enlarge the Resource Timing buffer, count how often it
+# was full anyway, and collect all entries in window.__webtimings as they arrive, in the same compact
+# format as RESTIMING_SCRIPT. Entry types that the browser does not support are skipped.
+# The browser hands entries to the observers asynchronously, so window.__webtimings.flush() collects
+# the ones it has not handed over yet. window.__webtimings.seen has every resource entry collected so far
+# (URL and startTime), so entries from the buffer can be added without duplicates (see DRAIN_SCRIPT)
+OBSERVER_SCRIPT = """(function() {
+	if (window.__webtimings) { return; }
+	var collected = window.__webtimings = { "observing": false, "resource": [], "seen": {}, "paint": {}, "longtask": [], "navigation": null, "bufferfull": 0, "observers": [] };
+	var fields = %s;
+	var navigationfields = %s;
+	if (performance.setResourceTimingBufferSize) { performance.setResourceTimingBufferSize(%d); }
+	performance.addEventListener("resourcetimingbufferfull", function() { collected.bufferfull += 1; });
+	collected.flush = function() {
+		collected.observers.forEach(function(o) { o.observer.takeRecords().forEach(o.collect); });
+	};
+	if (typeof PerformanceObserver === "undefined") { return; }
+	function observe(type, collect) {
+		try {
+			var observer = new PerformanceObserver(function(list) { list.getEntries().forEach(collect); });
+			observer.observe({ "entryTypes": [ type ] });
+			collected.observers.push({ "observer": observer, "collect": collect });
+			return true;
+		} catch (e) {
+			return false;
+		}
+	}
+	collected.observing = observe("resource", function(entry) {
+		var e = entry.toJSON();
+		collected.resource.push(fields.map(function(field) { return e[field]; }));
+		collected.seen[e.name + " " + e.startTime] = true;
+	});
+	observe("paint", function(entry) { collected.paint[entry.name] = entry.startTime; });
+	observe("longtask", function(entry) { collected.longtask.push(entry.duration); });
+	observe("navigation", function(entry) {
+		var e = entry.toJSON();
+		collected.navigation = navigationfields.map(function(field) { return e[field]; });
+	});
+})();""" % (json.dumps(RESTIMING_FIELDS), json.dumps(NAVIGATION_ENTRY_FIELDS), RESTIMING_BUFFER_SIZE)
+
+# Firefox has no API to run a script in every new document, so this registers a frame script
+# (run this in chrome context), which runs OBSERVER_SCRIPT in every new window of every tab
+FIREFOX_OBSERVER_SCRIPT = """var framescript = "addEventListener('DOMWindowCreated', function(event) {" +
+	"var win = event.target.defaultView;" +
+	"var sandbox = Components.utils.Sandbox(win, { sandboxPrototype: win, wantXrays: false });" +
+	"Components.utils.evalInSandbox(" + JSON.stringify(%s) + ", sandbox);" +
+	"}, true);";
+Services.mm.loadFrameScript("data:application/javascript," + encodeURIComponent(framescript), true);
+return true;""" % json.dumps(OBSERVER_SCRIPT)
+
+# Returns the Navigation Timings and all Resource Timings (collected by the observer, or
+# from the buffer if there is no observer), and the observer's counts, as one JSON string.
+# Entries that are in the buffer but that the observer did not get (yet) are added from the buffer.
+# Empties the observer's list, so every entry is only drained once
+DRAIN_SCRIPT = """(function() {
+	var collected = window.__webtimings;
+	var result = { "navtimings": %s, "document": %s, "buffered": performance.getEntriesByType("resource").length, "observed": null, "missed": null, "bufferfull": null, "longtasks": null, "navigation": null };
+	var buffer = %s;
+	if (collected && collected.observing) {
+		collected.flush();
+		var missed = JSON.parse(buffer).filter(function(values) {
+			var key = values[%d] + " " + values[%d];
+			var seen = collected.seen[key];
+			collected.seen[key] = true;
+			return !seen;
+		});
+		result.restimings = JSON.stringify(collected.resource.concat(missed));
+		result.observed = collected.resource.length;
+		result.missed = missed.length;
+		result.bufferfull = collected.bufferfull;
+		result.longtasks = collected.longtask;
+		result.navigation = collected.navigation;
+		collected.resource = [];
+		collected.longtask = [];
+	} else {
+		result.restimings = buffer;
+	}
+	return JSON.stringify(result);
+})()""" % (NAVTIMING_SCRIPT, DOCUMENT_SCRIPT, RESTIMING_SCRIPT, RESTIMING_FIELDS.index("name"), RESTIMING_FIELDS.index("startTime"))
+
+
+def getRelative(value, ref):
+	try:
+		result = value - ref
+	except:
+		result = value
+	return result
+
+
+# Get all Navigation Timings and paint timings of the current page as a dict
+def getNavigationTimings(evaluate):
+	result = json.loads(evaluate(NAVTIMING_SCRIPT))
+	timing = result["timing"]
+
+	navigationStart = timing["navigationStart"]
+	timings = { "navigationStart": navigationStart }
+	timings["redirectStart"] = getRelative(timing.get("redirectStart"), 0)
+	timings["redirectEnd"] = getRelative(timing.get("redirectEnd"), 0)
+	for field in NAVTIMING_FIELDS + FIREFOX_PAINT_FIELDS:
+		timings[field] = getRelative(timing.get(field), navigationStart)
+	for name in PAINT_ENTRIES:
+		timings[name] = result["paint"].get(name)
+	return timings
+
+
+# Log Navigation Timings of the current page as one line of navtimings.log
+#
+# paintfields: Which paint timings to log at the end of the line, as they differ between browsers
+#              (None logs "NA")
+def logNavigationTimings(evaluate, source, formattedtimestamp, timestamp, logfilename="navtimings.log", scenario="NA", paintfields=[ "timeToNonBlankPaint" ]):
+	try:
+		timings = getNavigationTimings(evaluate)
+	except Exception as err:
+		print("Could not execute script on page, got Error " + str(err))
+		return
+
+	paintvalues = [ (timings[field] if field is not None else "NA") for field in paintfields ]
+
+	print("Navigation timings for page " + source + ":\n\t\tredirectStart:\t\t" + str(timings["redirectStart"]) + " ms\n\t\tredirectEnd:\t\t" + str(timings["redirectEnd"]) + " ms\n" + "".join([ "\t\t" + field + ":\t\t" + str(timings[field]) + " ms\n" for field in NAVTIMING_FIELDS ]) + "\n" + "".join([ "\t\t" + str(field) + ":\t\t" + str(value) + " ms\n" for (field, value) in zip(paintfields, paintvalues) ]))
+
+	try:
+		logfile = open(logfilename, 'a', 1)
+
+		logfile.write(",".join([ str(source), str(scenario), str(formattedtimestamp), str(timestamp), str(round(timings["navigationStart"]/1000, 3)), str(timings["redirectStart"]), str(timings["redirectEnd"]) ] + [ str(timings[field]) for field in NAVTIMING_FIELDS ] + [ str(value) for value in paintvalues ]) + "\n")
+
+		logfile.close()
+		print("Logged Navigation Timings and firstPaint to " + logfilename)
+	except Exception as err:
+		print("Error logging Navigation Timings: " + str(err))
+
+
+# Get all timings of the current page in one call (see DRAIN_SCRIPT)
+# Returns an evaluate function that answers NAVTIMING_SCRIPT, RESTIMING_SCRIPT, and DOCUMENT_SCRIPT from them
+# (to pass to logNavigationTimings, logResourceTimings, and logObjectTimings), and the drained result with the observer's counts
+def drainTimings(evaluate):
+	return parseDrainedTimings(evaluate(DRAIN_SCRIPT))
+
+# Same as drainTimings, given the value of DRAIN_SCRIPT, e.g., from an asynchronous evaluate function
+def parseDrainedTimings(text):
+	result = json.loads(text)
+	values = { NAVTIMING_SCRIPT: result["navtimings"], RESTIMING_SCRIPT: result["restimings"], DOCUMENT_SCRIPT: result["document"] }
+	return (values.get, result)
+
+# Log per page load how many Resource Timing entries the observer collected, how many of them did not fit
+# into the page's buffer (and would have been lost without the observer), and the long tasks, to logfilename:
+# URL, scenario, timestamp, source of the entries (observer or buffer), observed entries, entries in the buffer,
+# entries dropped from the buffer, how often the buffer was full, long tasks and their total duration in ms,
+# protocol and transfer size of the document, and entries the observer missed (taken from the buffer instead)
+def logObserverCounts(logfilename, source, scenario, formattedtimestamp, drained):
+	if drained["observed"] is not None:
+		dropped = max(0, drained["observed"] - drained["buffered"])
+		longtasks = drained["longtasks"] or []
+		fields = [ "observer", drained["observed"], drained["buffered"], dropped, drained["bufferfull"], len(longtasks), round(sum(longtasks), 1) ]
+		if dropped > 0:
+			print(str(dropped) + " Resource Timing entries of " + str(source) + " did not fit into the buffer, got them from the observer")
+		missed = drained.get("missed") or 0
+		if missed > 0:
+			print(str(missed) + " Resource Timing entries of " + str(source) + " did not reach the observer, got them from the buffer")
+	else:
+		fields = [ "buffer", "NA", drained["buffered"], "NA", "NA", "NA", "NA" ]
+		missed = "NA"
+	navigation = drained["navigation"] or [ "NA" ] * len(NAVIGATION_ENTRY_FIELDS)
+	try:
+		logfile = open(logfilename, 'a')
+		logfile.write(",".join([ str(source), str(scenario), str(formattedtimestamp) ] + [ str(field) for field in fields + navigation + [ missed ] ]) + "\n")
+		logfile.close()
+	except Exception as err:
+		print("Error logging observer counts to " + str(logfilename) + ": " + str(err))
+
+# Get all Resource Timing entries of the current page as a list of dicts
+def getResourceTimings(evaluate):
+	return [ dict(zip(RESTIMING_FIELDS, values)) for values in json.loads(evaluate(RESTIMING_SCRIPT)) ]
+
+# One line of a .res.log file, with the fields that computetimings.py expects (restiming_fields)
+def formatResourceTiming(resource, scenario="NA"):
+	if resource['redirectStart'] > 0:
+		redirectStart = resource['redirectStart']
+		redirectEnd = resource['redirectEnd']
+	else:
+		redirectStart = "NA"
+		redirectEnd = "NA"
+	if resource['secureConnectionStart'] > 0:
+		secureConnectionStart = resource['secureConnectionStart']
+	else:
+		secureConnectionStart = "NA"
+
+	return ",".join([ resource['name'].replace(",", ""), str(scenario), str(resource['initiatorType']), str(resource['nextHopProtocol']), str(resource['encodedBodySize']), str(resource['decodedBodySize']), str(resource['startTime']), str(redirectStart), str(redirectEnd), str(resource['fetchStart']), str(resource['domainLookupStart']), str(resource['domainLookupEnd']), str(resource['connectStart']), str(secureConnectionStart), str(resource['connectEnd']), str(resource['requestStart']), str(resource['responseStart']), str(resource['responseEnd']), str(resource['duration']) ]) + "\n"
+
+def printResourceTiming(resource):
+	starttime = resource['startTime']
+	print("Resource timings for " + resource['name'] + ":")
+	print("(initiated by " + str(resource['initiatorType']) + ", fetched via " + str(resource['nextHopProtocol']) + ")")
+	print("\t\tstartTime \t\t" + str(starttime))
+	if resource['redirectStart'] > 0:
+		print("\t\tredirectStart \t\t" + str(resource['redirectStart'] - starttime))
+		print("\t\tredirectEnd \t\t" + str(resource['redirectEnd'] - starttime))
+	for field in [ "fetchStart", "domainLookupStart", "domainLookupEnd", "connectStart", "secureConnectionStart", "connectEnd", "requestStart", "responseStart", "responseEnd" ]:
+		if field != "secureConnectionStart" or resource[field] > 0:
+			print("\t\t" + field + " \t\t" + str(resource[field] - starttime))
+	print("\t\tduration: \t\t" + str(resource['duration']) + "\n")
+	print("\t\tencodedBodySize: \t\t" + str(resource['encodedBodySize']) + "\n")
+	print("\t\tdecodedBodySize: \t\t" + str(resource['decodedBodySize']) + "\n")
+
+# Log all Resource Timings of the current page to a .res.log file, using one script call and one write
+def logResourceTimings(evaluate, resourcelogfilename, printout=False, scenario="NA"):
+	try:
+		resources = getResourceTimings(evaluate)
+	except Exception as err:
+		print("Could not get resource timings, got Error " + str(err))
+		return
+
+	if printout:
+		for resource in resources:
+			printResourceTiming(resource)
+
+	try:
+		resourcelogfile = open(resourcelogfilename, 'a')
+		resourcelogfile.write("".join([ formatResourceTiming(resource, scenario) for resource in resources ]))
+		resourcelogfile.close()
+		print("Logged all " + str(len(resources)) + " resource timings to " + str(resourcelogfilename))
+	except Exception as err:
+		print("Error logging resource timings to " + str(resourcelogfilename) + ": " + str(err))
+
+
+# One line of a .obj.log file: URL, scenario, and OBJTIMING_FIELDS (NA if the browser does not have them)
+def formatObjectTiming(entry, scenario="NA"):
+	return ",".join([ entry['name'].replace(",", ""), str(scenario) ] + [ (str(entry.get(field)) if entry.get(field) is not None else "NA") for field in OBJTIMING_FIELDS ]) + "\n"
+
+# Log every object of the current page to a .obj.log file, instead of a HAR file (see NO_HAR):
+# the document itself (from its navigation entry), then all Resource Timing entries
+def logObjectTimings(evaluate, objlogfilename, scenario="NA"):
+	try:
+		resources = getResourceTimings(evaluate)
+		document = evaluate(DOCUMENT_SCRIPT)
+	except Exception as err:
+		print("Could not get object timings, got Error " + str(err))
+		return
+
+	if document is not None:
+		resources.insert(0, dict(zip(RESTIMING_FIELDS, json.loads(document))))
+	else:
+		print("Browser has no navigation entry, logging objects without the document")
+
+	try:
+		objlogfile = open(objlogfilename, 'a')
+		objlogfile.write("".join([ formatObjectTiming(resource, scenario) for resource in resources ]))
+		objlogfile.close()
+		print("Logged " + str(len(resources)) + " objects to " + str(objlogfilename))
+	except Exception as err:
+		print("Error logging object timings to " + str(objlogfilename) + ": " + str(err))
+
+
+# Exports the HAR in the page (needs the HAR export extension) and lets the browser download it as FILENAME,
+# without response bodies if HAR_STRIP_CONTENT is set. Returns a Promise of the size of the file in bytes
+HAR_DOWNLOAD_SCRIPT = """HAR.triggerExport().then(function(harLog) {
+	if (%s) {
+		harLog.entries.forEach(function(entry) { if (entry.response.content) { delete entry.response.content.text; } });
+	}
+	var blob = new Blob([ JSON.stringify({ "log": harLog }) ], { "type": "application/json" });
+	var link = document.createElement("a");
+	link.href = URL.createObjectURL(blob);
+	link.download = %%s;
+	document.documentElement.appendChild(link);
+	link.click();
+	link.remove();
+	setTimeout(function() { URL.revokeObjectURL(link.href); }, 60000);
+	return blob.size;
+})""" % json.dumps(HAR_STRIP_CONTENT)
+
+# Firefox preferences to save every JSON download to directory without asking, for HAR_DOWNLOAD
+def firefoxDownloadPrefs(directory):
+	return [ ("browser.download.folderList", 2), ("browser.download.dir", os.path.abspath(directory)), ("browser.download.useDownloadDir", True),
+		("browser.download.manager.showWhenStarting", False), ("browser.download.alwaysOpenPanel", False), ("browser.download.always_ask_before_handling_new_types", False),
+		("browser.helperApps.neverAsk.saveToDisk", "application/json") ]
+
+# Let the browser write the HAR of the current page to harpath + ".har" (harpath has to be in the download
+# directory, see firefoxDownloadPrefs), wait until it is complete, then compress it according to HAR_COMPRESSION
+# Returns the name of the file written and its size, raises an exception if the browser did not write it
+def downloadHAR(evaluate, harpath, timer=None, compression=HAR_COMPRESSION):
+	HARfilename = harpath + ".har"
+	size = evaluate(HAR_DOWNLOAD_SCRIPT % json.dumps(os.path.basename(HARfilename)))
+	if timer is not None:
+		timer.mark("har_export")
+	readiness.waitForFile(HARfilename, size)
+
+	if compression == "zstd" and zstandard is None:
+		print("Could not import zstandard, using gzip instead")
+		compression = "gzip"
+	if compression in [ "gzip", "zstd" ]:
+		compressedfilename = harpath + (".har.gz" if compression == "gzip" else ".har.zst")
+		with open(HARfilename, 'rb') as HARfile:
+			if compression == "gzip":
+				compressedfile = gzip.open(compressedfilename, 'wb')
+				shutil.copyfileobj(HARfile, compressedfile)
+			else:
+				compressedfile = open(compressedfilename, 'wb')
+				zstandard.ZstdCompressor().copy_stream(HARfile, compressedfile)
+			compressedfile.close()
+		os.remove(HARfilename)
+		HARfilename = compressedfilename
+		size = os.path.getsize(HARfilename)
+
+	if timer is not None:
+		timer.mark("har_write")
+	print("Browser logged HAR to " + str(HARfilename) + " (" + str(size) + " bytes)")
+	return (HARfilename, size)
+
+
+# Write a HAR log to harpath + ".har", ".har.gz", or ".har.zst", depending on HAR_COMPRESSION
+# Returns the name of the file written, or None on failure
+def writeHAR(harpath, harlog, compression=HAR_COMPRESSION, stripcontent=HAR_STRIP_CONTENT):
+	if stripcontent:
+		for entry in harlog.get("entries", []):
+			entry["response"].get("content", {}).pop("text", None)
+	data = json.dumps({"log": harlog}, separators=(",", ":"), sort_keys=True)
+	if not isinstance(data, bytes):
+		data = data.encode("utf-8")
+
+	if compression == "zstd" and zstandard is None:
+		print("Could not import zstandard, using gzip instead")
+		compression = "gzip"
+
+	try:
+		if compression == "zstd":
+			HARfilename = harpath + ".har.zst"
+			data = zstandard.ZstdCompressor().compress(data)
+			HARfile = open(HARfilename, 'wb')
+		elif compression == "gzip":
+			HARfilename = harpath + ".har.gz"
+			HARfile = gzip.open(HARfilename, 'wb')
+		else:
+			HARfilename = harpath + ".har"
+			HARfile = open(HARfilename, 'wb')
+		HARfile.write(data)
+		HARfile.close()
+	except Exception as err:
+		print("Could not log HAR to " + str(harpath) + ", got Error " + str(err))
+		return None
+
+	print("Logged HAR to " + str(HARfilename))
+	return HARfilename
@@ -7,13 +7,20 @@ TIMES=1 # How many times to fetch each URL
 
 SCENARIO="test" # Use this string to annotate your results, e.g., what was your network config
 
+LOADER="${LOADER:-./load_url_using_marionette.py}" # Which loader to use
+
+WORKER="${WORKER:-0}" # Set to 1 to keep one browser open for all URLs instead of starting a new one per URL
+
+RESTART_AFTER="${RESTART_AFTER:-100}" # In worker mode: Restart the browser after this many page loads
+
 if [ "$1" == '' ];
 then
 	echo "Usage: $0 <URLFILE> [<TIMES>] [<SCENARIO>] [<LOGPREFIX>]"
-	echo "URLFILE: Text file containing one or more URLs, one each line"
+	echo "URLFILE: Text file containing one or more URLs, one each line, or queue:<DBFILE>[:<SCENARIO>] (see jobqueue.py)"
 	echo "TIMES: How often to fetch the URL (default: $TIMES)"
 	echo "SCENARIO: String describing the scenario"
 	echo "LOGPREFIX: Where to store the results (default: $LOGPREFIX)"
+	echo "Set WORKER=1 to load all URLs in one long-lived browser (restarted every \$RESTART_AFTER loads)"
 	exit 1
 else
 	URLFILE="$1"
@@ -41,6 +48,24 @@ fi
 
 mkdir -p "$LOGPREFIX"
 
+if [[ "$URLFILE" == queue:* ]];
+then
+	# Job queue (see jobqueue.py): only the worker mode takes URLs from it
+	WORKER=1
+fi
+
+if [ "$WORKER" == "1" ];
+then
+	# Worker mode: One call to the loader fetches all URLs $TIMES times
+	echo "calling: $LOADER --worker $URLFILE $SCENARIO $TIMES $LOGPREFIX/ $RESTART_AFTER"
+	$LOADER --worker "$URLFILE" "$SCENARIO" "$TIMES" "$LOGPREFIX/" "$RESTART_AFTER"
+	exitstatus=$?
+	killall -q firefox
+
+	echo "Got exit status $exitstatus"
+	return $exitstatus 2>/dev/null || exit $exitstatus
+fi
+
 # Outer loop: Try number 1 .. n
 for (( i=0; i < $TIMES; ++i )); #i in `seq 1 "$TIMES"`;
 do
@@ -53,8 +78,8 @@ do
 
 		echo "Fetching $u"
 	
-		echo "calling: ./load_url_using_marionette.py $u $SCENARIO 1 $LOGPREFIX/"
-		./load_url_using_marionette.py $u "$SCENARIO" 1 "$LOGPREFIX/"
+		echo "calling: $LOADER $u $SCENARIO 1 $LOGPREFIX/"
+		$LOADER $u "$SCENARIO" 1 "$LOGPREFIX/"
 		exitstatus=$?
         killall -q firefox
 
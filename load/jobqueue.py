@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+#
+# Durable work queue for measurement campaigns, kept in an SQLite database
+#
+# The queue has one job per (URL, repetition, scenario). Workers lease a job, load the page, and mark
+# the job done or failed. A lease expires after $JOBQUEUE_LEASE_TIME seconds, so the jobs of a worker
+# that hung or died (or of a machine that rebooted) are picked up again. Failed jobs are retried up to
+# $JOBQUEUE_MAX_ATTEMPTS times. Running the same campaign again resumes where it stopped: jobs that are
+# done are never loaded again, and adding the same URL list again does not add duplicate jobs.
+#
+# The loaders in worker mode (and orchestrate.py) take jobs from a queue instead of a URL file,
+# if given "queue:<DBFILE>" or "queue:<DBFILE>:<SCENARIO>" as URL file. They only take jobs of the scenario
+# they log their page loads under, so "queue:<DBFILE>" means the jobs of the loader's SCENARIO.
+#
+# Usage:
+#           ./jobqueue.py add <DBFILE> <URLFILE> [<TIMES>] [<SCENARIO>]
+#                   Add one job for every URL in URLFILE and every repetition 1..TIMES (default: 1, "test")
+#           ./jobqueue.py status <DBFILE>
+#                   Show progress per scenario, workers, and throughput
+#           ./jobqueue.py urls <DBFILE> [<SCENARIO>]
+#                   Print all URLs of the queue, once each (like a URL file)
+#           ./jobqueue.py requeue <DBFILE> [failed|leased]
+#                   Retry failed jobs from scratch (default), or take back leased jobs now
+#                   instead of waiting for their leases to expire, e.g., after a reboot
+#
+# Environment:
+#                   JOBQUEUE_LEASE_TIME:    Seconds until a leased job is given to another worker (default: 600)
+#                   JOBQUEUE_MAX_ATTEMPTS:  How often to try a job before marking it failed (default: 3)
+
+import os
+import sys
+import time
+import socket
+import sqlite3
+import threading
+
+LEASE_TIME = float(os.environ.get("JOBQUEUE_LEASE_TIME", 600))
+
+MAX_ATTEMPTS = int(os.environ.get("JOBQUEUE_MAX_ATTEMPTS", 3))
+
+# "URL files" starting with this are job queues
+PREFIX = "queue:"
+
+# Report throughput over this many recent seconds
+RECENT_INTERVAL = 600
+
+STATUSES = [ "pending", "leased", "done", "failed" ]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+	id INTEGER PRIMARY KEY,
+	url TEXT NOT NULL,
+	repetition INTEGER NOT NULL,
+	scenario TEXT NOT NULL,
+	status TEXT NOT NULL DEFAULT 'pending',
+	attempts INTEGER NOT NULL DEFAULT 0,
+	worker TEXT,
+	lease_expires REAL,
+	added REAL,
+	started REAL,
+	finished REAL,
+	UNIQUE (url, repetition, scenario)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, scenario);
+"""
+
+
+def openQueue(dbfile):
+	# Transactions are handled explicitly (see leaseJob), workers in several processes share the file
+	db = sqlite3.connect(dbfile, timeout=60, isolation_level=None, check_same_thread=False)
+	db.execute("PRAGMA journal_mode=WAL")
+	db.executescript(SCHEMA)
+	return db
+
+# Split "queue:<DBFILE>[:<SCENARIO>]" into database file and scenario (None for any scenario)
+def parseSpec(spec):
+	parts = spec[len(PREFIX):].split(":", 1)
+	return (parts[0], parts[1] if len(parts) > 1 and parts[1] else None)
+
+# Add a job for every URL and repetition 1..times, skip jobs that are already in the queue
+# Returns the number of jobs added
+def addJobs(db, urls, times=1, scenario="test"):
+	now = time.time()
+	before = db.total_changes
+	db.execute("BEGIN IMMEDIATE")
+	try:
+		for repetition in range(1, times+1):
+			for url in urls:
+				db.execute("INSERT OR IGNORE INTO jobs (url, repetition, scenario, added) VALUES (?, ?, ?, ?)", (url, repetition, scenario, now))
+		db.execute("COMMIT")
+	except Exception:
+		db.execute("ROLLBACK")
+		raise
+	return db.total_changes - before
+
+# Lease the next job: a pending one, or one whose lease expired, first repetition first
+# Returns a dict with id, url, repetition, scenario, and attempts, or None if there is no job left
+def leaseJob(db, worker, scenario=None, leasetime=LEASE_TIME):
+	now = time.time()
+	scenariofilter = " AND scenario = ?" if scenario is not None else ""
+	scenarioargs = (scenario,) if scenario is not None else ()
+
+	db.execute("BEGIN IMMEDIATE")
+	try:
+		# Expired leases of jobs that were tried often enough are not retried again
+		db.execute("UPDATE jobs SET status = 'failed', finished = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?" + scenariofilter, (now, now, MAX_ATTEMPTS) + scenarioargs)
+		row = db.execute("SELECT id, url, repetition, scenario, attempts FROM jobs WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ?" + scenariofilter + " ORDER BY repetition, id LIMIT 1", (now, MAX_ATTEMPTS) + scenarioargs).fetchone()
+		if row is not None:
+			db.execute("UPDATE jobs SET status = 'leased', attempts = attempts + 1, worker = ?, lease_expires = ?, started = ? WHERE id = ?", (worker, now + leasetime, now, row[0]))
+		db.execute("COMMIT")
+	except Exception:
+		db.execute("ROLLBACK")
+		raise
+
+	if row is None:
+		return None
+	return { "id": row[0], "url": row[1], "repetition": row[2], "scenario": row[3], "attempts": row[4] + 1 }
+
+# Mark a job done, or give it back to the queue (or mark it failed after MAX_ATTEMPTS)
+# Only if this worker still holds the job, i.e., it was not leased to another worker after our lease expired
+# (or taken back by requeue). Returns False if it does not
+def completeJob(db, jobid, success, worker):
+	cursor = db.execute("UPDATE jobs SET status = CASE WHEN ? THEN 'done' WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, lease_expires = NULL, finished = ? WHERE id = ? AND worker = ? AND status != 'done'", (1 if success else 0, MAX_ATTEMPTS, time.time(), jobid, worker))
+	return cursor.rowcount > 0
+
+# Failed jobs (or leased ones) back to pending, returns how many
+def requeueJobs(db, status="failed"):
+	if status == "failed":
+		cursor = db.execute("UPDATE jobs SET status = 'pending', attempts = 0, worker = NULL WHERE status = 'failed'")
+	else:
+		cursor = db.execute("UPDATE jobs SET status = 'pending', lease_expires = NULL, worker = NULL WHERE status = 'leased'")
+	return cursor.rowcount
+
+def getUrls(db, scenario=None):
+	if scenario is not None:
+		rows = db.execute("SELECT url FROM jobs WHERE scenario = ? GROUP BY url ORDER BY MIN(id)", (scenario,))
+	else:
+		rows = db.execute("SELECT url FROM jobs GROUP BY url ORDER BY MIN(id)")
+	return [ row[0] for row in rows ]
+
+def countJobs(db, status, scenario=None):
+	if scenario is not None:
+		return db.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND scenario = ?", (status, scenario)).fetchone()[0]
+	return db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+
+# Jobs of one worker as an iterable of URLs, as used by worker.py
+# Call done(url, success) after loading each URL
+class JobSource:
+	def __init__(self, dbfile, scenario=None, worker=None):
+		self.db = openQueue(dbfile)
+		self.scenario = scenario
+		self.worker = worker or socket.gethostname() + ":" + str(os.getpid())
+		# Leased job IDs by URL -- the same URL can be leased several times (different repetitions)
+		self.leased = {}
+		# Some loaders lease and complete jobs from different threads
+		self.lock = threading.Lock()
+
+	# Jobs of "queue:<DBFILE>[:<SCENARIO>]" for a loader that logs its page loads under this scenario:
+	# the queue's scenario defaults to it, a different one raises a ValueError
+	# (the page loads would be logged under the wrong scenario)
+	@classmethod
+	def fromSpec(cls, spec, worker=None, scenario=None):
+		(dbfile, specscenario) = parseSpec(spec)
+		if scenario is not None and specscenario is not None and specscenario != scenario:
+			raise ValueError("Jobs of scenario " + specscenario + " would be logged under scenario " + scenario)
+		return cls(dbfile, specscenario or scenario, worker)
+
+	def next(self):
+		with self.lock:
+			job = leaseJob(self.db, self.worker, self.scenario)
+			if job is None:
+				return None
+			self.leased.setdefault(job["url"], []).append(job["id"])
+		print("Leased job " + str(job["id"]) + ": " + job["url"] + " (repetition " + str(job["repetition"]) + ", scenario " + job["scenario"] + ", attempt " + str(job["attempts"]) + ")")
+		return job["url"]
+
+	def __iter__(self):
+		while True:
+			url = self.next()
+			if url is None:
+				return
+			yield url
+
+	def done(self, url, success):
+		with self.lock:
+			jobids = self.leased.get(url)
+			if not jobids:
+				return
+			jobid = jobids.pop(0)
+			if not completeJob(self.db, jobid, success, self.worker):
+				print("Job " + str(jobid) + " (" + url + ") is not ours anymore, leaving it as it is")
+
+
+def printStatus(db):
+	now = time.time()
+	scenarios = [ row[0] for row in db.execute("SELECT DISTINCT scenario FROM jobs ORDER BY scenario") ]
+	for scenario in scenarios:
+		counts = dict([ (status, countJobs(db, status, scenario)) for status in STATUSES ])
+		total = sum(counts.values())
+		print(scenario + ": " + ", ".join([ str(counts[status]) + " " + status for status in STATUSES ]) + " of " + str(total) + " jobs (" + str(round(100.0 * counts["done"] / total, 1) if total else 0) + "% done)")
+
+	workers = db.execute("SELECT worker, COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires >= ? GROUP BY worker", (now,)).fetchall()
+	print(str(len(workers)) + " active workers" + (": " + ", ".join([ w + " (" + str(n) + ")" for (w, n) in workers ]) if workers else ""))
+	expired = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires < ?", (now,)).fetchone()[0]
+	if expired:
+		print(str(expired) + " leases expired, will be retried")
+	retried = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'done' AND attempts > 1").fetchone()[0]
+	print(str(retried) + " jobs needed more than one attempt")
+
+	(done, first, last) = db.execute("SELECT COUNT(*), MIN(started), MAX(finished) FROM jobs WHERE status = 'done'").fetchone()
+	if done and last > first:
+		print("Overall: " + str(done) + " jobs done in " + str(round((last - first) / 60.0, 1)) + " minutes, " + str(round(done / ((last - first) / 60.0), 2)) + " jobs per minute")
+	recent = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'done' AND finished >= ?", (now - RECENT_INTERVAL,)).fetchone()[0]
+	rate = recent / (RECENT_INTERVAL / 60.0)
+	remaining = countJobs(db, "pending") + countJobs(db, "leased")
+	print("Last " + str(int(RECENT_INTERVAL / 60)) + " minutes: " + str(recent) + " jobs done, " + str(round(rate, 2)) + " jobs per minute" + (", " + str(remaining) + " jobs left, about " + str(round(remaining / rate, 1)) + " minutes to go" if rate > 0 and remaining else ""))
+
+
+def main(argv=[]):
+	if len(argv) < 3 or argv[1] not in [ "add", "status", "urls", "requeue" ]:
+		print("Usage:\n\t" + argv[0] + " add <DBFILE> <URLFILE> [<TIMES>] [<SCENARIO>]\n\t" + argv[0] + " status <DBFILE>\n\t" + argv[0] + " urls <DBFILE> [<SCENARIO>]\n\t" + argv[0] + " requeue <DBFILE> [failed|leased]")
+		return 1
+	command = argv[1]
+	db = openQueue(argv[2])
+
+	if command == "add":
+		try:
+			with open(argv[3], 'r') as f:
+				urls = [ line.strip() for line in f if line.strip() ]
+		except (IndexError, IOError) as e:
+			print("Could not read URL file: " + str(e))
+			return 1
+		try:
+			times = int(argv[4])
+		except:
+			times = 1
+		try:
+			scenario = str(argv[5])
+		except:
+			scenario = "test"
+		added = addJobs(db, urls, times, scenario)
+		print("Added " + str(added) + " jobs (" + str(len(urls) * times - added) + " were already in the queue)")
+
+	elif command == "status":
+		printStatus(db)
+
+	elif command == "urls":
+		for url in getUrls(db, argv[3] if len(argv) > 3 else None):
+			print(url)
+
+	elif command == "requeue":
+		status = argv[3] if len(argv) > 3 else "failed"
+		if status not in [ "failed", "leased" ]:
+			print("Can only requeue failed or leased jobs")
+			return 1
+		print("Requeued " + str(requeueJobs(db, status)) + " " + status + " jobs")
+
+	db.close()
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
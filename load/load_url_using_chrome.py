@@ -3,7 +3,27 @@
 """
 Use Chrome to load a URL and measure timings
 
-Exports Navigation Timings and Resource Timings
+Exports Navigation Timings and Resource Timings,
+and a HAR file built from the DevTools Network events (see cdphar.py)
+
+Arguments:
+[1] URL to fetch
+[2] Scenario (for logging)
+[3] How many times to fetch the URL
+[4] Log directory for Navigation Timings, Resource Timings, and HAR files
+
+Worker mode (keep one browser open and load a whole list of URLs):
+[1] --worker
+[2] File with URLs to fetch, one per line, "-" to read them from stdin,
+    or "queue:<DBFILE>[:<SCENARIO>]" to take them from a job queue (see jobqueue.py)
+[3] Scenario (for logging)
+[4] How many times to fetch the list of URLs
+[5] Log directory for Navigation Timings, Resource Timings, and HAR files
+[6] Restart the browser after this many page loads (default: 100)
+
+Environment:
+    HEADLESS  Set to 1 to run Chrome without a display (default: 0)
+    NO_HAR    Set to 1 to log a .obj.log file instead of building a HAR file (default: 0)
 
 """
 
@@ -17,151 +37,79 @@ import errno
 import subprocess
 import shutil
 import signal
-import pyautogui
+import worker
+import collect_timings
+import readiness
+import cdphar
+import profiles
+import phases
+import segment_capture
 
 
 TIMEOUT = 60
 
-def createDirectory(path):
-	try:
-		os.makedirs(path)
-	except OSError as exception:
-		if exception.errno != errno.EEXIST:
-			raise
+# Set this to run several instances of this script at the same time, see orchestrate.py
+# (and PROFILE_DIR, see profiles.py)
+DEVTOOLS_PORT = int(os.environ.get("DEVTOOLS_PORT", 9222))
 
+# Run Chrome without a display -- the HAR file is built from DevTools events anyway
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
 
-def getRelative(value, ref):
-	try:
-		result = value - ref
-	except:
-		result = value
-	return result
+class RecordingChromeInterface(PyChromeDevTools.ChromeInterface):
+	"""Keeps all events in self.recorded -- ChromeInterface drops them whenever it sends a command"""
 
+	def __init__(self, *args, **kwargs):
+		self.recorded = []
+		PyChromeDevTools.ChromeInterface.__init__(self, *args, **kwargs)
 
-def logNavigationTimings(chrome, source, formattedtimestamp, timestamp, logfilename="navtimings.log", scenario="NA"):
-	try:
-		navigationStart = chrome.Runtime.evaluate(expression="window.performance.timing.navigationStart")["result"]["result"]["value"]
-		redirectStart = getRelative(chrome.Runtime.evaluate(expression=" window.performance.timing.redirectStart")["result"]["result"]["value"], 0)
-		redirectEnd = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.redirectEnd")["result"]["result"]["value"] , 0)
-		fetchStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.fetchStart")["result"]["result"]["value"] , navigationStart)
-		domainLookupStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.domainLookupStart")["result"]["result"]["value"] , navigationStart)
-		domainLookupEnd = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.domainLookupEnd")["result"]["result"]["value"] , navigationStart)
-		connectStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.connectStart")["result"]["result"]["value"] , navigationStart)
-		secureConnectionStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.secureConnectionStart")["result"]["result"]["value"] , navigationStart)
-		connectEnd = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.connectEnd")["result"]["result"]["value"] , navigationStart)
-		requestStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.requestStart")["result"]["result"]["value"] , navigationStart)
-		responseStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.responseStart")["result"]["result"]["value"] , navigationStart)
-		responseEnd = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.responseEnd")["result"]["result"]["value"] , navigationStart)
-		domLoading = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.domLoading")["result"]["result"]["value"] , navigationStart)
-		domInteractive = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.domInteractive")["result"]["result"]["value"] , navigationStart)
-		domContentLoadedEventStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.domContentLoadedEventStart")["result"]["result"]["value"] , navigationStart)
-		domContentLoadedEventEnd = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.domContentLoadedEventEnd")["result"]["result"]["value"] , navigationStart)
-		domComplete = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.domComplete")["result"]["result"]["value"] , navigationStart)
-		loadEventStart = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.loadEventStart")["result"]["result"]["value"] , navigationStart)
-		loadEventEnd  = getRelative(chrome.Runtime.evaluate(expression="window.performance.timing.loadEventEnd")["result"]["result"]["value"] , navigationStart)
-
-		firstPaint  = chrome.Runtime.evaluate(expression="performance.getEntriesByName('first-paint')[0]['startTime']")["result"]["result"]["value"]
-		firstContentfulPaint  = chrome.Runtime.evaluate(expression="performance.getEntriesByName('first-contentful-paint')[0]['startTime']")["result"]["result"]["value"]
-	except Exception as err:
-		print("Could not execute script on page, got Error " + str(err))
-		return
-
-	print("Navigation timings for page " + source + ":\n\t\tredirectStart:\t\t" + str(redirectStart) + " ms\n\t\tredirectEnd:\t\t" + str(redirectEnd) + " ms\n\t\tfetchStart:\t\t" + str(fetchStart) + " ms\n\t\tdomainLookupStart:\t" + str(domainLookupStart) + " ms\n\t\tdomainLookupEnd:\t" + str(domainLookupEnd) + " ms\n\t\tconnectStart:\t\t" + str(connectStart) + " ms\n\t\tsecureConnectionStart:\t" + str(secureConnectionStart) + " ms\n\t\tconnectEnd:\t\t" + str(connectEnd) + " ms\n\t\trequestStart:\t\t" + str(requestStart) + " ms\n\t\tresponseStart:\t\t" + str(responseStart) + " ms\n\t\tresponseEnd:\t\t" + str(responseEnd) + " ms\n\t\tdomLoading:\t\t" + str(domLoading) + " ms\n\t\tdomInteractive:\t\t" + str(domInteractive) + " ms\n\t\tdomContentLoadedEventStart:\t" + str(domContentLoadedEventStart) + " ms\n\t\tdomContentLoadedEventEnd:\t" + str(domContentLoadedEventEnd) + " ms\n\t\tdomComplete:\t\t" + str(domComplete) + " ms\n\t\tloadEventStart:\t\t" + str(loadEventStart) + " ms\n\t\tloadEventEnd:\t\t" + str(loadEventEnd) + " ms\n\n\t\tfirstPaint:\t\t" + str(round(firstPaint, 3)) + " ms\n\t\tfirstContentfulPaint:\t" + str(round(firstContentfulPaint, 3)) + "\n")
+	def record(self, messages):
+		self.recorded.extend([ m for m in messages if "method" in m ])
 
-	try:
-		logfile = open(logfilename, 'a', 1)
+	def pop_messages(self):
+		messages = PyChromeDevTools.ChromeInterface.pop_messages(self)
+		self.record(messages)
+		return messages
 
-		logfile.write (str(source) + "," + str(scenario) + "," + str(formattedtimestamp) + "," + str(timestamp) + "," + str(navigationStart/1000) + "," + str(redirectStart) + "," + str(redirectEnd) + "," + str(fetchStart) + "," + str(domainLookupStart) + "," + str(domainLookupEnd) + "," + str(connectStart) + "," + str(secureConnectionStart) + "," + str(connectEnd) + "," + str(requestStart) + "," + str(responseStart) + "," + str(responseEnd) + "," + str(domLoading) + "," + str(domInteractive) + "," + str(domContentLoadedEventStart) + "," + str(domContentLoadedEventEnd) + "," + str(domComplete) + "," + str(loadEventStart) + "," + str(loadEventEnd) + "," + str(firstPaint) + ",NA," + str(firstContentfulPaint) + "\n")
+	def wait_message(self, timeout=None):
+		message = PyChromeDevTools.ChromeInterface.wait_message(self, timeout)
+		if message:
+			self.record([ message ])
+		return message
 
-		logfile.close()
-		print("Logged Navigation Timings and firstPaint to " + logfilename)
-	except Exception as err:
-		print("Error logging Navigation Timings: " + str(err))
+	def wait_event(self, event, timeout=None):
+		matching_message, messages = PyChromeDevTools.ChromeInterface.wait_event(self, event, timeout)
+		self.record(messages)
+		return matching_message, messages
 
-def logResourceTimings(chrome, source, timestamp, printout=False, scenario = "NA"):
+	def wait_result(self, result_id, timeout=None):
+		matching_result, messages = PyChromeDevTools.ChromeInterface.wait_result(self, result_id, timeout)
+		self.record(messages)
+		return matching_result, messages
 
-	resourcelogfile = None
-	resourcelogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".res.log"
-	try:
-		resourcelogfile = open(resourcelogfilename, 'a+')
-	except IOError as e:
-		print("Error opening logfile " + str(resourcelogfilename) + ": " + str(e))
-		return
-	except:
-		resourcelogfile.close()
-		print("Another error occured with " + str(resourcelogfilename))
-		return
 
+def createDirectory(path):
 	try:
-		numberofresources = chrome.Runtime.evaluate(expression="window.performance.getEntriesByType(\"resource\").length")["result"]["result"]["value"]
-	except Exception as err:
-		print("Could not get number of resources, got Error " + str(err))
-		return
+		os.makedirs(path)
+	except OSError as exception:
+		if exception.errno != errno.EEXIST:
+			raise
 
-	for r in range(0, numberofresources):
-		try:
-			resource = json.loads(chrome.Runtime.evaluate(expression="JSON.stringify(window.performance.getEntriesByType(\"resource\")[" + str(r) + "].toJSON())")["result"]["result"]["value"])
-		except Exception as err:
-			print("Could not get resource timings for resource " + str(r) + "/" + str(numberofresources) + ", got Error " + str(err))
-			resourcelogfile.close()
-			os.remove(resourcelogfilename)
-			return
-		starttime = resource['startTime']
-		if resource['redirectStart'] > 0:
-			redirectStart = resource['redirectStart']
-			redirectStart = resource['redirectEnd']
-		else:
-			redirectStart = "NA"
-			redirectEnd = "NA"
-		fetchStart = resource['fetchStart']
-		domainLookupStart = resource['domainLookupStart']
-		domainLookupEnd = resource['domainLookupEnd']
-		connectStart = resource['connectStart']
-		if resource['secureConnectionStart'] > 0:
-			secureConnectionStart = resource['secureConnectionStart']
-		else:
-			secureConnectionStart = "NA"
-		connectEnd = resource['connectEnd']
-		requestStart = resource['requestStart']
-		responseStart = resource['responseStart']
-		responseEnd = resource['responseEnd']
-		duration = resource['duration']
-		initiatorType = resource['initiatorType']
-		nextHopProtocol = resource['nextHopProtocol']
-		encodedBodySize = resource['encodedBodySize']
-		decodedBodySize = resource['decodedBodySize']
-
-		if printout:
-			print("Resource timings for " + resource['name'] + ":")
-			print("(initiated by " + str(initiatorType) + ", fetched via " + str(nextHopProtocol) + ")")
-			print("\t\tstartTime \t\t" + str(starttime))
-			if redirectStart != "NA":
-				print("\t\tredirectStart \t\t" + str(redirectStart - starttime))
-				print("\t\tredirectEnd \t\t" + str(redirectEnd - starttime))
-			print("\t\tfetchStart \t\t" + str(fetchStart - starttime))
-			print("\t\tdomainLookupStart \t" + str(domainLookupStart - starttime))
-			print("\t\tdomainLookupEnd \t" + str(domainLookupEnd - starttime))
-			print("\t\tconnectStart \t\t" + str(connectStart - starttime))
-			if secureConnectionStart != "NA":
-				print("\t\tsecureConnectionStart \t" + str(secureConnectionStart - starttime))
-			print("\t\tconnectEnd \t\t" + str(connectEnd - starttime))
-			print("\t\trequestStart: \t\t" + str(requestStart - starttime))
-			print("\t\tresponseStart: \t\t" + str(responseStart - starttime))
-			print("\t\tresponseEnd: \t\t" + str(responseEnd - starttime))
-			print("\t\tduration: \t\t" + str(duration) + "\n")
-			print("\t\tencodedBodySize: \t\t" + str(encodedBodySize) + "\n")
-			print("\t\tdecodedBodySize: \t\t" + str(decodedBodySize) + "\n")
-
-		if resourcelogfile is not None:
-			try:
-				resourcelogfile.write(resource['name'].replace(",", "") + "," + str(scenario) + "," + str(initiatorType) + "," + str(nextHopProtocol) + "," + str(encodedBodySize) + "," + str(decodedBodySize) + "," + str(starttime) + "," + str(redirectStart) + "," + str(redirectEnd) + "," + str(fetchStart) + "," + str(domainLookupStart) + "," + str(domainLookupEnd) + "," + str(connectStart) + "," + str(secureConnectionStart) + "," + str(connectEnd) + "," + str(requestStart) + "," + str(responseStart) + "," + str(responseEnd) + "," + str(duration) + "\n")
-			except Exception as err:
-				print("Error: " + str(err))
-	try:
-		print("Logged all " + str(numberofresources) + " resource timings to " + str(resourcelogfilename))
-		resourcelogfile.close()
-	except Exception as err:
-		print("Error: " + str(err))
+
+# Run a script in the current page, return its value
+def evaluateFunction(chrome):
+	return lambda script: chrome.Runtime.evaluate(expression=script)["result"]["result"]["value"]
+
+def logNavigationTimings(evaluate, source, formattedtimestamp, timestamp, logfilename="navtimings.log", scenario="NA"):
+	# Chrome has no timeToDOMContentFlushed, but logs first-contentful-paint after it
+	collect_timings.logNavigationTimings(evaluate, source, formattedtimestamp, timestamp, logfilename, scenario, paintfields=[ "first-paint", None, "first-contentful-paint" ])
+
+def logResourceTimings(evaluate, source, timestamp, printout=False, scenario = "NA"):
+	resourcelogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".res.log"
+	collect_timings.logResourceTimings(evaluate, resourcelogfilename, printout=printout, scenario=scenario)
+
+def logObjectTimings(evaluate, source, timestamp, scenario = "NA"):
+	objlogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".obj.log"
+	collect_timings.logObjectTimings(evaluate, objlogfilename, scenario=scenario)
 
 def showMessages(messages):
 	for m in messages:
@@ -172,143 +120,268 @@ def showMessages(messages):
 			except:
 				pass
 
-def logHAR(driver, source, timestamp):
-	HARfile = None
+# Build a HAR file from all DevTools messages of this page load and log it
+def logHAR(messages, source, timestamp, timer=None):
 	createDirectory(LOGDIR + "har/")
-	HARfilename = LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp + ".har"
+
+	harbuilder = cdphar.HARBuilder()
+	harbuilder.addMessages(messages)
+	HARtext = harbuilder.getHAR()
+	if timer is not None:
+		timer.mark("har_export")
+
+	HARfilename = collect_timings.writeHAR(LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp, HARtext)
+	if timer is not None:
+		timer.mark("har_write")
+	return HARfilename
+
+
+# Chrome profile with our preferences, try to suppress "Welcome" messages and other nonsense
+def buildProfile(profiledir):
+	createDirectory(profiledir + "/Default")
+	open(profiledir + "/First Run", 'a').close()
+	shutil.copy("chrome_prefs.json", profiledir + "/Default/Preferences")
+
+# Open Chrome, try to be as quiet as possible
+# see also https://stackoverflow.com/questions/5814334/how-to-disable-google-chromes-unrequested-connections
+def launchChrome(profiledir):
+	return subprocess.Popen(["google-chrome --user-data-dir=" + profiledir + " --remote-debugging-port=" + str(DEVTOOLS_PORT) + " --disable-background-networking --disable-component-extensions-with-background-pages --dns-prefetch-disable" + (" --headless" if HEADLESS else "")], shell=True, preexec_fn=os.setsid)
+
+def startBrowser():
+	timer = phases.PhaseTimer()
+	# Get a new profile directory, cloned from a template (see profiles.py)
+	(profiledir, profilesetup) = profiles.newProfile("chrome", [ "chrome_prefs.json" ], buildProfile)
+	timer.mark("profile")
+
+	startupwait = 0
+	# Headless, nothing is displayed anyway, so one launch is enough
+	if not HEADLESS:
+		p = launchChrome(profiledir)
+
+		# We have to kill the new Chrome once and open it again
+		# otherwise it does not display the page load on screen (???)
+		print("Opened chrome! " + str(p.pid))
+		startupwait = readiness.waitForDevTools(DEVTOOLS_PORT)
+		os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+		p.wait()
+		# Make sure it is gone before opening it again on the same port and profile
+		startupwait += readiness.waitFor(lambda: not readiness.portOpen(DEVTOOLS_PORT), readiness.STARTUP_TIMEOUT, what="old Chrome to exit")
+		print("Killed chrome! " + str(p.pid))
+		timer.mark("launch")
+
+	p = launchChrome(profiledir)
+	print("Opened new chrome! " + str(p.pid))
+
+	startupwait += readiness.waitForDevTools(DEVTOOLS_PORT)
+
+	chrome = RecordingChromeInterface(port=DEVTOOLS_PORT)
+
+	chrome.Network.enable()
+	chrome.Page.enable()
+	# Collect timings with an observer in every page (see collect_timings.py)
+	chrome.Page.addScriptToEvaluateOnNewDocument(source=collect_timings.OBSERVER_SCRIPT)
+	timer.mark("launch" if HEADLESS else "relaunch")
+
+	# Origins seen during the last page load, to clear their storage afterwards
+	return { "process": p, "chrome": chrome, "origins": set(), "profiledir": profiledir, "startup_wait": startupwait, "profile_setup": profilesetup, "phases": timer }
+
+def stopBrowser(browser):
+	os.killpg(os.getpgid(browser["process"].pid), signal.SIGTERM)
+	browser["process"].wait()
+	profiles.removeProfile(browser["profiledir"])
+
+# Clear cache, cookies and storage
+# DevTools cannot clear the DNS cache, open connections, TLS sessions, or HSTS, so these stay warm between page loads,
+# unlike with a fresh profile
+def resetBrowser(browser):
+	timer = phases.PhaseTimer()
+	chrome = browser["chrome"]
+	chrome.Network.clearBrowserCache()
+	chrome.Network.clearBrowserCookies()
+	for origin in browser["origins"]:
+		chrome.Storage.clearDataForOrigin(origin=origin, storageTypes="all")
+	browser["origins"] = set()
+	chrome.Page.navigate(url="about:blank")
+	timer.mark("reset")
+	browser["phases"] = timer
+
+# Wait until no request has been in flight for quietperiod seconds
+# Starts from the Network events recorded so far, further messages get recorded by wait_message
+def networkIdleFunction(chrome):
+	def waitNetworkIdle(quietperiod, timeout):
+		inflight = set()
+		def update(m):
+			method = m.get("method")
+			if method == "Network.requestWillBeSent":
+				inflight.add(m["params"]["requestId"])
+			elif method in [ "Network.loadingFinished", "Network.loadingFailed" ]:
+				inflight.discard(m["params"]["requestId"])
+
+		for m in chrome.recorded:
+			update(m)
+		start = time.time()
+		lastbusy = start
+		while inflight or time.time() - lastbusy < quietperiod:
+			if time.time() - start > timeout:
+				return False
+			m = chrome.wait_message(timeout=readiness.POLL_INTERVAL)
+			if m:
+				update(m)
+			if inflight:
+				lastbusy = time.time()
+		return True
+	return waitNetworkIdle
+
+def getOrigins(messages):
+	origins = set()
+	for m in messages:
+		if "method" in m and m["method"] == "Network.requestWillBeSent":
+			try:
+				url = m["params"]["request"]["url"]
+				origins.add(url.split('/')[0] + "//" + url.split('/')[2])
+			except (KeyError, IndexError):
+				pass
+	return origins
+
+# Load one page and log its Navigation Timings, Resource Timings, and HAR file
+# Returns False if the page load failed
+def loadPage(browser, url, run=1, times=1):
+	chrome = browser["chrome"]
+	timer = phases.PhaseTimer()
+	# Starting or resetting the browser counts towards this page load
+	timer.prepend(browser.pop("phases", None))
+
+	timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
+	unixtimestamp = int(time.time())
 	try:
-		HARfile = open(HARfilename, 'w')
-	except IOError as e:
-		print("Error opening logfile " + str(HARfile) + ": " + str(e))
-		return None
-	except:
-		HARfile.close()
-		print("Another error occured with " + str(HARfilename))
-		return None
+		hostname = url.split('/')[2]
+	except IndexError:
+		hostname = url
+		url = "http://" + hostname
+
+	print("Run " +  str(run) + "/" + str(times) + " - Fetching " + url + " at " + timestamp)
+	segment_capture.announce("start", hostname + "+" + timestamp)
+	event = None
+	messages = None
+	# Only the first page load of a browser waited for it to start
+	waits = { "startup": browser.pop("startup_wait", None), "profile": browser.pop("profile_setup", None) }
 
 	try:
-		driver.Runtime.evaluate(expression = "HAR.triggerExport().then(harLog => { foo = harLog; }); ", contextId=1)
-		print("executed1")
-		time.sleep(1)
-		HARtext = json.loads(driver.Runtime.evaluate(expression = "JSON.stringify(foo); ;", contextId=1)["result"]["result"]["value"])
-	except Exception as err:
-		print("Could not get HAR, got Error " + str(err))
-		return None
+		# Record all events of this page load to build the HAR file from
+		chrome.recorded = []
+		chrome.Page.navigate(url=url)
+		event,messages=chrome.wait_event("Page.loadEventFired", timeout=TIMEOUT)
+		timer.mark("navigate")
+		waits["settle"] = readiness.settle(evaluateFunction(chrome), waitNetworkIdle=networkIdleFunction(chrome))
+		timer.mark("settle")
+
+	except Exception as e:
+		print("Error fetching page " + url + ": " + str(e) + "\n")
+		timer.mark("failed")
+		try:
+			logNavigationTimings(evaluateFunction(chrome), url, timestamp, unixtimestamp, LOGDIR + "failed_navtimings.log", scenario = SCENARIO)
+		except Exception as e:
+			print("Could not even log Nav timings for failed page " + str(url) + ": " + str(e))
+		segment_capture.announce("end", hostname + "+" + timestamp)
+		timer.log(LOGDIR, url, SCENARIO, timestamp)
+		return False
+	createDirectory(LOGDIR + "res")
 
+	# Get all timings at once, including what the observer collected (see collect_timings.py)
 	try:
-		HARfile.write(json.dumps({"log": HARtext}, indent=4, sort_keys=True))
-		print("Logged HAR to " + str(HARfilename))
-		HARfile.close()
-		return HARfilename
+		(timings, drained) = collect_timings.drainTimings(evaluateFunction(chrome))
+		collect_timings.logObserverCounts(LOGDIR + "observer.log", url, SCENARIO, timestamp, drained)
+	except Exception as e:
+		print("Could not drain timings, reading them one by one: " + str(e))
+		timings = evaluateFunction(chrome)
+	timer.mark("drain")
 
-	except Exception as err:
-		print("Could not log HAR to " + str(HARfilename) + ", got Error " + str(err))
-		return None
+	try:
+		logNavigationTimings(timings, url, timestamp, unixtimestamp, LOGDIR + "navtimings.log", scenario = SCENARIO)
+
+	except Exception as e:
+		print("Error logging Navigation timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+	timer.mark("navtimings")
+	try:
+		logResourceTimings(timings, url, timestamp, printout=False, scenario = SCENARIO)
+	except Exception as e:
+		print("Error logging Resource timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+	timer.mark("restimings")
+	readiness.logWaitTimes(LOGDIR + "waittimes.log", url, SCENARIO, timestamp, waits)
+
+	# Also get whatever arrived while we collected the timings
+	chrome.pop_messages()
+	browser["origins"].update(getOrigins(chrome.recorded))
+	if collect_timings.NO_HAR:
+		try:
+			logObjectTimings(timings, url, timestamp, scenario = SCENARIO)
+		except Exception as e:
+			print("Error logging object timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+		timer.mark("objtimings")
+	else:
+		timer.mark("har_wait")
+		try:
+			logHAR(chrome.recorded, url, timestamp, timer)
+		except Exception as e:
+			print("Error logging HAR: " + str(sys.exc_info()[0]) + ", " + str(e))
+	segment_capture.announce("end", hostname + "+" + timestamp)
+	timer.log(LOGDIR, url, SCENARIO, timestamp)
+	return True
 
 
+ARGV = sys.argv
+WORKER_MODE = False
+if len(ARGV) > 1 and ARGV[1] == "--worker":
+	WORKER_MODE = True
+	ARGV = ARGV[1:]
+
 try:
-	if (sys.argv[1] == "--help"):
-		print("Usage:\n\t\twebtimings.py <URL_TO_FETCH> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY>")
+	if (ARGV[1] == "--help"):
+		print("Usage:\n\t\twebtimings.py <URL_TO_FETCH> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY>\n\t\twebtimings.py --worker <URLFILE|-> <SCENARIO> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY> [<RESTART_AFTER>]")
 		sys.exit(0)
 	else:
-		URL_TO_FETCH = str(sys.argv[1])
+		URL_TO_FETCH = str(ARGV[1])
 except Exception as e:
 	URL_TO_FETCH = "http://www.debian.org"
 
 try:
-	SCENARIO = str(sys.argv[2])
+	SCENARIO = str(ARGV[2])
 except Exception as e:
 	SCENARIO = "unknown"
 
 try:
-	TIMES = int(sys.argv[3])
+	TIMES = int(ARGV[3])
 except:
 	TIMES = 1
 
 try:
-	LOGDIR = str(sys.argv[4])
+	LOGDIR = str(ARGV[4])
 except:
 	LOGDIR = "./log/"
 
+try:
+	RESTART_AFTER = int(ARGV[5])
+except:
+	RESTART_AFTER = worker.RESTART_AFTER
+
 
 createDirectory(LOGDIR)
 
 if __name__ == "__main__":
 
-	# Create a new profile directory and try to suppress "Welcome" messages and other nonsense
-	timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
-	createDirectory("/tmp/foo" + str(timestamp))
-	createDirectory("/tmp/foo" + str(timestamp) + "/Default")
-	open("/tmp/foo" + str(timestamp) + "/First Run", 'a').close()
-	shutil.copy("chrome_prefs.json", "/tmp/foo" + str(timestamp) + "/Default/Preferences")
-
-    # Open Chrome, try to be as quiet as possible
-    # see also https://stackoverflow.com/questions/5814334/how-to-disable-google-chromes-unrequested-connections
-	p = subprocess.Popen(["google-chrome --user-data-dir=/tmp/foo" + str(timestamp) + " --remote-debugging-port=9222 --disable-background-networking --disable-component-extensions-with-background-pages --dns-prefetch-disable"], shell=True, preexec_fn=os.setsid)
-
-    # We have to kill the new Chrome once and open it again
-    # otherwise it does not display the page load on screen (???)
-	print("Opened chrome! " + str(p.pid))
-	time.sleep(2)
-	os.killpg(os.getpgid(p.pid), signal.SIGTERM)
-	print("Killed chrome! " + str(p.pid))
-
-	p = subprocess.Popen(["google-chrome --user-data-dir=/tmp/foo" + str(timestamp) + " --remote-debugging-port=9222 --disable-background-networking --disable-component-extensions-with-background-pages --dns-prefetch-disable"], shell=True, preexec_fn=os.setsid)
-	print("Opened new chrome! " + str(p.pid))
-
-	time.sleep(1)
-
-	chrome = PyChromeDevTools.ChromeInterface()
-
-	chrome.Network.enable()
+	if WORKER_MODE:
+		# In worker mode, every page load is logged as "Run 1/1", just as if fetchurl.sh had called us once per URL,
+		# so get_starttimestamp_from_workload_output.sh finds all of them
+		(urls, onResult) = worker.urlSource(URL_TO_FETCH, TIMES, SCENARIO)
+		worker.runWorker(urls, startBrowser, loadPage, resetBrowser, stopBrowser, restartAfter=RESTART_AFTER, onResult=onResult, logdir=LOGDIR)
+		sys.exit(0)
 
+	browser = startBrowser()
 
 	for run in range(1, TIMES+1):
-		timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
-		unixtimestamp = int(time.time())
-		try:
-			hostname = URL_TO_FETCH.split('/')[2]
-		except IndexError:
-			hostname = URL_TO_FETCH
-			URL_TO_FETCH = "http://" + hostname
-
-		print("Run " +  str(run) + "/" + str(TIMES) + " - Fetching " + URL_TO_FETCH + " at " + timestamp)
-		time.sleep(1)
-		event = None
-		messages = None
-
-		try:
-			# Press F12 to open DevTools console - otherwise we cannot export HAR
-			pyautogui.press('f12')
-
-			time.sleep(1)
-
-			chrome.Page.navigate(url=URL_TO_FETCH)
-			event,messages=chrome.wait_event("Page.loadEventFired", timeout=TIMEOUT)
-			time.sleep(1)
-
-		except Exception as e:
-			print("Error fetching page " + URL_TO_FETCH + ": " + str(e) + "\n")
-			try:
-				logNavigationTimings(chrome, URL_TO_FETCH, timestamp, unixtimestamp, LOGDIR + "failed_navtimings.log", scenario = SCENARIO)
-			except Exception as e:
-				print("Could not even log Nav timings for failed page " + str(URL_TO_FETCH) + ": " + str(e))
+		if not loadPage(browser, URL_TO_FETCH, run, TIMES):
+			# Stop the browser anyway, so it does not keep running and its profile gets deleted
+			stopBrowser(browser)
 			sys.exit(-1)
-		createDirectory(LOGDIR + "res")
-
-		try:
-			logNavigationTimings(chrome, URL_TO_FETCH, timestamp, unixtimestamp, LOGDIR + "navtimings.log", scenario = SCENARIO)
-
-		except Exception as e:
-			print("Error logging Navigation timings: " + str(sys.exc_info()[0]) + ", " + str(e))
-		try:
-			logResourceTimings(chrome, URL_TO_FETCH, timestamp, printout=False, scenario = SCENARIO)
-		except Exception as e:
-			print("Error logging Resource timings: " + str(sys.exc_info()[0]) + ", " + str(e))
-		try:
-			logHAR(chrome, URL_TO_FETCH, timestamp)
-		except Exception as e:
-			print("Error logging HAR: " + str(sys.exc_info()[0]) + ", " + str(e))
-
 
-	os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+	stopBrowser(browser)
@@ -12,6 +12,20 @@ Arguments:
 [3] How many times to fetch the URL
 [4] Log directory for Navigation Timings, Resource Timings, and HAR files
 
+Worker mode (keep one browser open and load a whole list of URLs):
+[1] --worker
+[2] File with URLs to fetch, one per line, "-" to read them from stdin,
+    or "queue:<DBFILE>[:<SCENARIO>]" to take them from a job queue (see jobqueue.py)
+[3] Scenario (for logging)
+[4] How many times to fetch the list of URLs
+[5] Log directory for Navigation Timings, Resource Timings, and HAR files
+[6] Restart the browser after this many page loads (default: 100)
+
+Environment:
+    HEADLESS                  Set to 1 to run Firefox without a display (default: 0)
+    NO_HAR                    Set to 1 to log a .obj.log file instead of exporting a HAR file (default: 0)
+    HAR_DOWNLOAD              Set to 1 to let Firefox write the HAR file as a download (default: 0)
+
 Dependencies:
     Firefox                   (tested with version 61.0.2 and 62.0.2)
     har-export-trigger-0.61.1 (.xpi needs to be in the same directory as this script)
@@ -29,12 +43,27 @@ import sys
 import json
 import errno
 import subprocess
+import worker
+import collect_timings
+import readiness
+import profiles
+import phases
+import segment_capture
 
 
 TIMEOUT = 60
 
 FIREFOX_PATH = "/opt/firefox/firefox"
 
+HAR_EXPORT_XPI = "har-export-trigger-0.6.1.xpi"
+
+# Run Firefox without a display (the HAR export still works, see startBrowser)
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+
+# Set this to run several instances of this script at the same time, see orchestrate.py
+# (and PROFILE_DIR, see profiles.py)
+MARIONETTE_PORT = int(os.environ.get("MARIONETTE_PORT", 2828))
+
 def createDirectory(path):
 	try:
 		os.makedirs(path)
@@ -43,260 +72,261 @@ def createDirectory(path):
 			raise
 
 
-def getRelative(value, ref):
-	try:
-		result = value - ref
-	except:
-		result = value
-	return result
+# Run a script in the current page, return its value
+def evaluateFunction(client):
+	return lambda script: client.execute_script("return " + script)
 
+# Run a script in the page itself, not in the default sandbox, to see what the page's scripts (and extensions) put there
+def pageEvaluateFunction(client):
+	return lambda script: client.execute_script("return " + script, sandbox=None, new_sandbox=False)
 
-def logNavigationTimings(client, source, formattedtimestamp, timestamp, logfilename="navtimings.log", scenario="NA"):
-	try:
-		navigationStart = client.execute_script("return window.performance.timing.navigationStart")
-		redirectStart = getRelative(client.execute_script(" return window.performance.timing.redirectStart"), 0)
-		redirectEnd = getRelative(client.execute_script("return window.performance.timing.redirectEnd") , 0)
-		fetchStart = getRelative(client.execute_script("return window.performance.timing.fetchStart") , navigationStart)
-		domainLookupStart = getRelative(client.execute_script("return window.performance.timing.domainLookupStart") , navigationStart)
-		domainLookupEnd = getRelative(client.execute_script("return window.performance.timing.domainLookupEnd") , navigationStart)
-		connectStart = getRelative(client.execute_script("return window.performance.timing.connectStart") , navigationStart)
-		secureConnectionStart = getRelative(client.execute_script("return window.performance.timing.secureConnectionStart") , navigationStart)
-		connectEnd = getRelative(client.execute_script("return window.performance.timing.connectEnd") , navigationStart)
-		requestStart = getRelative(client.execute_script("return window.performance.timing.requestStart") , navigationStart)
-		responseStart = getRelative(client.execute_script("return window.performance.timing.responseStart") , navigationStart)
-		responseEnd = getRelative(client.execute_script("return window.performance.timing.responseEnd") , navigationStart)
-		domLoading = getRelative(client.execute_script("return window.performance.timing.domLoading") , navigationStart)
-		domInteractive = getRelative(client.execute_script("return window.performance.timing.domInteractive") , navigationStart)
-		domContentLoadedEventStart = getRelative(client.execute_script("return window.performance.timing.domContentLoadedEventStart") , navigationStart)
-		domContentLoadedEventEnd = getRelative(client.execute_script("return window.performance.timing.domContentLoadedEventEnd") , navigationStart)
-		domComplete = getRelative(client.execute_script("return window.performance.timing.domComplete") , navigationStart)
-		loadEventStart = getRelative(client.execute_script("return window.performance.timing.loadEventStart") , navigationStart)
-		loadEventEnd  = getRelative(client.execute_script("return window.performance.timing.loadEventEnd") , navigationStart)
-
-		firstPaint  = getRelative(client.execute_script("return window.performance.timing.timeToNonBlankPaint") , navigationStart)
-		domContentFlushed  = getRelative(client.execute_script("return window.performance.timing.timeToDOMContentFlushed") , navigationStart)
+def logNavigationTimings(evaluate, source, formattedtimestamp, timestamp, logfilename="navtimings.log", scenario="NA"):
+	collect_timings.logNavigationTimings(evaluate, source, formattedtimestamp, timestamp, logfilename, scenario, paintfields=[ "timeToNonBlankPaint", "timeToDOMContentFlushed" ])
 
-	except Exception as err:
-		print("Could not execute script on page, got Error " + str(err))
-		return
+def logResourceTimings(evaluate, source, timestamp, printout=False, scenario = "NA"):
+	resourcelogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".res.log"
+	collect_timings.logResourceTimings(evaluate, resourcelogfilename, printout=printout, scenario=scenario)
 
-	print("Navigation timings for page " + source + ":\n\t\tredirectStart:\t\t" + str(redirectStart) + " ms\n\t\tredirectEnd:\t\t" + str(redirectEnd) + " ms\n\t\tfetchStart:\t\t" + str(fetchStart) + " ms\n\t\tdomainLookupStart:\t" + str(domainLookupStart) + " ms\n\t\tdomainLookupEnd:\t" + str(domainLookupEnd) + " ms\n\t\tconnectStart:\t\t" + str(connectStart) + " ms\n\t\tsecureConnectionStart:\t" + str(secureConnectionStart) + " ms\n\t\tconnectEnd:\t\t" + str(connectEnd) + " ms\n\t\trequestStart:\t\t" + str(requestStart) + " ms\n\t\tresponseStart:\t\t" + str(responseStart) + " ms\n\t\tresponseEnd:\t\t" + str(responseEnd) + " ms\n\t\tdomLoading:\t\t" + str(domLoading) + " ms\n\t\tdomInteractive:\t\t" + str(domInteractive) + " ms\n\t\tdomContentLoadedEventStart:\t" + str(domContentLoadedEventStart) + " ms\n\t\tdomContentLoadedEventEnd:\t" + str(domContentLoadedEventEnd) + " ms\n\t\tdomComplete:\t\t" + str(domComplete) + " ms\n\t\tloadEventStart:\t\t" + str(loadEventStart) + " ms\n\t\tloadEventEnd:\t\t" + str(loadEventEnd) + " ms\n\n\t\tfirstPaint:\t\t" + str(firstPaint) + " ms\n\t\tdomContentFlushed:\t" + str(domContentFlushed) + " ms\n")
+def logObjectTimings(evaluate, source, timestamp, scenario = "NA"):
+	objlogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".obj.log"
+	collect_timings.logObjectTimings(evaluate, objlogfilename, scenario=scenario)
 
-	try:
-		logfile = open(logfilename, 'a', 1)
+def logHAR(driver, source, timestamp, timer=None):
+	createDirectory(LOGDIR + "har/")
 
-		logfile.write (str(source) + "," + str(scenario) + "," + str(formattedtimestamp) + "," + str(timestamp) + "," + str(round(navigationStart/1000, 3)) + "," + str(redirectStart) + "," + str(redirectEnd) + "," + str(fetchStart) + "," + str(domainLookupStart) + "," + str(domainLookupEnd) + "," + str(connectStart) + "," + str(secureConnectionStart) + "," + str(connectEnd) + "," + str(requestStart) + "," + str(responseStart) + "," + str(responseEnd) + "," + str(domLoading) + "," + str(domInteractive) + "," + str(domContentLoadedEventStart) + "," + str(domContentLoadedEventEnd) + "," + str(domComplete) + "," + str(loadEventStart) + "," + str(loadEventEnd) + "," + str(firstPaint) + "," + str(domContentFlushed) + "\n")
+	if collect_timings.HAR_DOWNLOAD:
+		try:
+			(HARfilename, size) = collect_timings.downloadHAR(pageEvaluateFunction(driver), LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp, timer)
+			return HARfilename
+		except Exception as err:
+			print("Browser could not write HAR, getting it through Marionette: " + str(err))
 
-		logfile.close()
-		print("Logged Navigation Timings and firstPaint to " + logfilename)
+	try:
+        # No idea why, but the devtools have to be open for this to work.
+        # Otherwise, the Promise returned in window.foo never resolves.
+        # Also, this probably should be an async script.
+		HARtext = driver.execute_script("window.foo = HAR.triggerExport().then(harLog => { return(harLog); }); return window.foo;", sandbox=None, new_sandbox=False)
 	except Exception as err:
-		print("Error logging Navigation Timings: " + str(err))
+		print("Could not get HAR, got Error " + str(err))
+		return None
+	if timer is not None:
+		timer.mark("har_export")
+
+	HARfilename = collect_timings.writeHAR(LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp, HARtext)
+	if timer is not None:
+		timer.mark("har_write")
+	return HARfilename
+
+
+# Firefox profile with our preferences and the HAR export extension installed
+def buildProfile(profiledir):
+	shutil.copy("firefox_prefs.js", profiledir + "/prefs.js")
+	profiles.installFirefoxExtension(profiledir, HAR_EXPORT_XPI)
+
+def startBrowser():
+	timer = phases.PhaseTimer()
+	# Get a new Firefox profile, cloned from a template (see profiles.py)
+	(profiledir, profilesetup) = profiles.newProfile("firefox", [ "firefox_prefs.js", HAR_EXPORT_XPI ], buildProfile)
+	# Let Marionette listen on our own port
+	with open(profiledir + "/user.js", 'a') as prefs:
+		prefs.write("user_pref(\"marionette.port\", " + str(MARIONETTE_PORT) + ");\n")
+		if collect_timings.HAR_DOWNLOAD:
+			# Let Firefox save HAR files right into the run's har/ directory
+			createDirectory(LOGDIR + "har/")
+			for (name, value) in collect_timings.firefoxDownloadPrefs(LOGDIR + "har/"):
+				prefs.write("user_pref(" + json.dumps(name) + ", " + json.dumps(value) + ");\n")
+	timer.mark("profile")
 
-def logResourceTimings(chrome, source, timestamp, printout=False, scenario = "NA"):
+	# Launch Firefox with the new profile
+	p = subprocess.Popen([FIREFOX_PATH + " -profile " + profiledir + " -marionette " + ("-headless" if HEADLESS else "-devtools")], shell=True, preexec_fn=os.setsid)
 
-	resourcelogfile = None
-	resourcelogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".res.log"
+	startupwait = readiness.waitForPort(MARIONETTE_PORT)
+	client = Marionette('localhost', port=MARIONETTE_PORT)
+	client.start_session()
+	timer.mark("launch")
+
+	if not os.path.isdir(profiledir + "/extensions"):
+		# Could not install it into the profile, so install it now
+		addons = Addons(client)
+		addons.install(os.getcwd() + "/" + HAR_EXPORT_XPI, temp=True)
+		timer.mark("extension_install")
+
+	if HEADLESS and not collect_timings.NO_HAR:
+		# -devtools does not open the toolbox without a window, but the HAR export needs it
+		with client.using_context(client.CONTEXT_CHROME):
+			result = client.execute_async_script(readiness.FIREFOX_TOOLBOX_SCRIPT)
+		if result is not True:
+			print("Could not open the toolbox, HAR export may not work: " + str(result))
+		timer.mark("devtools")
+
+	# Collect timings with an observer in every page (see collect_timings.py)
 	try:
-		resourcelogfile = open(resourcelogfilename, 'a+')
-	except IOError as e:
-		print("Error opening logfile " + str(resourcelogfilename) + ": " + str(e))
-		return
-	except:
-		resourcelogfile.close()
-		print("Another error occured with " + str(resourcelogfilename))
-		return
+		with client.using_context(client.CONTEXT_CHROME):
+			client.execute_script(collect_timings.FIREFOX_OBSERVER_SCRIPT)
+	except Exception as e:
+		print("Could not inject timing observer, reading timings from the buffer: " + str(e))
+	timer.mark("observer")
+
+	return { "process": p, "client": client, "profiledir": profiledir, "startup_wait": startupwait, "profile_setup": profilesetup, "phases": timer }
 
+def stopBrowser(browser):
 	try:
-		numberofresources = client.execute_script("return window.performance.getEntriesByType(\"resource\").length", new_sandbox=False)
-	except Exception as err:
-		print("Could not get number of resources, got Error " + str(err))
-		return
+		browser["client"].close()
+	except Exception as e:
+		print("Could not close Marionette session: " + str(e))
+	time.sleep(1)
+	os.killpg(os.getpgid(browser["process"].pid), signal.SIGTERM)
+	browser["process"].wait()
+	profiles.removeProfile(browser["profiledir"])
+
+# Clear cache, cookies, storage, DNS cache, connections, TLS sessions, HSTS, and alt-svc, see worker.FIREFOX_RESET_SCRIPT,
+# so the next page load starts from about the same state as with a fresh profile
+def resetBrowser(browser):
+	timer = phases.PhaseTimer()
+	client = browser["client"]
+	with client.using_context(client.CONTEXT_CHROME):
+		client.execute_script(worker.FIREFOX_RESET_SCRIPT)
+	client.navigate("about:blank")
+	timer.mark("reset")
+	browser["phases"] = timer
+
+# Load one page and log its Navigation Timings, Resource Timings, and HAR file
+# Returns False if the page load failed
+def loadPage(browser, url, run=1, times=1):
+	client = browser["client"]
+	timer = phases.PhaseTimer()
+	# Starting or resetting the browser counts towards this page load
+	timer.prepend(browser.pop("phases", None))
 
-	for r in range(0, numberofresources):
-		try:
-			resource = client.execute_script("return window.performance.getEntriesByType(\"resource\")[" + str(r) + "]", new_sandbox=False)
-		except Exception as err:
-			print("Could not get resource timings for resource " + str(r) + "/" + str(numberofresources) + ", got Error " + str(err))
-			resourcelogfile.close()
-			os.remove(resourcelogfilename)
-			return
-		starttime = resource['startTime']
-		if resource['redirectStart'] > 0:
-			redirectStart = resource['redirectStart']
-			redirectStart = resource['redirectEnd']
-		else:
-			redirectStart = "NA"
-			redirectEnd = "NA"
-		fetchStart = resource['fetchStart']
-		domainLookupStart = resource['domainLookupStart']
-		domainLookupEnd = resource['domainLookupEnd']
-		connectStart = resource['connectStart']
-		if resource['secureConnectionStart'] > 0:
-			secureConnectionStart = resource['secureConnectionStart']
-		else:
-			secureConnectionStart = "NA"
-		connectEnd = resource['connectEnd']
-		requestStart = resource['requestStart']
-		responseStart = resource['responseStart']
-		responseEnd = resource['responseEnd']
-		duration = resource['duration']
-		initiatorType = resource['initiatorType']
-		nextHopProtocol = resource['nextHopProtocol']
-		encodedBodySize = resource['encodedBodySize']
-		decodedBodySize = resource['decodedBodySize']
-
-		if printout:
-			print("Resource timings for " + resource['name'] + ":")
-			print("(initiated by " + str(initiatorType) + ", fetched via " + str(nextHopProtocol) + ")")
-			print("\t\tstartTime \t\t" + str(starttime))
-			if redirectStart != "NA":
-				print("\t\tredirectStart \t\t" + str(redirectStart - starttime))
-				print("\t\tredirectEnd \t\t" + str(redirectEnd - starttime))
-			print("\t\tfetchStart \t\t" + str(fetchStart - starttime))
-			print("\t\tdomainLookupStart \t" + str(domainLookupStart - starttime))
-			print("\t\tdomainLookupEnd \t" + str(domainLookupEnd - starttime))
-			print("\t\tconnectStart \t\t" + str(connectStart - starttime))
-			if secureConnectionStart != "NA":
-				print("\t\tsecureConnectionStart \t" + str(secureConnectionStart - starttime))
-			print("\t\tconnectEnd \t\t" + str(connectEnd - starttime))
-			print("\t\trequestStart: \t\t" + str(requestStart - starttime))
-			print("\t\tresponseStart: \t\t" + str(responseStart - starttime))
-			print("\t\tresponseEnd: \t\t" + str(responseEnd - starttime))
-			print("\t\tduration: \t\t" + str(duration) + "\n")
-			print("\t\tencodedBodySize: \t\t" + str(encodedBodySize) + "\n")
-			print("\t\tdecodedBodySize: \t\t" + str(decodedBodySize) + "\n")
-
-		if resourcelogfile is not None:
-			try:
-				resourcelogfile.write(resource['name'].replace(",", "") + "," + str(scenario) + "," + str(initiatorType) + "," + str(nextHopProtocol) + "," + str(encodedBodySize) + "," + str(decodedBodySize) + "," + str(starttime) + "," + str(redirectStart) + "," + str(redirectEnd) + "," + str(fetchStart) + "," + str(domainLookupStart) + "," + str(domainLookupEnd) + "," + str(connectStart) + "," + str(secureConnectionStart) + "," + str(connectEnd) + "," + str(requestStart) + "," + str(responseStart) + "," + str(responseEnd) + "," + str(duration) + "\n")
-			except Exception as err:
-				print("Error: " + str(err))
+	timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
+	unixtimestamp = int(time.time())
 	try:
-		print("Logged all " + str(numberofresources) + " resource timings to " + str(resourcelogfilename))
-		resourcelogfile.close()
-	except Exception as err:
-		print("Error: " + str(err))
+		hostname = url.split('/')[2]
+	except IndexError:
+		hostname = url
+		url = "http://" + hostname
+
+	print("Run " +  str(run) + "/" + str(times) + " - Fetching " + url + " at " + timestamp)
+	segment_capture.announce("start", hostname + "+" + timestamp)
+	event = None
+	messages = None
+	# Only the first page load of a browser waited for it to start
+	waits = { "startup": browser.pop("startup_wait", None), "profile": browser.pop("profile_setup", None) }
 
-def logHAR(driver, source, timestamp):
-	HARfile = None
-	createDirectory(LOGDIR + "har/")
-	HARfilename = LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp + ".har"
 	try:
-		HARfile = open(HARfilename, 'w')
-	except IOError as e:
-		print("Error opening logfile " + str(HARfile) + ": " + str(e))
-		return None
-	except:
-		HARfile.close()
-		print("Another error occured with " + str(HARfilename))
-		return None
+		client.navigate(url)
+		timer.mark("navigate")
+		waits["settle"] = readiness.settle(evaluateFunction(client))
+		timer.mark("settle")
+
+	except Exception as e:
+		print("Error fetching page " + url + ": " + str(e) + "\n")
+		timer.mark("failed")
+		try:
+			logNavigationTimings(evaluateFunction(client), url, timestamp, unixtimestamp, LOGDIR + "failed_navtimings.log", scenario = SCENARIO)
+		except Exception as e:
+			print("Could not even log Nav timings for failed page " + str(url) + ": " + str(e))
+		segment_capture.announce("end", hostname + "+" + timestamp)
+		timer.log(LOGDIR, url, SCENARIO, timestamp)
+		return False
+	createDirectory(LOGDIR + "res")
 
+	# Get all timings at once, including what the observer collected (see collect_timings.py)
 	try:
-        # No idea why, but the devtools have to be open for this to work.
-        # Otherwise, the Promise returned in window.foo never resolves.
-        # Also, this probably should be an async script.
-		HARtext = driver.execute_script("window.foo = HAR.triggerExport().then(harLog => { return(harLog); }); return window.foo;", sandbox=None, new_sandbox=False)
-	except Exception as err:
-		print("Could not get HAR, got Error " + str(err))
-		return None
+		(timings, drained) = collect_timings.drainTimings(pageEvaluateFunction(client))
+		collect_timings.logObserverCounts(LOGDIR + "observer.log", url, SCENARIO, timestamp, drained)
+	except Exception as e:
+		print("Could not drain timings, reading them one by one: " + str(e))
+		timings = evaluateFunction(client)
+	timer.mark("drain")
 
 	try:
-		HARfile.write(json.dumps({"log": HARtext}, indent=4, sort_keys=True))
-		print("Logged HAR to " + str(HARfilename))
-		HARfile.close()
-		return HARfilename
+		logNavigationTimings(timings, url, timestamp, unixtimestamp, LOGDIR + "navtimings.log", scenario = SCENARIO)
+	except Exception as e:
+		print("Error logging Navigation timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+	timer.mark("navtimings")
+	try:
+		logResourceTimings(timings, url, timestamp, printout=False, scenario = SCENARIO)
+	except Exception as e:
+		print("Error logging Resource timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+	timer.mark("restimings")
+	if collect_timings.NO_HAR:
+		try:
+			logObjectTimings(timings, url, timestamp, scenario = SCENARIO)
+		except Exception as e:
+			print("Error logging object timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+		readiness.logWaitTimes(LOGDIR + "waittimes.log", url, SCENARIO, timestamp, waits)
+		timer.mark("objtimings")
+	else:
+		try:
+			# HAR is only visible in the page itself, not in the default sandbox
+			waits["extension"] = readiness.waitForHAR(pageEvaluateFunction(client))
+		except readiness.NotReadyError as e:
+			print(str(e))
+		readiness.logWaitTimes(LOGDIR + "waittimes.log", url, SCENARIO, timestamp, waits)
+		timer.mark("har_wait")
+		try:
+			logHAR(client, url, timestamp, timer)
+		except Exception as e:
+			print("Error logging HAR: " + str(sys.exc_info()[0]) + ", " + str(e))
+	segment_capture.announce("end", hostname + "+" + timestamp)
+	timer.log(LOGDIR, url, SCENARIO, timestamp)
+	return True
 
-	except Exception as err:
-		print("Could not log HAR to " + str(HARfilename) + ", got Error " + str(err))
-		return None
 
+ARGV = sys.argv
+WORKER_MODE = False
+if len(ARGV) > 1 and ARGV[1] == "--worker":
+	WORKER_MODE = True
+	ARGV = ARGV[1:]
 
 try:
-	if (sys.argv[1] == "--help"):
-		print("Usage:\n\t\twebtimings.py <URL_TO_FETCH> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY>")
+	if (ARGV[1] == "--help"):
+		print("Usage:\n\t\twebtimings.py <URL_TO_FETCH> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY>\n\t\twebtimings.py --worker <URLFILE|-> <SCENARIO> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY> [<RESTART_AFTER>]")
 		sys.exit(0)
 	else:
-		URL_TO_FETCH = str(sys.argv[1])
+		URL_TO_FETCH = str(ARGV[1])
 except Exception as e:
 	URL_TO_FETCH = "http://www.debian.org"
 
 try:
-	SCENARIO = str(sys.argv[2])
+	SCENARIO = str(ARGV[2])
 except Exception as e:
 	SCENARIO = "unknown"
 
 try:
-	TIMES = int(sys.argv[3])
+	TIMES = int(ARGV[3])
 except:
 	TIMES = 1
 
 try:
-	LOGDIR = str(sys.argv[4])
+	LOGDIR = str(ARGV[4])
 except:
 	LOGDIR = "./log/"
 
+try:
+	RESTART_AFTER = int(ARGV[5])
+except:
+	RESTART_AFTER = worker.RESTART_AFTER
+
 
 createDirectory(LOGDIR)
 
 if __name__ == "__main__":
 
-	# Create new Firefox profile, copy preferences there
-	timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
-	subprocess.call(FIREFOX_PATH + " -CreateProfile \"foo" + str(timestamp) + " /tmp/foo" + str(timestamp) + "\"", shell=True)
-	shutil.copy("firefox_prefs.js", "/tmp/foo" + str(timestamp) + "/prefs.js")
-
-	time.sleep(1)
-
-	# Launch Firefox with the new profile
-	p = subprocess.Popen([FIREFOX_PATH + " -profile /tmp/foo" + str(timestamp) + " -marionette -devtools"], shell=True, preexec_fn=os.setsid)
-
-	client = Marionette('localhost', port=2828)
-	client.start_session()
+	if WORKER_MODE:
+		# In worker mode, every page load is logged as "Run 1/1", just as if fetchurl.sh had called us once per URL,
+		# so get_starttimestamp_from_workload_output.sh finds all of them
+		(urls, onResult) = worker.urlSource(URL_TO_FETCH, TIMES, SCENARIO)
+		worker.runWorker(urls, startBrowser, loadPage, resetBrowser, stopBrowser, restartAfter=RESTART_AFTER, onResult=onResult, logdir=LOGDIR)
+		sys.exit(0)
 
-	addons = Addons(client)
-	addons.install(os.getcwd() + "/har-export-trigger-0.6.1.xpi", temp=True)
+	browser = startBrowser()
 
 	for run in range(1, TIMES+1):
-		timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
-		unixtimestamp = int(time.time())
-		try:
-			hostname = URL_TO_FETCH.split('/')[2]
-		except IndexError:
-			hostname = URL_TO_FETCH
-			URL_TO_FETCH = "http://" + hostname
-
-		print("Run " +  str(run) + "/" + str(TIMES) + " - Fetching " + URL_TO_FETCH + " at " + timestamp)
-		time.sleep(1)
-		event = None
-		messages = None
-
-		try:
-			time.sleep(1)
-
-			client.navigate(URL_TO_FETCH)
-
-		except Exception as e:
-			print("Error fetching page " + URL_TO_FETCH + ": " + str(e) + "\n")
-			try:
-				logNavigationTimings(client, URL_TO_FETCH, timestamp, unixtimestamp, LOGDIR + "failed_navtimings.log", scenario = SCENARIO)
-			except Exception as e:
-				print("Could not even log Nav timings for failed page " + str(URL_TO_FETCH) + ": " + str(e))
+		if not loadPage(browser, URL_TO_FETCH, run, TIMES):
+			# Stop the browser anyway, so it does not keep running and its profile gets deleted
+			stopBrowser(browser)
 			sys.exit(-1)
-		createDirectory(LOGDIR + "res")
 
-		try:
-			logNavigationTimings(client, URL_TO_FETCH, timestamp, unixtimestamp, LOGDIR + "navtimings.log", scenario = SCENARIO)
-		except Exception as e:
-			print("Error logging Navigation timings: " + str(sys.exc_info()[0]) + ", " + str(e))
-		try:
-			logResourceTimings(client, URL_TO_FETCH, timestamp, printout=False, scenario = SCENARIO)
-		except Exception as e:
-			print("Error logging Resource timings: " + str(sys.exc_info()[0]) + ", " + str(e))
-		try:
-			logHAR(client, URL_TO_FETCH, timestamp)
-		except Exception as e:
-			print("Error logging HAR: " + str(sys.exc_info()[0]) + ", " + str(e))
-
-	client.close()
-	time.sleep(1)
-	os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+	stopBrowser(browser)
@@ -14,6 +14,15 @@ Arguments:
 [3] How many times to fetch the URL
 [4] Log directory for resource timings
 
+Worker mode (keep one browser open and load a whole list of URLs):
+[1] --worker
+[2] File with URLs to fetch, one per line, "-" to read them from stdin,
+    or "queue:<DBFILE>[:<SCENARIO>]" to take them from a job queue (see jobqueue.py)
+[3] Scenario (for logging)
+[4] How many times to fetch the list of URLs
+[5] Log directory for resource timings
+[6] Restart the browser after this many page loads (default: 100)
+
 
 Navigation Timing Events
 
@@ -21,6 +30,11 @@ navigationStart -> redirectStart -> redirectEnd -> fetchStart -> domainLookupSta
 -> connectStart -> connectEnd -> requestStart -> responseStart -> responseEnd
 -> domLoading -> domInteractive -> domContentLoadedEventStart -> domContentLoadedEventEnd -> domComplete -> loadEventStart -> loadEventEnd
 
+Environment:
+                HEADLESS      Set to 1 to run Firefox without a display (default: 0)
+                NO_HAR        Set to 1 to log a .obj.log file instead of exporting a HAR file (default: 0)
+                HAR_DOWNLOAD  Set to 1 to let Firefox write the HAR file as a download (default: 0)
+
 Dependencies: 
                 Firefox     (tested with version 61.0.2, set FIREFOX_PATH accordingly below)
                 selenium    (tested with version 3.14.0)
@@ -40,11 +54,19 @@ import time
 import sys 
 import re
 import json
+import worker
+import collect_timings
+import readiness
+import phases
+import segment_capture
 
 FIREFOX_PATH = "/opt/firefox-61.0.2/firefox"
 
 SOCKETTIMEOUT = 30
 
+# Run Firefox without a display (the HAR export still works, see startBrowser)
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+
 def createDirectory(path):
 	try:
 		os.makedirs(path)
@@ -70,204 +92,46 @@ class FirefoxProfileWithWebExtensionSupport(webdriver.FirefoxProfile):
                 raise AddonFormatError(str(e), sys.exc_info()[2])
 
 
-def getRelative(value, ref):
-	try:
-		result = value - ref
-	except:
-		result = value
-	return result
-
-def logNavigationTimings(driver, source, formattedtimestamp, timestamp, logfilename="navtimings.log", scenario="NA"):
-	try:
-		navigationStart = driver.execute_script("return window.performance.timing.navigationStart")
-		redirectStart = getRelative(driver.execute_script("return window.performance.timing.redirectStart") , 0)
-		redirectEnd = getRelative(driver.execute_script("return window.performance.timing.redirectEnd") , 0)
-		fetchStart = getRelative(driver.execute_script("return window.performance.timing.fetchStart") , navigationStart)
-		domainLookupStart = getRelative(driver.execute_script("return window.performance.timing.domainLookupStart") , navigationStart)
-		domainLookupEnd = getRelative(driver.execute_script("return window.performance.timing.domainLookupEnd") , navigationStart)
-		connectStart = getRelative(driver.execute_script("return window.performance.timing.connectStart") , navigationStart)
-		secureConnectionStart = getRelative(driver.execute_script("return window.performance.timing.secureConnectionStart") , navigationStart)
-		connectEnd = getRelative(driver.execute_script("return window.performance.timing.connectEnd") , navigationStart)
-		requestStart = getRelative(driver.execute_script("return window.performance.timing.requestStart") , navigationStart)
-		responseStart = getRelative(driver.execute_script("return window.performance.timing.responseStart") , navigationStart)
-		responseEnd = getRelative(driver.execute_script("return window.performance.timing.responseEnd") , navigationStart)
-		domLoading = getRelative(driver.execute_script("return window.performance.timing.domLoading") , navigationStart)
-		domInteractive = getRelative(driver.execute_script("return window.performance.timing.domInteractive") , navigationStart)
-		domContentLoadedEventStart = getRelative(driver.execute_script("return window.performance.timing.domContentLoadedEventStart") , navigationStart)
-		domContentLoadedEventEnd = getRelative(driver.execute_script("return window.performance.timing.domContentLoadedEventEnd") , navigationStart)
-		domComplete = getRelative(driver.execute_script("return window.performance.timing.domComplete") , navigationStart)
-		loadEventStart = getRelative(driver.execute_script("return window.performance.timing.loadEventStart") , navigationStart)
-		loadEventEnd  = getRelative(driver.execute_script("return window.performance.timing.loadEventEnd") , navigationStart)
-		firstPaint  = getRelative(driver.execute_script("return window.performance.timing.timeToNonBlankPaint") , navigationStart)
-	except Exception as err:
-		print("Could not execute script on page, got Error " + str(err))
-		return
-	
-	print("Navigation timings for page " + source + ":\n\t\tredirectStart:\t\t" + str(redirectStart) + " ms\n\t\tredirectEnd:\t\t" + str(redirectEnd) + " ms\n\t\tfetchStart:\t\t" + str(fetchStart) + " ms\n\t\tdomainLookupStart:\t" + str(domainLookupStart) + " ms\n\t\tdomainLookupEnd:\t" + str(domainLookupEnd) + " ms\n\t\tconnectStart:\t\t" + str(connectStart) + " ms\n\t\tsecureConnectionStart:\t" + str(secureConnectionStart) + " ms\n\t\tconnectEnd:\t\t" + str(connectEnd) + " ms\n\t\trequestStart:\t\t" + str(requestStart) + " ms\n\t\tresponseStart:\t\t" + str(responseStart) + " ms\n\t\tresponseEnd:\t\t" + str(responseEnd) + " ms\n\t\tdomLoading:\t\t" + str(domLoading) + " ms\n\t\tdomInteractive:\t\t" + str(domInteractive) + " ms\n\t\tdomContentLoadedEventStart:\t" + str(domContentLoadedEventStart) + " ms\n\t\tdomContentLoadedEventEnd:\t" + str(domContentLoadedEventEnd) + " ms\n\t\tdomComplete:\t\t" + str(domComplete) + " ms\n\t\tloadEventStart:\t\t" + str(loadEventStart) + " ms\n\t\tloadEventEnd:\t\t" + str(loadEventEnd) + " ms\n\n\t\tfirstPaint:\t\t" + str(firstPaint) + " ms\n")
-	
-	try:
-		logfile = open(logfilename, 'a', 1)
-
-		logfile.write (str(source) + "," + str(scenario) + "," + str(formattedtimestamp) + "," + str(timestamp) + "," + str(round(navigationStart/1000, 3)) + "," + str(redirectStart) + "," + str(redirectEnd) + "," + str(fetchStart) + "," + str(domainLookupStart) + "," + str(domainLookupEnd) + "," + str(connectStart) + "," + str(secureConnectionStart) + "," + str(connectEnd) + "," + str(requestStart) + "," + str(responseStart) + "," + str(responseEnd) + "," + str(domLoading) + "," + str(domInteractive) + "," + str(domContentLoadedEventStart) + "," + str(domContentLoadedEventEnd) + "," + str(domComplete) + "," + str(loadEventStart) + "," + str(loadEventEnd) + "," + str(firstPaint) + "\n")
-
-		logfile.close()
-		print("Logged Navigation Timings and firstPaint to " + logfilename)
-	except Exception as err:
-		print("Error logging Navigation Timings: " + str(err))
+# Run a script in the current page, return its value
+def evaluateFunction(driver):
+	return lambda script: driver.execute_script("return " + script)
 
-def logResourceTimings(driver, source, timestamp, printout=False, scenario = "NA"):
+def logNavigationTimings(evaluate, source, formattedtimestamp, timestamp, logfilename="navtimings.log", scenario="NA"):
+	collect_timings.logNavigationTimings(evaluate, source, formattedtimestamp, timestamp, logfilename, scenario, paintfields=[ "timeToNonBlankPaint" ])
 
-	resourcelogfile = None
+def logResourceTimings(evaluate, source, timestamp, printout=False, scenario = "NA"):
 	resourcelogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".res.log"
-	try:
-		resourcelogfile = open(resourcelogfilename, 'a+')
-	except IOError as e:
-		print("Error opening logfile " + str(resourcelogfilename) + ": " + str(e))
-		return
-	except:
-		resourcelogfile.close()
-		print("Another error occured with " + str(resourcelogfilename))
-		return
+	collect_timings.logResourceTimings(evaluate, resourcelogfilename, printout=printout, scenario=scenario)
 
-	try:
-		numberofresources = driver.execute_script("return window.performance.getEntriesByType(\"resource\").length")
-	except Exception as err:
-		print("Could not get number of resources, got Error " + str(err))
-		return
+def logObjectTimings(evaluate, source, timestamp, scenario = "NA"):
+	objlogfilename = LOGDIR + "res/" + source.split('/')[2] + "+" + timestamp + ".obj.log"
+	collect_timings.logObjectTimings(evaluate, objlogfilename, scenario=scenario)
+
+def logHAR(driver, source, timestamp, timer=None):
+	createDirectory(LOGDIR + "har/")
 
-	for r in range(0, numberofresources):
+	if collect_timings.HAR_DOWNLOAD:
 		try:
-			resource = driver.execute_script("return window.performance.getEntriesByType(\"resource\")["+str(r)+"]")
+			(HARfilename, size) = collect_timings.downloadHAR(evaluateFunction(driver), LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp, timer)
+			return HARfilename
 		except Exception as err:
-			print("Could not get resource timings for resource " + str(r) + "/" + str(numberofresources) + ", got Error " + str(err))
-			resourcelogfile.close()
-			os.remove(resourcelogfilename)
-			return
-		starttime = resource['startTime']
-		if resource['redirectStart'] > 0:
-			redirectStart = resource['redirectStart']
-			redirectStart = resource['redirectEnd']
-		else:
-			redirectStart = "NA"
-			redirectEnd = "NA"
-		fetchStart = resource['fetchStart']
-		domainLookupStart = resource['domainLookupStart']
-		domainLookupEnd = resource['domainLookupEnd']
-		connectStart = resource['connectStart']
-		if resource['secureConnectionStart'] > 0:
-			secureConnectionStart = resource['secureConnectionStart']
-		else:
-			secureConnectionStart = "NA"
-		connectEnd = resource['connectEnd']
-		requestStart = resource['requestStart']
-		responseStart = resource['responseStart']
-		responseEnd = resource['responseEnd']
-		duration = resource['duration']
-		initiatorType = resource['initiatorType']
-		nextHopProtocol = resource['nextHopProtocol']
-
-		if printout:
-			print("Resource timings for " + resource['name'] + ":")
-			print("(initiated by " + str(initiatorType) + ", fetched via " + str(nextHopProtocol) + ")")
-			print("\t\tstartTime \t\t" + str(starttime))
-			if redirectStart != "NA":
-				print("\t\tredirectStart \t\t" + str(redirectStart - starttime))
-				print("\t\tredirectEnd \t\t" + str(redirectEnd - starttime))
-			print("\t\tfetchStart \t\t" + str(fetchStart - starttime))
-			print("\t\tdomainLookupStart \t" + str(domainLookupStart - starttime))
-			print("\t\tdomainLookupEnd \t" + str(domainLookupEnd - starttime))
-			print("\t\tconnectStart \t\t" + str(connectStart - starttime))
-			if secureConnectionStart != "NA":
-				print("\t\tsecureConnectionStart \t" + str(secureConnectionStart - starttime))
-			print("\t\tconnectEnd \t\t" + str(connectEnd - starttime))
-			print("\t\trequestStart: \t\t" + str(requestStart - starttime))
-			print("\t\tresponseStart: \t\t" + str(responseStart - starttime))
-			print("\t\tresponseEnd: \t\t" + str(responseEnd - starttime))
-			print("\t\tduration: \t\t" + str(duration) + "\n")
-
-		if resourcelogfile is not None:
-			try:
-				resourcelogfile.write(resource['name'].replace(",", "") + "," + str(scenario) + "," + str(initiatorType) + "," + str(nextHopProtocol) + "," + str(starttime) + "," + str(redirectStart) + "," + str(redirectEnd) + "," + str(fetchStart) + "," + str(domainLookupStart) + "," + str(domainLookupEnd) + "," + str(connectStart) + "," + str(secureConnectionStart) + "," + str(connectEnd) + "," + str(requestStart) + "," + str(responseStart) + "," + str(responseEnd) + "," + str(duration) + "\n")
-			except Exception as err:
-				print("Error: " + str(err))
-	try:
-		print("Logged all resource timings to " + str(resourcelogfilename))
-		resourcelogfile.close()
-	except Exception as err:
-		print("Error: " + str(err))
-
-def logHAR(driver, source, timestamp):
-	HARfile = None
-	createDirectory(LOGDIR + "har/")
-	HARfilename = LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp + ".har"
-	try:
-		HARfile = open(HARfilename, 'w')
-	except IOError as e:
-		print("Error opening logfile " + str(HARfile) + ": " + str(e))
-		return None
-	except:
-		HARfile.close()
-		print("Another error occured with " + str(HARfilename))
-		return None
+			print("Browser could not write HAR, getting it through WebDriver: " + str(err))
 
 	try:
 		HARtext = driver.execute_script("foo = HAR.triggerExport().then( result => { return result;}); return foo;")
 	except Exception as err:
 		print("Could not get HAR, got Error " + str(err))
 		return None
+	if timer is not None:
+		timer.mark("har_export")
 
-	try:
-		HARfile.write(json.dumps({"log": HARtext}, indent=4, sort_keys=True))
-		print("Logged HAR to " + str(HARfilename))
-		HARfile.close()
-		return HARfilename
-
-	except Exception as err:
-		print("Could not log HAR to " + str(HARfilename) + ", got Error " + str(err))
-		return None
-
-"""
-Main code starts here!
-"""
-
-try:
-	if (sys.argv[1] == "--help"):
-		print("Usage:\n\t\twebtimings.py <URL_TO_FETCH> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY>")
-		sys.exit(0)
-	else:
-		URL_TO_FETCH = str(sys.argv[1])
-except Exception as e:
-	URL_TO_FETCH = "http://www.debian.org"
-
-try:
-	SCENARIO = str(sys.argv[2])
-except Exception as e:
-	SCENARIO = "unknown"
-
-try:
-	if re.search('mobile', SCENARIO):
-		USERAGENT = "Mozilla/5.0 (Linux; Android 4.2.2; SOL22 Build/10.3.1.D.0.220) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/38.0.2125.102 Mobile Safari/537.36"
-		print("Setting user agent to mobile.")
-	else:
-		USERAGENT = ""
-except:
-	USERAGENT = ""
-
-
-try:
-	TIMES = int(sys.argv[3])
-except:
-	TIMES = 1
-
-try:
-	LOGDIR = str(sys.argv[4])
-except:
-	LOGDIR = "./log/"
-
-
-createDirectory(LOGDIR)
+	HARfilename = collect_timings.writeHAR(LOGDIR + "har/" + source.split('/')[2] + "+" + timestamp, HARtext)
+	if timer is not None:
+		timer.mark("har_write")
+	return HARfilename
 
-if __name__ == "__main__":
+def startBrowser():
+	timer = phases.PhaseTimer()
 	profile = FirefoxProfileWithWebExtensionSupport()
 	profile.set_preference("app.update.enabled", "false")
 
@@ -347,6 +211,11 @@ if __name__ == "__main__":
 			profile.set_preference("general.useragent.override", USERAGENT)
 		profile.set_preference("devtools.netmonitor.enabled", True)
 		profile.set_preference("devtools.netmonitor.har.includeResponseBodies", False)
+		if collect_timings.HAR_DOWNLOAD:
+			# Let Firefox save HAR files right into the run's har/ directory
+			createDirectory(LOGDIR + "har/")
+			for (name, value) in collect_timings.firefoxDownloadPrefs(LOGDIR + "har/"):
+				profile.set_preference(name, value)
 
         # This seems to not work with Firefox 61.0.2 :(
 		#profile.set_preference("devtools.netmonitor.har.enableAutoExportToFile", True)
@@ -362,7 +231,8 @@ if __name__ == "__main__":
 	except Exception as err:
 		print("Failed to load HAR Export Trigger extension:" + str(err) + " - Is it in the same directory?")
 	firefox_options = webdriver.FirefoxOptions()
-	firefox_options.add_argument("-devtools")
+	firefox_options.add_argument("-headless" if HEADLESS else "-devtools")
+	timer.mark("profile")
 
 
 	socket.setdefaulttimeout(SOCKETTIMEOUT) # Sadly, this seems to be the only thing that works to actually get a timeout
@@ -372,50 +242,193 @@ if __name__ == "__main__":
 		print("Could not find firefox binary at " + FIREFOX_PATH + " -- trying to use default")
 		driver = webdriver.Firefox(firefox_profile=profile, options=firefox_options)
 
-	time.sleep(1)
+	# webdriver.Firefox() only returns once the browser is ready
+	# (this includes writing the profile to disk and installing the extension)
+	timer.mark("launch")
 
-	successfulruns = []
+	if HEADLESS and not collect_timings.NO_HAR:
+		# -devtools does not open the toolbox without a window, but the HAR export needs it
+		with driver.context(driver.CONTEXT_CHROME):
+			result = driver.execute_async_script(readiness.FIREFOX_TOOLBOX_SCRIPT)
+		if result is not True:
+			print("Could not open the toolbox, HAR export may not work: " + str(result))
+		timer.mark("devtools")
 
-	for run in range(1, TIMES+1):
-		timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
-		unixtimestamp = int(time.time())
-		try:
-			hostname = URL_TO_FETCH.split('/')[2]
-		except IndexError:
-			hostname = URL_TO_FETCH
-			URL_TO_FETCH = "http://" + hostname
+	# Collect timings with an observer in every page (see collect_timings.py)
+	try:
+		with driver.context(driver.CONTEXT_CHROME):
+			driver.execute_script(collect_timings.FIREFOX_OBSERVER_SCRIPT)
+	except Exception as e:
+		print("Could not inject timing observer, reading timings from the buffer: " + str(e))
+	timer.mark("observer")
+
+	return { "driver": driver, "phases": timer }
+
+def stopBrowser(browser):
+	# quit() (unlike close()) also shuts down geckodriver and removes the temporary profile
+	browser["driver"].quit()
+
+# Clear cache, cookies, storage, DNS cache, connections, TLS sessions, HSTS, and alt-svc, see worker.FIREFOX_RESET_SCRIPT,
+# so the next page load starts from about the same state as with a fresh profile
+def resetBrowser(browser):
+	timer = phases.PhaseTimer()
+	driver = browser["driver"]
+	with driver.context(driver.CONTEXT_CHROME):
+		driver.execute_script(worker.FIREFOX_RESET_SCRIPT)
+	driver.get("about:blank")
+	timer.mark("reset")
+	browser["phases"] = timer
+
+# Load one page and log its Navigation Timings, Resource Timings, and HAR file
+# Returns False if the page load failed
+def loadPage(browser, url, run=1, times=1):
+	driver = browser["driver"]
+	timer = phases.PhaseTimer()
+	# Starting or resetting the browser counts towards this page load
+	timer.prepend(browser.pop("phases", None))
+
+	timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
+	unixtimestamp = int(time.time())
+	try:
+		hostname = url.split('/')[2]
+	except IndexError:
+		hostname = url
+		url = "http://" + hostname
 
-		print("Run " +  str(run) + "/" + str(TIMES) + " - Fetching " + URL_TO_FETCH + " at " + timestamp)
-		time.sleep(1)
+	print("Run " +  str(run) + "/" + str(times) + " - Fetching " + url + " at " + timestamp)
+	segment_capture.announce("start", hostname + "+" + timestamp)
+	waits = {}
 
+	try:
+		driver.get(url)
+		timer.mark("navigate")
+		waits["settle"] = readiness.settle(evaluateFunction(driver))
+		timer.mark("settle")
+	except socket.timeout:
+		sys.stderr.write("Socket timeout for " + url + " - not retrying\n")
+		timer.mark("timeout")
+	except Exception as e:
+		print("Error fetching page " + url + ": " + str(e) + "\n")
+		timer.mark("failed")
 		try:
-			time.sleep(1)
-			driver.get(URL_TO_FETCH)
-		except socket.timeout:
-			sys.stderr.write("Socket timeout for " + URL_TO_FETCH + " - not retrying\n")
+			logNavigationTimings(evaluateFunction(driver), url, timestamp, unixtimestamp, LOGDIR + "failed_navtimings.log", scenario = SCENARIO)
 		except Exception as e:
-			print("Error fetching page " + URL_TO_FETCH + ": " + str(e) + "\n")
-			try:
-				logNavigationTimings(driver, URL_TO_FETCH, timestamp, unixtimestamp, LOGDIR + "failed_navtimings.log", scenario = SCENARIO)
-			except Exception as e:
-				print("Could not even log Nav timings for failed page " + str(URL_TO_FETCH) + ": " + str(e))
-			sys.exit(-1)
-		createDirectory(LOGDIR + "res")
+			print("Could not even log Nav timings for failed page " + str(url) + ": " + str(e))
+		segment_capture.announce("end", hostname + "+" + timestamp)
+		timer.log(LOGDIR, url, SCENARIO, timestamp)
+		return False
+	createDirectory(LOGDIR + "res")
 
-		try:
-			logNavigationTimings(driver, URL_TO_FETCH, timestamp, unixtimestamp, LOGDIR + "navtimings.log", scenario = SCENARIO)
+	# Get all timings at once, including what the observer collected (see collect_timings.py)
+	try:
+		(timings, drained) = collect_timings.drainTimings(evaluateFunction(driver))
+		collect_timings.logObserverCounts(LOGDIR + "observer.log", url, SCENARIO, timestamp, drained)
+	except Exception as e:
+		print("Could not drain timings, reading them one by one: " + str(e))
+		timings = evaluateFunction(driver)
+	timer.mark("drain")
 
-		except Exception as e:
-			print("Error logging Navigation timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+	try:
+		logNavigationTimings(timings, url, timestamp, unixtimestamp, LOGDIR + "navtimings.log", scenario = SCENARIO)
+
+	except Exception as e:
+		print("Error logging Navigation timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+	timer.mark("navtimings")
+	try:
+		logResourceTimings(timings, url, timestamp, printout=False, scenario = SCENARIO)
+	except Exception as e:
+		print("Error logging Resource timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+	timer.mark("restimings")
+	if collect_timings.NO_HAR:
 		try:
-			logResourceTimings(driver, URL_TO_FETCH, timestamp, printout=False, scenario = SCENARIO)
+			logObjectTimings(timings, url, timestamp, scenario = SCENARIO)
 		except Exception as e:
-			print("Error logging Resource timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+			print("Error logging object timings: " + str(sys.exc_info()[0]) + ", " + str(e))
+		readiness.logWaitTimes(LOGDIR + "waittimes.log", url, SCENARIO, timestamp, waits)
+		timer.mark("objtimings")
+	else:
 		try:
-			harfile_to_process = logHAR(driver, URL_TO_FETCH, timestamp)
+			waits["extension"] = readiness.waitForHAR(evaluateFunction(driver))
+		except readiness.NotReadyError as e:
+			print(str(e))
+		readiness.logWaitTimes(LOGDIR + "waittimes.log", url, SCENARIO, timestamp, waits)
+		timer.mark("har_wait")
+		try:
+			harfile_to_process = logHAR(driver, url, timestamp, timer)
 		except Exception as e:
 			print("Error logging HAR: " + str(sys.exc_info()[0]) + ", " + str(e))
+	segment_capture.announce("end", hostname + "+" + timestamp)
+	timer.log(LOGDIR, url, SCENARIO, timestamp)
+	return True
 
+"""
+Main code starts here!
+"""
+
+ARGV = sys.argv
+WORKER_MODE = False
+if len(ARGV) > 1 and ARGV[1] == "--worker":
+	WORKER_MODE = True
+	ARGV = ARGV[1:]
+
+try:
+	if (ARGV[1] == "--help"):
+		print("Usage:\n\t\twebtimings.py <URL_TO_FETCH> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY>\n\t\twebtimings.py --worker <URLFILE|-> <SCENARIO> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY> [<RESTART_AFTER>]")
+		sys.exit(0)
+	else:
+		URL_TO_FETCH = str(ARGV[1])
+except Exception as e:
+	URL_TO_FETCH = "http://www.debian.org"
+
+try:
+	SCENARIO = str(ARGV[2])
+except Exception as e:
+	SCENARIO = "unknown"
+
+try:
+	if re.search('mobile', SCENARIO):
+		USERAGENT = "Mozilla/5.0 (Linux; Android 4.2.2; SOL22 Build/10.3.1.D.0.220) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/38.0.2125.102 Mobile Safari/537.36"
+		print("Setting user agent to mobile.")
+	else:
+		USERAGENT = ""
+except:
+	USERAGENT = ""
+
+
+try:
+	TIMES = int(ARGV[3])
+except:
+	TIMES = 1
+
+try:
+	LOGDIR = str(ARGV[4])
+except:
+	LOGDIR = "./log/"
+
+try:
+	RESTART_AFTER = int(ARGV[5])
+except:
+	RESTART_AFTER = worker.RESTART_AFTER
+
+
+createDirectory(LOGDIR)
+
+if __name__ == "__main__":
+
+	if WORKER_MODE:
+		# In worker mode, every page load is logged as "Run 1/1", just as if fetchurl.sh had called us once per URL,
+		# so get_starttimestamp_from_workload_output.sh finds all of them
+		(urls, onResult) = worker.urlSource(URL_TO_FETCH, TIMES, SCENARIO)
+		worker.runWorker(urls, startBrowser, loadPage, resetBrowser, stopBrowser, restartAfter=RESTART_AFTER, onResult=onResult, logdir=LOGDIR)
+		sys.exit(0)
+
+	browser = startBrowser()
+
+	for run in range(1, TIMES+1):
+		if not loadPage(browser, URL_TO_FETCH, run, TIMES):
+			# Stop the browser anyway, so it does not keep running and its profile gets deleted
+			stopBrowser(browser)
+			sys.exit(-1)
 
 	print("\nFetched " + URL_TO_FETCH + " " + str(TIMES) + " times, logged to " + LOGDIR)
-	driver.close()
+	browser["driver"].close()
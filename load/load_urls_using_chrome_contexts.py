@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+"""
+Use one Chrome to load a list of URLs, each in its own browser context
+
+Instead of starting a new Chrome for every page load, every page load gets a
+fresh browser context (Target.createBrowserContext), which has its own cache,
+cookies, and storage, and is disposed of afterwards. Several contexts load
+pages at the same time, up to a configurable limit.
+
+Exports Navigation Timings, Resource Timings, and a HAR file built from the DevTools
+Network events (see cdphar.py) to the same files as load_url_using_chrome.py.
+Every page load is also logged to contexts.log: URL, scenario, timestamp,
+browser context ID, target ID, how many page loads were running when it
+started, and how long it took (in ms), to check for interference between
+concurrent page loads.
+
+Arguments:
+[1] File with URLs to fetch, one per line, "-" to read them from stdin,
+    or "queue:<DBFILE>[:<SCENARIO>]" to take them from a job queue (see jobqueue.py)
+[2] Scenario (for logging)
+[3] How many times to fetch the list of URLs
+[4] Log directory for Navigation Timings, Resource Timings, and HAR files
+[5] How many page loads to run at the same time (default: 4)
+
+Environment:
+    HEADLESS  Set to 1 to run Chrome without a display (default: 0)
+    NO_HAR    Set to 1 to log a .obj.log file instead of building a HAR file (default: 0)
+
+Dependencies:
+    Chrome
+    websockets (see cdpclient.py)
+
+"""
+
+import asyncio
+import datetime
+import time
+import os
+import sys
+import errno
+import shutil
+import signal
+import subprocess
+import worker
+import collect_timings
+import readiness
+import profiles
+import cdpclient
+import cdphar
+import phases
+import segment_capture
+
+
+TIMEOUT = 60
+
+CONCURRENCY = 4
+
+# Set this to run several instances of this script at the same time, see orchestrate.py
+# (and PROFILE_DIR, see profiles.py)
+DEVTOOLS_PORT = int(os.environ.get("DEVTOOLS_PORT", 9222))
+
+# Run Chrome without a display -- the HAR file is built from DevTools events anyway
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+
+# Chrome has no timeToDOMContentFlushed, but logs first-contentful-paint after it
+PAINT_FIELDS = [ "first-paint", None, "first-contentful-paint" ]
+
+def createDirectory(path):
+	try:
+		os.makedirs(path)
+	except OSError as exception:
+		if exception.errno != errno.EEXIST:
+			raise
+
+
+# Chrome profile with our preferences, try to suppress "Welcome" messages and other nonsense
+def buildProfile(profiledir):
+	createDirectory(profiledir + "/Default")
+	open(profiledir + "/First Run", 'a').close()
+	shutil.copy("chrome_prefs.json", profiledir + "/Default/Preferences")
+
+def startBrowser():
+	(profiledir, profilesetup) = profiles.newProfile("chrome", [ "chrome_prefs.json" ], buildProfile)
+
+	p = subprocess.Popen(["google-chrome --user-data-dir=" + profiledir + " --remote-debugging-port=" + str(DEVTOOLS_PORT) + " --disable-background-networking --disable-component-extensions-with-background-pages --dns-prefetch-disable" + (" --headless" if HEADLESS else "")], shell=True, preexec_fn=os.setsid)
+	print("Opened chrome! " + str(p.pid))
+	readiness.waitForDevTools(DEVTOOLS_PORT)
+
+	return { "process": p, "profiledir": profiledir }
+
+def stopBrowser(browser):
+	os.killpg(os.getpgid(browser["process"].pid), signal.SIGTERM)
+	browser["process"].wait()
+	profiles.removeProfile(browser["profiledir"])
+
+
+class ContextLoader:
+	"""Loads pages in fresh browser contexts of one Chrome, at most $concurrency at the same time"""
+
+	def __init__(self, concurrency, onResult=None):
+		self.onResult = onResult
+		self.postprocess = None
+		self.semaphore = asyncio.Semaphore(concurrency)
+		self.browser = None
+		self.connection = None
+		self.running = 0
+		self.loads = 0
+		self.successful = 0
+		# Phases of starting the browser, logged with the next page load
+		self.phases = None
+
+	async def start(self):
+		timer = phases.PhaseTimer()
+		loop = asyncio.get_event_loop()
+		self.browser = await loop.run_in_executor(None, worker.startBrowserWithRetries, startBrowser)
+		if self.browser is None:
+			raise cdpclient.CDPError("Could not start browser")
+		timer.mark("launch")
+		self.connection = await cdpclient.connect(await cdpclient.browserWebSocketUrl(DEVTOOLS_PORT))
+		timer.mark("connect")
+		self.phases = timer
+
+	async def stop(self):
+		if self.connection is not None:
+			try:
+				await self.connection.send("Browser.close")
+			except cdpclient.CDPError:
+				pass
+			await self.connection.close()
+		if self.browser is not None:
+			await asyncio.get_event_loop().run_in_executor(None, worker.stopBrowserQuietly, stopBrowser, self.browser)
+
+	# Run a script in the page, return its value
+	async def evaluate(self, session, script):
+		result = await session.send("Runtime.evaluate", expression=script, returnByValue=True)
+		return result["result"].get("value")
+
+	# Wait until loadEventEnd is set, then until the page has settled according to readiness.SETTLE
+	async def settle(self, session, events):
+		start = time.time()
+		deadline = start + readiness.SETTLE_TIMEOUT
+		try:
+			while not await self.evaluate(session, readiness.LOAD_EVENT_END_SCRIPT) and time.time() < deadline:
+				await asyncio.sleep(readiness.POLL_INTERVAL)
+
+			if readiness.SETTLE == "networkidle":
+				# Count requests in flight from the events seen so far
+				inflight = set()
+				lastbusy = time.time()
+				seen = 0
+				while (inflight or time.time() - lastbusy < readiness.SETTLE_QUIET_PERIOD) and time.time() < deadline:
+					messages = list(events.queue)
+					for m in messages[seen:]:
+						if m["method"] == "Network.requestWillBeSent":
+							inflight.add(m["params"]["requestId"])
+						elif m["method"] in [ "Network.loadingFinished", "Network.loadingFailed" ]:
+							inflight.discard(m["params"]["requestId"])
+					seen = len(messages)
+					if inflight:
+						lastbusy = time.time()
+					await asyncio.sleep(readiness.POLL_INTERVAL)
+			elif readiness.SETTLE == "quiet":
+				count = await self.evaluate(session, readiness.RESOURCE_COUNT_SCRIPT)
+				lastchange = time.time()
+				while time.time() - lastchange < readiness.SETTLE_QUIET_PERIOD and time.time() < deadline:
+					await asyncio.sleep(readiness.POLL_INTERVAL)
+					newcount = await self.evaluate(session, readiness.RESOURCE_COUNT_SCRIPT)
+					if newcount != count:
+						count = newcount
+						lastchange = time.time()
+		except cdpclient.CDPError as e:
+			print("Could not wait for page to settle: " + str(e))
+		return time.time() - start
+
+	# Load one page in a new browser context and log its Navigation Timings, Resource Timings, and HAR file
+	# Returns False if the page load failed
+	async def loadPage(self, url):
+		timestamp = datetime.datetime.now().strftime("%Y-%m-%d+%H-%M-%S.%f")
+		unixtimestamp = int(time.time())
+		try:
+			hostname = url.split('/')[2]
+		except IndexError:
+			hostname = url
+			url = "http://" + hostname
+
+		contextId = None
+		targetId = None
+		session = None
+		events = None
+		concurrent = self.running
+		start = time.time()
+		waits = {}
+		timer = phases.PhaseTimer()
+		timer.prepend(self.phases)
+		self.phases = None
+		print("Run 1/1 - Fetching " + url + " at " + timestamp)
+		segment_capture.announce("start", hostname + "+" + timestamp)
+
+		try:
+			contextId = (await self.connection.send("Target.createBrowserContext"))["browserContextId"]
+			targetId = (await self.connection.send("Target.createTarget", { "url": "about:blank", "browserContextId": contextId }))["targetId"]
+			session = await self.connection.attach(targetId)
+
+			events = session.subscribe([ "Network.", "Page.domContentEventFired", "Page.loadEventFired" ])
+			# Collect timings with an observer in the page (see collect_timings.py)
+			await asyncio.gather(session.send("Network.enable"), session.send("Page.enable"), session.send("Page.addScriptToEvaluateOnNewDocument", source=collect_timings.OBSERVER_SCRIPT))
+			timer.mark("context")
+
+			loadevent = asyncio.ensure_future(session.waitFor("Page.loadEventFired", timeout=TIMEOUT))
+			result = await session.send("Page.navigate", url=url)
+			if "errorText" in result:
+				loadevent.cancel()
+				raise cdpclient.CDPError(result["errorText"])
+			if await loadevent is None:
+				print("No load event for " + url + " after " + str(TIMEOUT) + " s")
+			timer.mark("navigate")
+			waits["settle"] = await self.settle(session, events)
+			timer.mark("settle")
+
+			# Get all timings at once, then log them using the same code as the other loaders
+			(timings, drained) = collect_timings.parseDrainedTimings(await self.evaluate(session, collect_timings.DRAIN_SCRIPT))
+			timer.mark("timings")
+			success = True
+		except Exception as e:
+			print("Error fetching page " + url + ": " + str(e) + "\n")
+			timer.mark("failed")
+			success = False
+
+		if success:
+			createDirectory(LOGDIR + "res")
+			collect_timings.logResourceTimings(timings, LOGDIR + "res/" + hostname + "+" + timestamp + ".res.log", scenario=SCENARIO)
+			timer.mark("restimings")
+
+			if collect_timings.NO_HAR:
+				collect_timings.logObjectTimings(timings, LOGDIR + "res/" + hostname + "+" + timestamp + ".obj.log", scenario=SCENARIO)
+				timer.mark("objtimings")
+			else:
+				createDirectory(LOGDIR + "har")
+				if events.dropped > 0:
+					print("Dropped " + str(events.dropped) + " DevTools events, HAR file for " + url + " is incomplete")
+				harbuilder = cdphar.HARBuilder()
+				harbuilder.addMessages(events.drain())
+				HARtext = harbuilder.getHAR()
+				timer.mark("har_export")
+				collect_timings.writeHAR(LOGDIR + "har/" + hostname + "+" + timestamp, HARtext)
+				timer.mark("har_write")
+			readiness.logWaitTimes(LOGDIR + "waittimes.log", url, SCENARIO, timestamp, waits)
+			collect_timings.logObserverCounts(LOGDIR + "observer.log", url, SCENARIO, timestamp, drained)
+			# Log Navigation Timings last: Other page loads finish at the same time, and
+			# post-processing takes every page load in navtimings.log to be complete
+			collect_timings.logNavigationTimings(timings, url, timestamp, unixtimestamp, LOGDIR + "navtimings.log", SCENARIO, paintfields=PAINT_FIELDS)
+			timer.mark("navtimings")
+
+		duration = time.time() - start
+		try:
+			logfile = open(LOGDIR + "contexts.log", 'a')
+			logfile.write(",".join([ url, SCENARIO, timestamp, str(contextId), str(targetId), str(concurrent), str(round(duration * 1000, 1)) ]) + "\n")
+			logfile.close()
+		except Exception as err:
+			print("Error logging browser context: " + str(err))
+
+		# Throw the context away, with everything that is in its cache and storage
+		try:
+			if events is not None:
+				session.unsubscribe(events)
+			if targetId is not None:
+				await self.connection.send("Target.closeTarget", { "targetId": targetId })
+			if contextId is not None:
+				await self.connection.send("Target.disposeBrowserContext", { "browserContextId": contextId })
+		except cdpclient.CDPError as e:
+			print("Could not dispose of browser context " + str(contextId) + ": " + str(e))
+		timer.mark("dispose")
+		segment_capture.announce("end", hostname + "+" + timestamp)
+		timer.log(LOGDIR, url, SCENARIO, timestamp)
+		return success
+
+	async def run(self, url):
+		async with self.semaphore:
+			self.running += 1
+			print("Fetching " + url)
+			try:
+				success = await self.loadPage(url)
+			finally:
+				self.running -= 1
+			self.loads += 1
+			if success:
+				self.successful += 1
+			if self.onResult is not None:
+				self.onResult(url, success)
+			worker.notifyPostProcessing(self.postprocess)
+			print("Done fetching " + url + (" (success)" if success else " (failed)"))
+			print("")
+			sys.stdout.flush()
+
+	async def runAll(self, urls):
+		self.postprocess = worker.startPostProcessing(LOGDIR)
+		await self.start()
+		loop = asyncio.get_event_loop()
+		tasks = set()
+		try:
+			while True:
+				# Reading from stdin blocks, so do it outside the event loop
+				url = await loop.run_in_executor(None, next, urls, None)
+				if url is None:
+					break
+				# Do not read ahead more URLs than we can load
+				await self.semaphore.acquire()
+				self.semaphore.release()
+				if self.connection.closed:
+					print("Lost connection to browser, restarting it")
+					await self.stop()
+					await self.start()
+				task = asyncio.ensure_future(self.run(url))
+				tasks.add(task)
+				task.add_done_callback(tasks.discard)
+				# Let the task take its slot
+				await asyncio.sleep(0)
+			if tasks:
+				await asyncio.gather(*tasks)
+		finally:
+			await self.stop()
+			worker.stopPostProcessing(self.postprocess)
+		print("Done: " + str(self.successful) + "/" + str(self.loads) + " page loads successful")
+		return self.successful
+
+
+try:
+	if (sys.argv[1] == "--help"):
+		print("Usage:\n\t\tload_urls_using_chrome_contexts.py <URLFILE|-> <SCENARIO> <HOW_MANY_TIMES> <TIMINGS_LOG_DIRECTORY> [<CONCURRENCY>]")
+		sys.exit(0)
+	else:
+		URLFILE = str(sys.argv[1])
+except IndexError:
+	URLFILE = "-"
+
+try:
+	SCENARIO = str(sys.argv[2])
+except Exception as e:
+	SCENARIO = "unknown"
+
+try:
+	TIMES = int(sys.argv[3])
+except:
+	TIMES = 1
+
+try:
+	LOGDIR = str(sys.argv[4])
+except:
+	LOGDIR = "./log/"
+
+try:
+	CONCURRENCY = int(sys.argv[5])
+except:
+	pass
+
+
+createDirectory(LOGDIR)
+
+if __name__ == "__main__":
+	(urls, onResult) = worker.urlSource(URLFILE, TIMES, SCENARIO)
+	loader = ContextLoader(CONCURRENCY, onResult)
+	asyncio.get_event_loop().run_until_complete(loader.runAll(urls))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+#
+# Run several loader instances at the same time, which work through one shared URL list
+#
+# Every instance is a loader in worker mode (see worker.py) with its own Marionette or DevTools port,
+# its own browser profile directory, and optionally its own network namespace.
+# It writes its results to its own run directory <LOGPREFIX>-k<INSTANCE>/, which contains everything
+# that fetchurl.sh and run.sh would have written, so computetimings.py can process each of them as a run.
+#
+# Usage:
+#           ./orchestrate.py <URLFILE> [<TIMES>] [<SCENARIO>] [<LOGPREFIX>] [<INSTANCES>]
+#                   URLFILE:    Text file containing one or more URLs, one each line,
+#                               or "queue:<DBFILE>[:<SCENARIO>]" to take them from a job queue (see jobqueue.py)
+#                   TIMES:      How often to fetch each URL (default: 1, ignored for a job queue)
+#                   SCENARIO:   String describing the scenario (default: "test", or the scenario of the job queue)
+#                   LOGPREFIX:  Prefix of the run directories (default: log/run-<DATE>-<SCENARIO>_<URLFILE>)
+#                   INSTANCES:  How many loaders to run at the same time (default: number of CPUs / 2)
+#
+# Environment:
+#                   LOADER:         Which loader to use (default: ./load_url_using_marionette.py)
+#                   RESTART_AFTER:  Restart the browser after this many page loads (default: 100)
+#                   NETNS_PREFIX:   If set, run instance i in network namespace $NETNS_PREFIX<i> (needs to exist)
+#                   PROFILE_BASE:   Where to put the browser profiles of all instances (default: /dev/shm or /tmp, see profiles.py)
+
+import os
+import sys
+import shutil
+import datetime
+import time
+import subprocess
+import threading
+import queue
+import socket
+import profiles
+import jobqueue
+
+LOADER = os.environ.get("LOADER", "./load_url_using_marionette.py")
+
+RESTART_AFTER = os.environ.get("RESTART_AFTER", "100")
+
+NETNS_PREFIX = os.environ.get("NETNS_PREFIX", "")
+
+PROFILE_BASE = os.environ.get("PROFILE_BASE", profiles.PROFILE_DIR)
+
+# Ports of instance i are base port + i
+MARIONETTE_BASE_PORT = 2828
+DEVTOOLS_BASE_PORT = 9222
+
+# Restart an instance that died at most this many times
+MAX_RESTARTS = 3
+
+# Report loads per minute this often (in seconds)
+REPORT_INTERVAL = 60
+
+WORKLOAD_LOGFILE = "workload_output.log"
+
+
+def createDirectory(path):
+	try:
+		os.makedirs(path)
+	except OSError:
+		if not os.path.isdir(path):
+			raise
+
+# Put all page loads in one queue, one pass of the URL list after the other, like fetchurl.sh
+def readUrlQueue(urlfile, times):
+	with open(urlfile, 'r') as f:
+		urls = [ line.strip() for line in f if line.strip() ]
+
+	urlqueue = queue.Queue()
+	for i in range(0, times):
+		for url in urls:
+			urlqueue.put(url)
+	return urlqueue
+
+# Take the next URL from the shared queue, None if it is empty
+def nextUrl(urlqueue):
+	try:
+		return urlqueue.get_nowait()
+	except queue.Empty:
+		return None
+
+
+class Instance:
+	def __init__(self, index, logdir, scenario):
+		self.index = index
+		self.logdir = logdir
+		self.scenario = scenario
+		self.profiledir = PROFILE_BASE + "/instance" + str(index)
+		self.process = None
+		self.logfile = None
+		self.restarts = 0
+		self.loads = 0
+		self.successful = 0
+
+	def start(self):
+		createDirectory(self.profiledir)
+
+		env = dict(os.environ)
+		env["MARIONETTE_PORT"] = str(MARIONETTE_BASE_PORT + self.index)
+		env["DEVTOOLS_PORT"] = str(DEVTOOLS_BASE_PORT + self.index)
+		env["PROFILE_DIR"] = self.profiledir
+		# All instances share the same profile templates
+		env["PROFILE_TEMPLATE_DIR"] = PROFILE_BASE + "/profile-templates"
+		env["TMPDIR"] = self.profiledir
+		env["PYTHONUNBUFFERED"] = "1"
+
+		command = [ LOADER, "--worker", "-", self.scenario, "1", self.logdir, RESTART_AFTER ]
+		if NETNS_PREFIX:
+			command = [ "ip", "netns", "exec", NETNS_PREFIX + str(self.index) ] + command
+
+		print("Instance " + str(self.index) + ": calling " + " ".join(command))
+		if self.logfile is None:
+			self.logfile = open(self.logdir + WORKLOAD_LOGFILE, 'a')
+		self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env, universal_newlines=True, bufsize=1)
+
+	# Hand one URL to the loader and log its output until it is done with it
+	# Returns True if the page load succeeded, False if it failed, None if the loader died
+	def load(self, url):
+		try:
+			self.process.stdin.write(url + "\n")
+			self.process.stdin.flush()
+		except (IOError, OSError) as e:
+			print("Instance " + str(self.index) + ": could not pass " + url + " to loader: " + str(e))
+			return None
+
+		for line in iter(self.process.stdout.readline, ""):
+			self.logfile.write(line)
+			if line.startswith("Done fetching "):
+				self.logfile.flush()
+				return line.rstrip().endswith("(success)")
+		return None
+
+	def stop(self):
+		try:
+			self.process.stdin.close()
+		except (IOError, OSError):
+			pass
+		# Log whatever the loader prints while shutting down
+		for line in iter(self.process.stdout.readline, ""):
+			self.logfile.write(line)
+		self.process.wait()
+		self.logfile.close()
+		shutil.rmtree(self.profiledir, ignore_errors=True)
+
+	# Take URLs until there are no more: nextUrl() returns the next one or None,
+	# onResult(url, success) is called after each page load (optional)
+	def run(self, nextUrl, onResult=None):
+		self.start()
+		while True:
+			url = nextUrl()
+			if url is None:
+				break
+
+			result = self.load(url)
+			self.loads += 1
+			if onResult is not None:
+				onResult(url, result is True)
+			if result:
+				self.successful += 1
+			elif result is None:
+				self.process.wait()
+				print("Instance " + str(self.index) + ": loader exited with status " + str(self.process.returncode) + " while fetching " + url)
+				if self.restarts >= MAX_RESTARTS:
+					print("Instance " + str(self.index) + ": giving up after " + str(self.restarts) + " restarts")
+					break
+				self.restarts += 1
+				self.start()
+		self.stop()
+
+
+def reportRate(instances, starttime, label="Progress"):
+	loads = sum([ i.loads for i in instances ])
+	successful = sum([ i.successful for i in instances ])
+	minutes = (time.time() - starttime) / 60.0
+	rate = loads / minutes if minutes > 0 else 0
+	print(label + ": " + str(loads) + " page loads (" + str(successful) + " successful) in " + str(round(minutes, 2)) + " minutes, " + str(round(rate, 2)) + " loads per minute")
+	sys.stdout.flush()
+
+
+def main(argv=[]):
+	if len(argv) < 2 or argv[1] == "--help":
+		print("Usage: " + argv[0] + " <URLFILE> [<TIMES>] [<SCENARIO>] [<LOGPREFIX>] [<INSTANCES>]")
+		return 1
+	urlfile = argv[1]
+	usequeue = urlfile.startswith(jobqueue.PREFIX)
+	urlname = jobqueue.parseSpec(urlfile)[0] if usequeue else urlfile
+
+	try:
+		times = int(argv[2])
+	except:
+		times = 1
+
+	try:
+		scenario = str(argv[3])
+	except:
+		scenario = "test"
+
+	if usequeue:
+		# The instances log their page loads under scenario, so only take the jobs of this scenario
+		(dbfile, queuescenario) = jobqueue.parseSpec(urlfile)
+		if queuescenario is not None and queuescenario != scenario:
+			print("Using scenario " + queuescenario + " of the job queue instead of " + scenario)
+			scenario = queuescenario
+		urlfile = jobqueue.PREFIX + dbfile + ":" + scenario
+
+	try:
+		logprefix = str(argv[4])
+	except:
+		logprefix = "log/run-" + datetime.datetime.now().strftime("%Y-%m-%dT%H:%M") + "-" + scenario + "_" + os.path.basename(urlname)
+
+	try:
+		numinstances = int(argv[5])
+	except:
+		numinstances = max(1, (os.cpu_count() or 2) // 2)
+
+	if usequeue:
+		db = jobqueue.openQueue(dbfile)
+		urls = jobqueue.getUrls(db, scenario)
+		print("Fetching " + str(jobqueue.countJobs(db, "pending", scenario)) + " pending jobs from " + dbfile + " using " + str(numinstances) + " instances of " + LOADER)
+		db.close()
+	else:
+		urlqueue = readUrlQueue(urlfile, times)
+		print("Fetching " + str(urlqueue.qsize()) + " URLs using " + str(numinstances) + " instances of " + LOADER)
+
+	instances = []
+	sources = []
+	for index in range(0, numinstances):
+		logdir = logprefix.rstrip("/") + "-k" + str(index) + "/"
+		createDirectory(logdir)
+		if usequeue:
+			# Each instance leases its own jobs, so a job of an instance that dies is picked up again
+			with open(logdir + "urlfile-" + os.path.basename(urlname) + ".log", 'w') as f:
+				f.write("".join([ url + "\n" for url in urls ]))
+			jobs = jobqueue.JobSource.fromSpec(urlfile, worker=socket.gethostname() + ":" + str(os.getpid()) + ":k" + str(index))
+			sources.append((jobs.next, jobs.done))
+		else:
+			shutil.copy(urlfile, logdir + "urlfile-" + os.path.basename(urlfile) + ".log")
+			sources.append((lambda: nextUrl(urlqueue), None))
+		instances.append(Instance(index, logdir, scenario))
+
+	starttime = time.time()
+	threads = [ threading.Thread(target=instance.run, args=source) for (instance, source) in zip(instances, sources) ]
+	for thread in threads:
+		thread.start()
+
+	lastreport = starttime
+	while any([ thread.is_alive() for thread in threads ]):
+		time.sleep(1)
+		if time.time() - lastreport >= REPORT_INTERVAL:
+			reportRate(instances, starttime)
+			lastreport = time.time()
+
+	for instance in instances:
+		print("Instance " + str(instance.index) + ": " + str(instance.successful) + "/" + str(instance.loads) + " page loads successful, logged to " + instance.logdir)
+	reportRate(instances, starttime, label="Done")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
@@ -0,0 +1,70 @@
+"""
+Per-phase timing of the loaders
+
+Every loader splits its work into phases (profile setup, browser launch,
+navigation, reading timings, exporting and writing the HAR file, ...) and
+marks the end of each phase on a PhaseTimer. Phases of starting or resetting
+a browser are logged together with the first page load after it.
+
+The durations are logged per page load to loader_phases.log in the log
+directory, one line per phase:
+
+    loader,url,scenario,timestamp,phase,duration in ms
+
+Durations come from a monotonic clock. On Python 2 (e.g., the Marionette
+loader), that is the monotonic backport if it is installed, otherwise
+os.times(), whose durations are only accurate to a clock tick (usually 10 ms).
+
+compute/phasesummary.py summarizes them across a run.
+
+"""
+
+import os
+import sys
+import time
+
+# A clock that does not jump when the system time is set (e.g., by NTP)
+try:
+	clock = time.monotonic
+except AttributeError:
+	# Python 2 has no monotonic clock: use the backport if it is installed (pip install monotonic),
+	# otherwise the elapsed real time of os.times(), which is monotonic but only counts clock ticks (usually 10 ms)
+	try:
+		from monotonic import monotonic as clock
+	except ImportError:
+		def clock():
+			return os.times()[4]
+
+
+LOGFILE = "loader_phases.log"
+
+LOADER = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "unknown"
+
+
+class PhaseTimer:
+	def __init__(self):
+		self.phases = []
+		self.last = clock()
+
+	# End the current phase: It took everything since the last mark
+	def mark(self, phase):
+		now = clock()
+		self.phases.append((phase, now - self.last))
+		self.last = now
+
+	# Start over from now, so the time since the last mark does not count towards any phase
+	def resume(self):
+		self.last = clock()
+
+	# Phases of another timer, e.g., of starting the browser, go first
+	def prepend(self, other):
+		if other is not None:
+			self.phases = other.phases + self.phases
+
+	def log(self, logdir, url, scenario, formattedtimestamp, logfilename=LOGFILE):
+		try:
+			logfile = open(logdir + logfilename, 'a')
+			logfile.write("".join([ ",".join([ LOADER, str(url), str(scenario), str(formattedtimestamp), phase, str(round(duration * 1000, 3)) ]) + "\n" for (phase, duration) in self.phases ]))
+			logfile.close()
+		except Exception as err:
+			print("Error logging loader phases to " + str(logdir + logfilename) + ": " + str(err))
@@ -0,0 +1,123 @@
+"""
+Browser profile templates shared by the loaders
+
+Building a profile (copying prefs, installing the extension) is done only once
+per browser, into a template directory. Every browser start gets a clone of the
+template, which is deleted again when the browser stops. Clones live on tmpfs
+(/dev/shm) if available. They are copied using reflinks where the filesystem
+supports them. Files that the browser never changes (the extension XPIs) are
+hardlinked.
+
+A template is rebuilt whenever one of the files it was built from changes.
+
+Environment:
+    PROFILE_DIR           Where to put the profiles (default: /dev/shm, or /tmp if it does not exist)
+    PROFILE_TEMPLATE_DIR  Where to keep the templates (default: $PROFILE_DIR/profile-templates)
+    PROFILE_TEMPLATES     Set to 0 to build every profile from scratch instead, e.g., to compare setup times
+
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import time
+import zipfile
+
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp")
+
+TEMPLATE_DIR = os.environ.get("PROFILE_TEMPLATE_DIR", PROFILE_DIR + "/profile-templates")
+
+USE_TEMPLATES = (os.environ.get("PROFILE_TEMPLATES", "1") != "0")
+
+# Files with these endings are never modified by the browser, so clones can share them
+IMMUTABLE_ENDINGS = [ ".xpi" ]
+
+
+def createDirectory(path):
+	try:
+		os.makedirs(path)
+	except OSError:
+		if not os.path.isdir(path):
+			raise
+
+# Short hash of the contents of all files a template is built from
+def hashFiles(filenames):
+	h = hashlib.sha1()
+	for filename in filenames:
+		with open(filename, 'rb') as f:
+			h.update(f.read())
+	return h.hexdigest()[:12]
+
+# Get the template directory for this browser, build it using build(directory) if it does not exist yet
+def getTemplate(name, sources, build):
+	template = TEMPLATE_DIR + "/" + name + "-" + hashFiles(sources)
+	if os.path.isdir(template):
+		return template
+
+	# Build it next to where it will be, then move it there in one step,
+	# so several loaders running at the same time never see a half-built template
+	createDirectory(TEMPLATE_DIR)
+	builddir = tempfile.mkdtemp(prefix=name + "-build-", dir=TEMPLATE_DIR)
+	build(builddir)
+	try:
+		os.rename(builddir, template)
+		print("Built profile template " + template)
+	except OSError:
+		# Somebody else was faster
+		shutil.rmtree(builddir, ignore_errors=True)
+	return template
+
+# Copy template to a new directory (reflinks where possible), hardlink immutable files
+def cloneProfile(template, prefix="foo"):
+	profiledir = tempfile.mkdtemp(prefix=prefix, dir=PROFILE_DIR)
+	subprocess.check_call([ "cp", "-a", "--reflink=auto", template + "/.", profiledir ])
+
+	for (dirpath, dirnames, filenames) in os.walk(template):
+		for filename in filenames:
+			if any([ filename.endswith(ending) for ending in IMMUTABLE_ENDINGS ]):
+				source = os.path.join(dirpath, filename)
+				clone = os.path.join(profiledir, os.path.relpath(source, template))
+				try:
+					os.link(source, clone + ".link")
+					os.rename(clone + ".link", clone)
+				except OSError:
+					# Different filesystems -- keep the copy
+					pass
+	return profiledir
+
+# Set up a new profile for one browser start
+# Returns the profile directory and how long it took in seconds
+def newProfile(name, sources, build, prefix="foo"):
+	start = time.time()
+	createDirectory(PROFILE_DIR)
+	if USE_TEMPLATES:
+		profiledir = cloneProfile(getTemplate(name, sources, build), prefix)
+	else:
+		profiledir = tempfile.mkdtemp(prefix=prefix, dir=PROFILE_DIR)
+		build(profiledir)
+	setuptime = time.time() - start
+	print("Set up profile " + profiledir + " in " + str(round(setuptime * 1000, 1)) + " ms")
+	return (profiledir, setuptime)
+
+def removeProfile(profiledir):
+	shutil.rmtree(profiledir, ignore_errors=True)
+
+
+# Put an extension into the extensions directory of a Firefox profile, so it is installed on startup
+# (needs extensions.autoDisableScopes 0, see firefox_prefs.js)
+# Returns the ID of the extension, or None if it could not be installed
+def installFirefoxExtension(profiledir, xpi):
+	try:
+		with zipfile.ZipFile(xpi) as z:
+			manifest = json.loads(z.read("manifest.json").decode("utf-8"))
+		addonid = manifest["applications"]["gecko"]["id"]
+	except Exception as e:
+		print("Could not read extension ID from " + xpi + ": " + str(e))
+		return None
+	createDirectory(profiledir + "/extensions")
+	shutil.copy(xpi, profiledir + "/extensions/" + addonid + ".xpi")
+	return addonid
@@ -0,0 +1,162 @@
+"""
+Readiness probes shared by the loaders
+
+Instead of sleeping for a fixed time, the loaders poll until the browser (or
+the page) is actually ready: Until the Marionette or DevTools port accepts
+connections, until the HAR export extension is available in the page, until
+the browser has written a file, and, after the load event, until the page has
+settled according to SETTLE.
+
+All wait functions return the time spent waiting in seconds, which the loaders
+log per page load to waittimes.log, together with the time it took to set up
+the browser profile (see profiles.py).
+
+Environment:
+    SETTLE               What to wait for after the load event (default: none)
+                             none:        only until loadEventEnd is set
+                             quiet:       until no new Resource Timing entry appeared for SETTLE_QUIET_PERIOD
+                             networkidle: until no request was in flight for SETTLE_QUIET_PERIOD
+                                          (needs network events, so only Chrome -- Firefox falls back to quiet)
+    SETTLE_QUIET_PERIOD  in seconds (default: 0.5)
+    SETTLE_TIMEOUT       Give up settling after this many seconds (default: 10)
+
+"""
+
+import os
+import socket
+import time
+
+try:
+	from urllib.request import urlopen
+except ImportError:
+	from urllib2 import urlopen
+
+
+SETTLE = os.environ.get("SETTLE", "none")
+SETTLE_QUIET_PERIOD = float(os.environ.get("SETTLE_QUIET_PERIOD", 0.5))
+SETTLE_TIMEOUT = float(os.environ.get("SETTLE_TIMEOUT", 10))
+
+# How long to wait for the browser to come up
+STARTUP_TIMEOUT = 60
+
+# How long to wait for the browser to write a file, e.g., a HAR file (see collect_timings.downloadHAR)
+DOWNLOAD_TIMEOUT = 60
+
+# How often to probe
+POLL_INTERVAL = 0.05
+
+# Is the HAR export extension available in the page?
+HAR_READY_SCRIPT = "typeof HAR !== 'undefined' && typeof HAR.triggerExport === 'function'"
+
+# HAR.triggerExport() only works while the developer toolbox is open. With -devtools, Firefox opens it
+# for every window, but not when running headless -- then the loaders open it from chrome context instead.
+# Async script, resolves to true once the toolbox is open, or to the error
+FIREFOX_TOOLBOX_SCRIPT = """(function(resolve) {
+	var { require } = ChromeUtils.import("resource://devtools/shared/Loader.jsm", {});
+	var { gDevTools } = require("devtools/client/framework/devtools");
+	var { TargetFactory } = require("devtools/client/framework/target");
+	var browserWindow = Services.wm.getMostRecentWindow("navigator:browser");
+	var target = TargetFactory.forTab(browserWindow.gBrowser.selectedTab);
+	gDevTools.showToolbox(target, "netmonitor").then(() => resolve(true), (err) => resolve(String(err)));
+})(arguments[arguments.length - 1]);"""
+
+LOAD_EVENT_END_SCRIPT = "window.performance.timing.loadEventEnd > 0"
+
+RESOURCE_COUNT_SCRIPT = "window.performance.getEntriesByType('resource').length"
+
+# Order of the wait times in waittimes.log
+WAIT_FIELDS = [ "startup", "extension", "settle", "profile" ]
+
+
+class NotReadyError(Exception):
+	pass
+
+
+# Call probe() until it returns something true, return the time waited
+# Exceptions raised by probe() count as "not ready yet"
+def waitFor(probe, timeout, what="condition", interval=POLL_INTERVAL):
+	start = time.time()
+	while True:
+		try:
+			if probe():
+				return time.time() - start
+		except Exception:
+			pass
+		if time.time() - start > timeout:
+			raise NotReadyError("Timed out after " + str(timeout) + " s waiting for " + what)
+		time.sleep(interval)
+
+def portOpen(port, host="localhost"):
+	try:
+		sock = socket.create_connection((host, port), timeout=1)
+	except (socket.error, socket.timeout):
+		return False
+	sock.close()
+	return True
+
+# Wait until Marionette (or anything else) accepts connections on this port
+def waitForPort(port, host="localhost", timeout=STARTUP_TIMEOUT):
+	return waitFor(lambda: portOpen(port, host), timeout, what="port " + str(port))
+
+# Wait until the DevTools HTTP endpoint lists at least one tab to connect to
+def waitForDevTools(port, host="localhost", timeout=STARTUP_TIMEOUT):
+	def probe():
+		response = urlopen("http://" + host + ":" + str(port) + "/json", timeout=1)
+		return b'webSocketDebuggerUrl' in response.read()
+	return waitFor(probe, timeout, what="DevTools on port " + str(port))
+
+# Wait until the HAR export extension has been injected into the page
+def waitForHAR(evaluate, timeout=STARTUP_TIMEOUT):
+	return waitFor(lambda: evaluate(HAR_READY_SCRIPT), timeout, what="HAR export extension")
+
+# Wait until the browser has completely written a file of this size (Firefox writes downloads to a .part file first)
+def waitForFile(filename, size, timeout=DOWNLOAD_TIMEOUT):
+	return waitFor(lambda: os.path.getsize(filename) == size and not os.path.exists(filename + ".part"), timeout, what=filename)
+
+
+# Wait until the page has settled after the load event, according to mode (see SETTLE above)
+#
+# waitNetworkIdle(quietperiod, timeout): Optional, waits until no request is in flight, returns True if it got there
+def settle(evaluate, mode=SETTLE, waitNetworkIdle=None, quietperiod=SETTLE_QUIET_PERIOD, timeout=SETTLE_TIMEOUT):
+	start = time.time()
+	try:
+		if mode == "networkidle" and waitNetworkIdle is not None:
+			# Do this first, as running scripts in the page may consume network events
+			if not waitNetworkIdle(quietperiod, timeout):
+				print("Network did not become idle within " + str(timeout) + " s")
+
+		waitFor(lambda: evaluate(LOAD_EVENT_END_SCRIPT), timeout - (time.time() - start), what="loadEventEnd")
+
+		if mode == "quiet" or (mode == "networkidle" and waitNetworkIdle is None):
+			waitQuiet(evaluate, quietperiod, timeout - (time.time() - start))
+	except Exception as e:
+		print("Could not wait for page to settle: " + str(e))
+	return time.time() - start
+
+# Wait until no new Resource Timing entry appeared for quietperiod seconds
+def waitQuiet(evaluate, quietperiod, timeout):
+	start = time.time()
+	count = evaluate(RESOURCE_COUNT_SCRIPT)
+	lastchange = start
+	while time.time() - lastchange < quietperiod:
+		if time.time() - start > timeout:
+			print("Page did not become quiet within " + str(timeout) + " s")
+			return False
+		time.sleep(POLL_INTERVAL)
+		newcount = evaluate(RESOURCE_COUNT_SCRIPT)
+		if newcount != count:
+			count = newcount
+			lastchange = time.time()
+	return True
+
+
+# Log how long we waited for one page load, in ms, one line per page load
+# waits: dict with WAIT_FIELDS as keys, missing ones are logged as "NA"
+def logWaitTimes(logfilename, url, scenario, formattedtimestamp, waits):
+	values = [ (str(round(waits[field] * 1000, 1)) if waits.get(field) is not None else "NA") for field in WAIT_FIELDS ]
+	try:
+		logfile = open(logfilename, 'a')
+		logfile.write(",".join([ str(url), str(scenario), str(formattedtimestamp), SETTLE ] + values) + "\n")
+		logfile.close()
+	except Exception as err:
+		print("Error logging wait times to " + str(logfilename) + ": " + str(err))
@@ -50,16 +50,36 @@ fi
 DATERUN=$(date +%Y-%m-%dT%H:%M)
 
 echo "urlfile: $urlfile"
-cp "$urlfile" "urlfile-${urlfile}.log"
-
-scenarioname="${SCENARIO}_${urlfile}"
+if [[ "$urlfile" == queue:* ]]
+then
+	# Job queue (see jobqueue.py): its jobs are leased and logged under their own scenario, i.e., the one in
+	# "queue:$DBFILE:$SCENARIO" or else $SCENARIO, without the URL file name that is appended otherwise
+	queuefile="${urlfile#queue:}"
+	queuescenario="$SCENARIO"
+	if [[ "$queuefile" == *:* ]]
+	then
+		queuescenario="${queuefile#*:}"
+		queuefile="${queuefile%%:*}"
+	fi
+	urlname=$(basename "$queuefile")
+	scenarioname="$queuescenario"
+	runname="${scenarioname}_${urlname}"
+	urlfile="queue:${queuefile}:${scenarioname}"
+	# Log the URLs of this scenario (the loaders only take these) like a URL file
+	./jobqueue.py urls "$queuefile" "$scenarioname" > "urlfile-${urlname}.log"
+else
+	urlname="$urlfile"
+	cp "$urlfile" "urlfile-${urlfile}.log"
+	scenarioname="${SCENARIO}_${urlname}"
+	runname="$scenarioname"
+fi
 
 echo ""
 echo "Set up $scenarioname"
 echo ""
 echo ""
 
-LOGPREFIX="../testdata/run-$DATERUN-$scenarioname"
+LOGPREFIX="../testdata/run-$DATERUN-$runname"
 mkdir -p "data"
 mkdir -p $LOGPREFIX
 
@@ -71,6 +91,6 @@ source "$WORKLOADSCRIPT" "$urlfile" "$TIMES" "$scenarioname" "$LOGPREFIX" 2>&1 >
 echo "Done with workload, exiting"
 
 # Delete temporary browser profiles
-rm -rf /tmp/foo*
+rm -rf /tmp/foo* /dev/shm/foo*
 
 mv *.log "$LOGPREFIX/"
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Packet capture, segmented by page load
+
+Runs tcpdump and splits its packets into one pcap file per page load, as they
+arrive, so the analysis of a page load (see compute/validate_object_size.py
+and compute/computetimings.py) only has to read a small file instead of the
+capture of the whole run.
+
+The loaders announce the start and the end of every page load on a local
+control socket (see announce below). Every packet is written to the segments
+of all page loads that were running when it was captured, and for a few more
+seconds after a page load ended, to catch late packets of its connections.
+Packets outside of any page load go to between_page_loads.pcap.
+
+As the loader may announce a page load slightly after its first packets were
+captured, the packets of the last few seconds are kept in a ring buffer and
+also written to a segment when it starts.
+
+Segments are named after the page load, like the HAR files: <pagelabel>.pcap,
+i.e., <hostname>+<timestamp>.pcap.
+
+If nothing listens on the control socket, the loaders do not announce anything.
+
+Usage:
+    ./segment_capture.py <DIRECTORY> [<INTERFACE>] [<FILTER>]
+
+Environment:
+    CAPTURE_CONTROL  Control socket (default: /tmp/segment_capture.sock)
+    CAPTURE_SNAPLEN  Bytes to capture per packet (default: 0, whole packets)
+    CAPTURE_FILTER   BPF filter, if not given on the command line (default: port 80 or port 53 or port 443)
+    CAPTURE_LINGER   Seconds to keep writing to a segment after its page load ended,
+                     and to keep packets in the ring buffer (default: 2)
+    CAPTURE_FULL     Also write the whole capture to local:<INTERFACE>.pcap, as without
+                     segmentation (default: 1)
+
+"""
+
+import os
+import sys
+import time
+import errno
+import struct
+import socket
+import threading
+import subprocess
+import collections
+
+CONTROL_SOCKET = os.environ.get("CAPTURE_CONTROL", "/tmp/segment_capture.sock")
+
+SNAPLEN = int(os.environ.get("CAPTURE_SNAPLEN", 0))
+
+FILTER = os.environ.get("CAPTURE_FILTER", "port 80 or port 53 or port 443")
+
+LINGER = float(os.environ.get("CAPTURE_LINGER", 2))
+
+FULL_CAPTURE = os.environ.get("CAPTURE_FULL", "1") == "1"
+
+UNASSIGNED_FILENAME = "between_page_loads.pcap"
+
+# pcap file format: global header, then a header before every packet
+GLOBAL_HEADER_LENGTH = 24
+RECORD_HEADER_LENGTH = 16
+# Magic numbers of pcap files with microsecond and nanosecond timestamps
+MAGIC_MICROSECONDS = 0xa1b2c3d4
+MAGIC_NANOSECONDS = 0xa1b23c4d
+
+
+# Tell the capture that a page load starts or ends -- event is "start" or "end"
+# Returns False if no capture is listening
+def announce(event, pagelabel, controlsocket=CONTROL_SOCKET):
+	if not os.path.exists(controlsocket):
+		return False
+	try:
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+		sock.sendto((event + " " + "%.6f" % time.time() + " " + pagelabel).encode("utf-8"), controlsocket)
+		sock.close()
+	except socket.error as err:
+		print("Could not announce " + event + " of " + pagelabel + " to packet capture: " + str(err))
+		return False
+	return True
+
+
+# Read exactly length bytes from a stream, or less if it ended
+def readExactly(stream, length):
+	data = b""
+	while len(data) < length:
+		chunk = stream.read(length - len(data))
+		if not chunk:
+			break
+		data += chunk
+	return data
+
+
+class Segmenter:
+	def __init__(self, directory, globalheader, linger=LINGER):
+		self.directory = directory
+		self.globalheader = globalheader
+		self.linger = linger
+		# Check byte order and timestamp resolution of the capture
+		(magic,) = struct.unpack("<I", globalheader[:4])
+		if magic in [ MAGIC_MICROSECONDS, MAGIC_NANOSECONDS ]:
+			self.byteorder = "<"
+		else:
+			self.byteorder = ">"
+			(magic,) = struct.unpack(">I", globalheader[:4])
+		self.fractions = 1e9 if magic == MAGIC_NANOSECONDS else 1e6
+
+		# Announced events not applied yet, as (timestamp, event, pagelabel), from the control thread
+		self.events = []
+		self.lock = threading.Lock()
+		# Segments being written: pagelabel -> [file, time its page load ended or None]
+		self.segments = {}
+		# Recently captured packets as (timestamp, record)
+		self.ring = collections.deque()
+
+		self.unassigned = self.openFile(UNASSIGNED_FILENAME)
+		self.full = None
+		self.packets = 0
+		self.segmentcount = 0
+
+	def openFile(self, filename):
+		f = open(os.path.join(self.directory, filename), 'wb')
+		f.write(self.globalheader)
+		return f
+
+	def addEvent(self, timestamp, event, pagelabel):
+		with self.lock:
+			self.events.append((timestamp, event, pagelabel))
+
+	# Apply all events up to this time
+	def applyEvents(self, now):
+		with self.lock:
+			self.events.sort()
+			due = [ e for e in self.events if e[0] <= now ]
+			self.events = self.events[len(due):]
+		for (timestamp, event, pagelabel) in due:
+			if event == "start" and pagelabel not in self.segments:
+				f = self.openFile(pagelabel + ".pcap")
+				self.segmentcount += 1
+				# Packets captured before the start was announced
+				for (packettime, record) in self.ring:
+					if packettime >= timestamp:
+						f.write(record)
+				self.segments[pagelabel] = [f, None]
+			elif event == "end" and pagelabel in self.segments:
+				self.segments[pagelabel][1] = timestamp
+
+	def closeSegments(self, now):
+		for pagelabel in [ label for (label, (f, endtime)) in self.segments.items() if endtime is not None and endtime + self.linger < now ]:
+			self.segments.pop(pagelabel)[0].close()
+
+	def write(self, record):
+		(seconds, fraction) = struct.unpack(self.byteorder + "II", record[:8])
+		packettime = seconds + fraction / self.fractions
+		self.packets += 1
+
+		self.applyEvents(packettime)
+		self.closeSegments(packettime)
+		if self.full is not None:
+			self.full.write(record)
+		if self.segments:
+			for (f, endtime) in self.segments.values():
+				f.write(record)
+		else:
+			self.unassigned.write(record)
+
+		self.ring.append((packettime, record))
+		while self.ring and self.ring[0][0] < packettime - self.linger:
+			self.ring.popleft()
+
+	def close(self):
+		# Segments that are still open (or were announced but got no packets) are complete now
+		self.applyEvents(float("inf"))
+		for (f, endtime) in self.segments.values():
+			f.close()
+		self.segments = {}
+		self.unassigned.close()
+		if self.full is not None:
+			self.full.close()
+
+
+# Receive announcements of the loaders, until the socket is closed
+def listen(sock, segmenter):
+	while True:
+		try:
+			message = sock.recv(4096)
+		except socket.error:
+			return
+		if not message:
+			return
+		try:
+			(event, timestamp, pagelabel) = message.decode("utf-8").split(" ", 2)
+			segmenter.addEvent(float(timestamp), event, pagelabel)
+		except ValueError:
+			print("Ignoring invalid announcement: " + repr(message))
+
+
+def main(argv=[]):
+	if len(argv) < 2:
+		print("Usage: " + argv[0] + " <DIRECTORY> [<INTERFACE>] [<FILTER>]")
+		return 1
+	directory = argv[1]
+	interface = argv[2] if len(argv) > 2 else "any"
+	capturefilter = argv[3] if len(argv) > 3 else FILTER
+
+	try:
+		os.makedirs(directory)
+	except OSError as e:
+		if e.errno != errno.EEXIST:
+			raise
+
+	if os.path.exists(CONTROL_SOCKET):
+		os.remove(CONTROL_SOCKET)
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+	sock.bind(CONTROL_SOCKET)
+	# The capture may run as root, the loaders usually do not
+	os.chmod(CONTROL_SOCKET, 0o666)
+
+	# -U: write every packet as soon as it is captured, not when tcpdump's buffer is full
+	tcpdump = subprocess.Popen([ "tcpdump", "-U", "-i", interface, "-s", str(SNAPLEN), "-w", "-", capturefilter ], stdout=subprocess.PIPE)
+	print("Capturing on " + interface + " filtering (" + capturefilter + "), segments in " + directory + ", control socket " + CONTROL_SOCKET)
+
+	segmenter = None
+	try:
+		globalheader = readExactly(tcpdump.stdout, GLOBAL_HEADER_LENGTH)
+		if len(globalheader) < GLOBAL_HEADER_LENGTH:
+			print("tcpdump did not start capturing")
+			return 1
+		segmenter = Segmenter(directory, globalheader)
+		if FULL_CAPTURE:
+			segmenter.full = segmenter.openFile("local:" + interface + ".pcap")
+		listener = threading.Thread(target=listen, args=(sock, segmenter))
+		listener.daemon = True
+		listener.start()
+
+		# Until tcpdump is stopped
+		while True:
+			header = readExactly(tcpdump.stdout, RECORD_HEADER_LENGTH)
+			if len(header) < RECORD_HEADER_LENGTH:
+				break
+			(caplen,) = struct.unpack(segmenter.byteorder + "I", header[8:12])
+			data = readExactly(tcpdump.stdout, caplen)
+			if len(data) < caplen:
+				break
+			segmenter.write(header + data)
+	except KeyboardInterrupt:
+		tcpdump.terminate()
+	finally:
+		os.remove(CONTROL_SOCKET)
+		sock.close()
+		if segmenter is not None:
+			segmenter.close()
+			print("Wrote " + str(segmenter.packets) + " packets in " + str(segmenter.segmentcount) + " segments to " + directory)
+	tcpdump.wait()
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
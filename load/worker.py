@@ -0,0 +1,232 @@
+"""
+Long-lived worker mode shared by the loaders
+
+Instead of starting a fresh browser for every URL, a worker keeps one browser
+(and its extension) alive, loads a whole list of URLs, and resets the browser
+state in between. The browser is restarted after a number of loads or if a page
+load fails, e.g., because the browser crashed.
+
+The loaders supply their own functions to start, reset, and stop a browser
+and to load a single page, see runWorker below.
+
+URLs come from a file, from stdin, or from a job queue (see jobqueue.py),
+which records the result of every page load, so an interrupted campaign can
+be resumed.
+
+Environment:
+    POSTPROCESS  Number of processes to compute the results of finished page loads with, while
+                 the browser loads the next page (default: 0, compute them afterwards instead),
+                 see compute/postprocess.py
+
+
+"""
+
+import os
+import sys
+import subprocess
+import jobqueue
+
+
+# Restart the browser after this many page loads (if not given on the command line)
+RESTART_AFTER = 100
+
+# How often to try to (re)start a browser before giving up
+START_ATTEMPTS = 3
+
+POSTPROCESS = int(os.environ.get("POSTPROCESS", 0))
+
+POSTPROCESS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "compute", "postprocess.py")
+
+# Clear cache, cookies, and storage in Firefox -- needs to run in chrome context
+# Also clear what would otherwise stay warm between page loads but not between fresh profiles: the DNS cache,
+# idle keep-alive connections, TLS sessions, HSTS, and alt-svc mappings. Each of these runs on its own,
+# so a Firefox version without one of them still gets the rest (and that one stays warm).
+FIREFOX_RESET_SCRIPT = """
+var Cc = Components.classes, Ci = Components.interfaces;
+var Services = Components.utils.import("resource://gre/modules/Services.jsm", {}).Services;
+Services.cache2.clear();
+Services.cookies.removeAll();
+Services.obs.notifyObservers(null, "extension:purge-localStorage");
+Services.qms.clear();
+var steps = [
+	function() { Cc["@mozilla.org/network/dns-service;1"].getService(Ci.nsIDNSService).clearCache(true); },
+	function() { Services.obs.notifyObservers(null, "net:prune-all-connections"); },
+	function() { Cc["@mozilla.org/security/sdr;1"].getService(Ci.nsISecretDecoderRing).logoutAndTeardown(); },
+	function() { Cc["@mozilla.org/ssservice;1"].getService(Ci.nsISiteSecurityService).clearAll(); },
+	function() { Services.obs.notifyObservers(null, "browser:purge-session-history"); },
+];
+for (var i = 0; i < steps.length; i++) {
+	try { steps[i](); } catch (e) {}
+}
+return true;
+"""
+
+
+# Get URLs to load, one per line, from a file or from stdin ("-")
+#
+# From a file, the whole list is fetched $times times, one pass after the other, like fetchurl.sh does.
+# From stdin, every line is one page load, so whoever writes to stdin decides about repetitions.
+def readUrls(urlfile, times=1):
+	if urlfile == "-":
+		# Read line by line, so URLs can be passed in while the worker is running
+		for line in iter(sys.stdin.readline, ""):
+			url = line.strip()
+			if url:
+				yield url
+		return
+
+	try:
+		with open(urlfile, 'r') as f:
+			urls = [ line.strip() for line in f if line.strip() ]
+	except IOError as e:
+		print("Could not read URL file " + str(urlfile) + ": " + str(e))
+		return
+
+	for i in range(0, times):
+		print("Try " + str(i+1) + "/" + str(times))
+		for url in urls:
+			yield url
+
+
+# Get URLs to load and a function onResult(url, success) to call after each page load (or None)
+# urlfile can also be a job queue: "queue:<DBFILE>" or "queue:<DBFILE>:<SCENARIO>" (then times is ignored),
+# of which we only take the jobs of scenario, the one the page loads are logged under
+def urlSource(urlfile, times=1, scenario=None):
+	if urlfile.startswith(jobqueue.PREFIX):
+		try:
+			jobs = jobqueue.JobSource.fromSpec(urlfile, scenario=scenario)
+		except ValueError as e:
+			print("Not taking jobs from " + urlfile + ": " + str(e))
+			return ([], None)
+		return (iter(jobs), jobs.done)
+	return (readUrls(urlfile, times), None)
+
+
+# Start post-processing the page loads logged to logdir in the background, returns None if it is disabled
+def startPostProcessing(logdir, processes=POSTPROCESS):
+	if processes <= 0:
+		return None
+	try:
+		# Not to stdout, which is parsed as workload_output.log
+		logfile = open(logdir + "postprocess.log", 'a')
+		postprocess = subprocess.Popen([ POSTPROCESS_SCRIPT, os.path.abspath(logdir) + "/", str(processes) ], stdin=subprocess.PIPE, stdout=logfile, stderr=subprocess.STDOUT, cwd=os.path.dirname(POSTPROCESS_SCRIPT), universal_newlines=True)
+		logfile.close()
+	except Exception as e:
+		print("Could not start post-processing: " + str(e))
+		return None
+	print("Post-processing page loads using " + str(processes) + " processes")
+	return postprocess
+
+# Tell post-processing that all page loads logged so far are complete
+def notifyPostProcessing(postprocess):
+	if postprocess is None:
+		return
+	try:
+		postprocess.stdin.write("\n")
+		postprocess.stdin.flush()
+	except (IOError, OSError) as e:
+		print("Post-processing stopped: " + str(e))
+
+# Wait until all page loads are processed and the results are written
+def stopPostProcessing(postprocess):
+	if postprocess is None:
+		return
+	try:
+		postprocess.stdin.close()
+	except (IOError, OSError):
+		pass
+	print("Waiting for post-processing to finish")
+	postprocess.wait()
+	print("Post-processing done with exit status " + str(postprocess.returncode))
+
+
+def startBrowserWithRetries(startBrowser):
+	for attempt in range(1, START_ATTEMPTS+1):
+		try:
+			return startBrowser()
+		except Exception as e:
+			print("Could not start browser (attempt " + str(attempt) + "/" + str(START_ATTEMPTS) + "): " + str(e))
+	return None
+
+def stopBrowserQuietly(stopBrowser, browser):
+	try:
+		stopBrowser(browser)
+	except Exception as e:
+		print("Error stopping browser: " + str(e))
+
+
+# Load all URLs using one browser, restart it every $restartAfter loads or after a failed load
+#
+# startBrowser()                  returns a browser handle, raises an Exception on failure
+# loadPage(browser, url)          loads one page and logs its data, returns False if the browser needs a restart
+# resetBrowser(browser)           clears cache, cookies, and storage and navigates to about:blank
+# stopBrowser(browser)            closes the browser and cleans up
+# onResult(url, success)          optional, called after every page load, e.g., to mark a job done
+# logdir                          optional, post-process the page loads logged there (see POSTPROCESS)
+#
+# Returns the number of successful page loads.
+def runWorker(urls, startBrowser, loadPage, resetBrowser, stopBrowser, restartAfter=RESTART_AFTER, onResult=None, logdir=None):
+	postprocess = startPostProcessing(logdir) if logdir is not None else None
+	browser = None
+	loads_since_start = 0
+	loads = 0
+	successful = 0
+
+	for url in urls:
+		if browser is not None and loads_since_start >= restartAfter:
+			print("Restarting browser after " + str(loads_since_start) + " page loads")
+			stopBrowserQuietly(stopBrowser, browser)
+			browser = None
+
+		if browser is None:
+			browser = startBrowserWithRetries(startBrowser)
+			if browser is None:
+				print("Giving up, could not start browser")
+				if onResult is not None:
+					onResult(url, False)
+				break
+			loads_since_start = 0
+		elif loads_since_start > 0:
+			try:
+				resetBrowser(browser)
+			except Exception as e:
+				print("Could not reset browser state, restarting browser: " + str(e))
+				stopBrowserQuietly(stopBrowser, browser)
+				browser = startBrowserWithRetries(startBrowser)
+				if browser is None:
+					print("Giving up, could not start browser")
+					if onResult is not None:
+						onResult(url, False)
+					break
+				loads_since_start = 0
+
+		print("Fetching " + url)
+		try:
+			success = loadPage(browser, url)
+		except Exception as e:
+			print("Error loading " + url + ": " + str(sys.exc_info()[0]) + ", " + str(e))
+			success = False
+		loads += 1
+		loads_since_start += 1
+		if onResult is not None:
+			onResult(url, success)
+		notifyPostProcessing(postprocess)
+
+		print("Done fetching " + url + (" (success)" if success else " (failed)"))
+		print("")
+		sys.stdout.flush()
+
+		if success:
+			successful += 1
+		else:
+			# The browser may have crashed or be in a weird state -- start over with a fresh one
+			print("Page load failed, restarting browser")
+			stopBrowserQuietly(stopBrowser, browser)
+			browser = None
+
+	if browser is not None:
+		stopBrowserQuietly(stopBrowser, browser)
+	stopPostProcessing(postprocess)
+
+	print("Worker done: " + str(successful) + "/" + str(loads) + " page loads successful")
+	return successful